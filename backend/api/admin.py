@@ -1,17 +1,39 @@
 # backend/api/admin.py
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
 import json, csv
 from io import StringIO
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from django.utils.html import format_html
 from .models import ImageData, NarrativeCache, UserAction, JupyterLog, User
+from .headers import expand_headers
+from .blobs import rehydrate_outputs
+from .parquet_export import iter_parquet, PARQUET_CONTENT_TYPE
+from .concurrency import streaming_content
+from .estimates import estimated_count
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses Postgres estimates instead of COUNT(*) on very large result sets."""
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for multi-million-row tables."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skip the second, unfiltered COUNT(*)
+
 
 ### Image Data ###
 @admin.register(ImageData)
-class ImageDataAdmin(admin.ModelAdmin):
+class ImageDataAdmin(LargeTableAdmin):
     list_display = ("id", "user", "short_desc", "in_storyboard", "has_order", "order_num", "created_at", "last_saved")
     list_filter = ("in_storyboard", "has_order", "created_at")
     search_fields = ("id", "short_desc", "long_desc", "source", "user__username")
@@ -41,7 +63,7 @@ class ImageDataAdmin(admin.ModelAdmin):
     
 ### Jupyter Logs ###
 @admin.register(JupyterLog)
-class JupyterLogsAdmin(admin.ModelAdmin):
+class JupyterLogsAdmin(LargeTableAdmin):
     list_display = ("id", "user", "cell_type", "timestamp")
     list_filter = ("cell_type", "timestamp")
     search_fields = ("user__username", "cell_type", "source")
@@ -59,18 +81,20 @@ class JupyterLogsAdmin(admin.ModelAdmin):
     pretty_metadata.short_description = "Metadata (pretty)"
     
     def pretty_request_headers(self, obj):
+        headers = expand_headers(obj)
         try:
-            body = json.dumps(obj.request_headers, indent=2, ensure_ascii=False)
+            body = json.dumps(headers, indent=2, ensure_ascii=False)
         except Exception:
-            body = str(obj.request_headers)
+            body = str(headers)
         return format_html("<pre style='white-space:pre-wrap;margin:0'>{}</pre>", body)
     pretty_request_headers.short_description = "Request Headers (pretty)"
 
     def pretty_outputs(self, obj):
+        outputs = rehydrate_outputs(obj.outputs)
         try:
-            body = json.dumps(obj.outputs, indent=2, ensure_ascii=False)
+            body = json.dumps(outputs, indent=2, ensure_ascii=False)
         except Exception:
-            body = str(obj.outputs)
+            body = str(outputs)
         return format_html("<pre style='white-space:pre-wrap;margin:0'>{}</pre>", body)
     pretty_outputs.short_description = "Outputs (pretty)"
 
@@ -88,21 +112,32 @@ class JupyterLogsAdmin(admin.ModelAdmin):
 
         def line_stream():
             fields = ["id","user_id","cell_type","source","metadata","outputs","execution_count","timestamp","request_headers"]
-            for obj in queryset.iterator(chunk_size=1000):
-                row = {f: getattr(obj, f, None) for f in fields}
+            for obj in queryset.select_related("header_set").iterator(chunk_size=1000):
+                row = {f: expand_headers(obj) if f == "request_headers" else getattr(obj, f, None) for f in fields}
+                row["outputs"] = rehydrate_outputs(row["outputs"])
                 yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
 
         resp = StreamingHttpResponse(line_stream(), content_type="application/x-ndjson")
         resp["Content-Disposition"] = f'attachment; filename="jupyter-logs-{request.user.username}-{ts}.jsonl"'
         return resp
     export_logs_ndjson.short_description = "Export logs (JSONL)"
+
+    def export_logs_parquet(modeladmin, request, queryset):
+        """Export the selected logs as Parquet."""
+        ts = now().strftime("%Y%m%dT%H%M%SZ")
+        qs = queryset.select_related("header_set").order_by("timestamp", "id")
+        resp = StreamingHttpResponse(streaming_content(request, iter_parquet("jupyter_logs", qs, rehydrate=True)), content_type=PARQUET_CONTENT_TYPE)
+        resp["Content-Disposition"] = f'attachment; filename="jupyter-logs-{request.user.username}-{ts}.parquet"'
+        return resp
+    export_logs_parquet.short_description = "Export logs (Parquet)"
     
-    actions = [export_logs_ndjson]
+    actions = [export_logs_ndjson, export_logs_parquet]
 
 ### User Actions ###
 @admin.register(UserAction)
-class UserActionAdmin(admin.ModelAdmin):
+class UserActionAdmin(LargeTableAdmin):
     list_display = ("id", "user", "timestamp")
+    list_select_related = ("user",)
     date_hierarchy = "timestamp"
     search_fields = ("user__username",)
     readonly_fields = ("pretty_action",)
@@ -121,8 +156,8 @@ class UserActionAdmin(admin.ModelAdmin):
         fields = ["id", "user_id", "action", "state_info", "element", "request_headers", "timestamp"]
 
         def line_stream():
-            for obj in queryset.iterator(chunk_size=1000):
-                row = {f: getattr(obj, f, None) for f in fields}
+            for obj in queryset.select_related("header_set").iterator(chunk_size=1000):
+                row = {f: expand_headers(obj) if f == "request_headers" else getattr(obj, f, None) for f in fields}
                 yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
 
         resp = StreamingHttpResponse(line_stream(), content_type="application/x-ndjson")
@@ -130,7 +165,16 @@ class UserActionAdmin(admin.ModelAdmin):
         return resp
     export_user_actions_ndjson.short_description = "Export user actions (JSONL)"
 
-    actions = [export_user_actions_ndjson]
+    def export_user_actions_parquet(modeladmin, request, queryset):
+        """Export the selected user actions as Parquet."""
+        ts = now().strftime("%Y%m%dT%H%M%SZ")
+        qs = queryset.select_related("header_set").order_by("timestamp")
+        resp = StreamingHttpResponse(streaming_content(request, iter_parquet("user_actions", qs)), content_type=PARQUET_CONTENT_TYPE)
+        resp["Content-Disposition"] = f'attachment; filename="user-actions-{ts}.parquet"'
+        return resp
+    export_user_actions_parquet.short_description = "Export user actions (Parquet)"
+
+    actions = [export_user_actions_ndjson, export_user_actions_parquet]
 
 ### Narrative Cache ###
 @admin.register(NarrativeCache)
@@ -175,17 +219,34 @@ class NarrativeCacheAdmin(admin.ModelAdmin):
 
 ### Users ###
 # Optional: show a user's images inline on the Users admin page
+class CappedInlineFormSet(BaseInlineFormSet):
+    """Only the newest ADMIN_INLINE_LIMIT related rows are loaded into the form."""
+    def get_queryset(self):
+        if not hasattr(self, "_capped_queryset"):
+            self._capped_queryset = super().get_queryset().order_by("-created_at")[:settings.ADMIN_INLINE_LIMIT]
+        return self._capped_queryset
+
+
 class ImageDataInline(admin.TabularInline):
     model = ImageData
+    formset = CappedInlineFormSet
     extra = 0
     fields = ("id", "short_desc", "in_storyboard", "created_at")
     readonly_fields = ("id", "created_at")
+    show_change_link = True
+    verbose_name_plural = "Recent image data"
 
 @admin.register(User)
 class UsersAdmin(admin.ModelAdmin):
     list_display = ("id", "username", "is_staff", "is_superuser")
     search_fields = ("username", "email")
     inlines = [ImageDataInline]
+    readonly_fields = ("all_images",)
+
+    def all_images(self, obj):
+        url = reverse("admin:api_imagedata_changelist") + f"?user__id__exact={obj.pk}"
+        return format_html('<a href="{}">All images for this user</a>', url)
+    all_images.short_description = "Images"
 
     def export_users_ndjson(modeladmin, request, queryset):
         """Export the selected users as NDJSON."""
@@ -0,0 +1,188 @@
+# backend/api/batch_encoding.py
+"""
+Compact binary encoding for mouse-position and scroll batches.
+
+Batches are stored column-wise as little-endian int arrays: timestamps as a
+base value plus millisecond deltas, coordinates quantized to fixed-point ints.
+The arrays are zlib-compressed and framed by a small header. Decoding rebuilds
+the exact JSON shape the frontend sends, within the quantization step.
+
+Encoders raise ValueError for batches that do not match the expected schema;
+callers keep those in the JSON column instead.
+"""
+import json
+import struct
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+MOUSE_MAGIC = b"CMB1"
+SCROLL_MAGIC = b"CSB1"
+
+# Mouse x/y are normalized to the window (0..1); 1e-4 is well below a pixel.
+MOUSE_COORD_SCALE = 10_000
+# scrollTop is in (possibly fractional) pixels, scrollPercentage in 0..100.
+SCROLL_TOP_SCALE = 100
+SCROLL_PERCENT_SCALE = 100
+
+_MOUSE_HEADER = struct.Struct("<4sIIq")   # magic, count, coord scale, base timestamp (ms)
+_SCROLL_HEADER = struct.Struct("<4sIIq")  # magic, session count, event count, base timestamp (ms)
+_LEN = struct.Struct("<I")
+
+_MOUSE_KEYS = {"x", "y", "timestamp"}
+_SCROLL_SESSION_KEYS = {"elementId", "clientHeight", "scrollHeight", "events"}
+_SCROLL_EVENT_KEYS = {"scrollTop", "scrollPercentage", "timestamp"}
+
+
+def _parse_timestamps(values) -> np.ndarray:
+  """ISO-8601 UTC strings (JS toISOString) -> int64 epoch milliseconds."""
+  try:
+    parsed = np.array([v[:-1] if v.endswith("Z") else v for v in values], dtype="datetime64[ms]")
+  except (AttributeError, TypeError, ValueError) as e:
+    raise ValueError(f"unsupported timestamp format: {e}")
+  return parsed.astype(np.int64)
+
+
+def _format_timestamps(millis: np.ndarray) -> list:
+  text = np.datetime_as_string(millis.astype("datetime64[ms]"), unit="ms")
+  return np.char.add(text, "Z").tolist()
+
+
+def _quantize(values, scale: int) -> np.ndarray:
+  arr = np.asarray(values, dtype=np.float64)
+  if not np.all(np.isfinite(arr)):
+    raise ValueError("non-finite value")
+  q = np.rint(arr * scale)
+  if q.size and (q.min() < np.iinfo(np.int32).min or q.max() > np.iinfo(np.int32).max):
+    raise ValueError("value out of range")
+  return q.astype("<i4")
+
+
+def _deltas(millis: np.ndarray) -> tuple[int, np.ndarray]:
+  if not millis.size:
+    return 0, np.zeros(0, dtype="<i4")
+  base = int(millis[0])
+  deltas = np.diff(millis, prepend=millis[0])
+  if deltas.min() < np.iinfo(np.int32).min or deltas.max() > np.iinfo(np.int32).max:
+    raise ValueError("timestamp gap out of range")
+  return base, deltas.astype("<i4")
+
+
+def _undelta(base: int, deltas: np.ndarray) -> np.ndarray:
+  return base + np.cumsum(deltas, dtype=np.int64)
+
+
+def encode_mouse_batch(batch: list) -> bytes:
+  if not isinstance(batch, list) or any(not isinstance(p, dict) or p.keys() != _MOUSE_KEYS for p in batch):
+    raise ValueError("mouse batch does not match the {x, y, timestamp} schema")
+
+  base, dt = _deltas(_parse_timestamps([p["timestamp"] for p in batch]))
+  xs = _quantize([p["x"] for p in batch], MOUSE_COORD_SCALE)
+  ys = _quantize([p["y"] for p in batch], MOUSE_COORD_SCALE)
+
+  header = _MOUSE_HEADER.pack(MOUSE_MAGIC, len(batch), MOUSE_COORD_SCALE, base)
+  return header + zlib.compress(dt.tobytes() + xs.tobytes() + ys.tobytes())
+
+
+def decode_mouse_batch(data: bytes) -> list:
+  magic, count, scale, base = _MOUSE_HEADER.unpack_from(data)
+  if magic != MOUSE_MAGIC:
+    raise ValueError("not a packed mouse batch")
+  columns = np.frombuffer(zlib.decompress(data[_MOUSE_HEADER.size:]), dtype="<i4").reshape(3, count)
+
+  timestamps = _format_timestamps(_undelta(base, columns[0]))
+  xs = (columns[1] / scale).tolist()
+  ys = (columns[2] / scale).tolist()
+  return [{"x": x, "y": y, "timestamp": t} for x, y, t in zip(xs, ys, timestamps)]
+
+
+def packed_mouse_count(data: bytes) -> int:
+  """Number of points in a packed mouse batch, read from the header only."""
+  magic, count, _, _ = _MOUSE_HEADER.unpack_from(data)
+  if magic != MOUSE_MAGIC:
+    raise ValueError("not a packed mouse batch")
+  return count
+
+
+def encode_scroll_batch(sessions: list) -> bytes:
+  if not isinstance(sessions, list) or any(
+    not isinstance(s, dict) or s.keys() != _SCROLL_SESSION_KEYS or not isinstance(s["events"], list)
+    for s in sessions
+  ):
+    raise ValueError("scroll batch does not match the session schema")
+  events = [e for s in sessions for e in s["events"]]
+  if any(not isinstance(e, dict) or e.keys() != _SCROLL_EVENT_KEYS for e in events):
+    raise ValueError("scroll events do not match the event schema")
+
+  element_ids = json.dumps([s["elementId"] for s in sessions]).encode("utf-8")
+  client_heights = _quantize([s["clientHeight"] for s in sessions], 1)
+  scroll_heights = _quantize([s["scrollHeight"] for s in sessions], 1)
+  event_counts = np.array([len(s["events"]) for s in sessions], dtype="<i4")
+
+  base, dt = _deltas(_parse_timestamps([e["timestamp"] for e in events]))
+  tops = _quantize([e["scrollTop"] for e in events], SCROLL_TOP_SCALE)
+  percents = _quantize([e["scrollPercentage"] for e in events], SCROLL_PERCENT_SCALE)
+
+  body = b"".join([
+    _LEN.pack(len(element_ids)), element_ids,
+    client_heights.tobytes(), scroll_heights.tobytes(), event_counts.tobytes(),
+    dt.tobytes(), tops.tobytes(), percents.tobytes(),
+  ])
+  header = _SCROLL_HEADER.pack(SCROLL_MAGIC, len(sessions), len(events), base)
+  return header + zlib.compress(body)
+
+
+def decode_scroll_batch(data: bytes) -> list:
+  magic, session_count, event_count, base = _SCROLL_HEADER.unpack_from(data)
+  if magic != SCROLL_MAGIC:
+    raise ValueError("not a packed scroll batch")
+  body = zlib.decompress(data[_SCROLL_HEADER.size:])
+
+  (ids_len,) = _LEN.unpack_from(body)
+  offset = _LEN.size
+  element_ids = json.loads(body[offset:offset + ids_len])
+  offset += ids_len
+  session_cols = np.frombuffer(body, dtype="<i4", count=3 * session_count, offset=offset).reshape(3, session_count)
+  offset += session_cols.nbytes
+  event_cols = np.frombuffer(body, dtype="<i4", count=3 * event_count, offset=offset).reshape(3, event_count)
+
+  timestamps = _format_timestamps(_undelta(base, event_cols[0]))
+  tops = (event_cols[1] / SCROLL_TOP_SCALE).tolist()
+  percents = (event_cols[2] / SCROLL_PERCENT_SCALE).tolist()
+  client_heights, scroll_heights, event_counts = (col.tolist() for col in session_cols)
+
+  sessions = []
+  start = 0
+  for element_id, client_height, scroll_height, n in zip(element_ids, client_heights, scroll_heights, event_counts):
+    sessions.append({
+      "elementId": element_id,
+      "clientHeight": client_height,
+      "scrollHeight": scroll_height,
+      "events": [
+        {"scrollTop": top, "scrollPercentage": pct, "timestamp": ts}
+        for top, pct, ts in zip(tops[start:start + n], percents[start:start + n], timestamps[start:start + n])
+      ],
+    })
+    start += n
+  return sessions
+
+
+def try_encode(encoder, batch) -> bytes | None:
+  """Packed form of `batch`, or None when it has to stay JSON."""
+  try:
+    return encoder(batch)
+  except (ValueError, TypeError, KeyError):
+    return None
+
+
+def packed_for_storage(encoder, batch) -> tuple[list, bytes | None]:
+  """
+  (json_value, packed) to save for an incoming batch. With
+  TELEMETRY_PACKED_BATCHES on and a batch that fits the schema, the JSON column
+  is left empty; otherwise the batch is stored as JSON unchanged.
+  """
+  if not settings.TELEMETRY_PACKED_BATCHES:
+    return batch, None
+  packed = try_encode(encoder, batch)
+  return ([], packed) if packed is not None else (batch, None)
@@ -0,0 +1,110 @@
+# backend/api/blobs.py
+"""
+Content-addressed storage for large Jupyter cell outputs.
+
+At ingest, output values over JUPYTER_BLOB_MIN_BYTES (typically base64 plots
+in an output's `data` bundle, or long stream text) are written once to
+JUPYTER_BLOB_PATH as `<sha[:2]>/<sha[2:4]>/<sha>.json` and replaced in the row
+by a reference `{"$blob": sha, "size": n}`. Re-running a cell that draws the
+same plot stores nothing new. `rehydrate_outputs` swaps the references back.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BLOB_REF_KEY = "$blob"
+# Output fields that can carry large payloads
+_OFFLOADABLE_FIELDS = ("text", "traceback")
+
+
+def _blob_path(digest: str) -> str:
+  return os.path.join(settings.JUPYTER_BLOB_PATH, digest[:2], digest[2:4], f"{digest}.json")
+
+
+def is_blob_ref(value) -> bool:
+  return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+def store_blob(payload: bytes) -> str:
+  """Write `payload` under its sha256 unless it is already stored. Returns the digest."""
+  digest = hashlib.sha256(payload).hexdigest()
+  path = _blob_path(digest)
+  if os.path.exists(path):
+    return digest
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  # Write then rename, so concurrent writers of the same blob never expose a partial file.
+  fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+  try:
+    with os.fdopen(fd, "wb") as f:
+      f.write(payload)
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.unlink(tmp_path)
+    raise
+  return digest
+
+
+def load_blob(digest: str):
+  """The JSON value stored under `digest`."""
+  if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+    raise ValueError("invalid blob digest")
+  with open(_blob_path(digest), "rb") as f:
+    return json.loads(f.read())
+
+
+def _offload_value(value):
+  if is_blob_ref(value):
+    return value
+  payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+  if len(payload) < settings.JUPYTER_BLOB_MIN_BYTES:
+    return value
+  try:
+    return {BLOB_REF_KEY: store_blob(payload), "size": len(payload)}
+  except OSError as e:
+    logger.warning(f"Keeping Jupyter output inline, blob write failed: {e}")
+    return value
+
+
+def _map_output_values(outputs, fn):
+  if not isinstance(outputs, list):
+    return outputs
+  mapped = []
+  for output in outputs:
+    if not isinstance(output, dict):
+      mapped.append(output)
+      continue
+    output = dict(output)
+    if isinstance(output.get("data"), dict):
+      output["data"] = {mime: fn(value) for mime, value in output["data"].items()}
+    for field in _OFFLOADABLE_FIELDS:
+      if field in output:
+        output[field] = fn(output[field])
+    mapped.append(output)
+  return mapped
+
+
+def offload_outputs(outputs):
+  """Outputs with every large value replaced by a blob reference."""
+  return _map_output_values(outputs, _offload_value)
+
+
+def _rehydrate_value(value):
+  if not is_blob_ref(value):
+    return value
+  try:
+    return load_blob(value[BLOB_REF_KEY])
+  except (OSError, ValueError) as e:
+    logger.warning(f"Jupyter output blob {value[BLOB_REF_KEY]} unavailable: {e}")
+    return value
+
+
+def rehydrate_outputs(outputs):
+  """Outputs with blob references replaced by the stored values."""
+  return _map_output_values(outputs, _rehydrate_value)
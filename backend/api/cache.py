@@ -0,0 +1,93 @@
+# backend/api/cache.py
+"""
+Namespaced access to the shared (Redis) cache.
+
+Each namespace owns a key prefix and a version: bumping a namespace's version
+invalidates just its keys, while CACHE_KEY_PREFIX / CACHE_VERSION in settings
+cover the whole deployment. Hits and misses are counted per process and
+reported by `cache_stats()` through the metrics endpoint.
+"""
+from collections import defaultdict
+from threading import Lock
+from typing import Callable, Generic, Optional, TypeVar
+
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+_MISSING = object()
+_counts = defaultdict(lambda: {"hits": 0, "misses": 0})
+_counts_lock = Lock()
+_namespaces = {}
+
+
+class CacheNamespace(Generic[T]):
+  def __init__(self, name: str, timeout: Optional[int] = 300, version: int = 1):
+    self.name = name
+    self.timeout = timeout
+    self.version = version
+    _namespaces[name] = self
+
+  def key(self, *parts) -> str:
+    return ":".join([self.name, *(str(p) for p in parts)])
+
+  def get(self, *parts) -> Optional[T]:
+    value = cache.get(self.key(*parts), _MISSING, version=self.version)
+    self._count(value is not _MISSING)
+    return None if value is _MISSING else value
+
+  def set(self, *parts, value: T, timeout: Optional[int] = None) -> None:
+    cache.set(self.key(*parts), value, self.timeout if timeout is None else timeout, version=self.version)
+
+  def add(self, *parts, value: T, timeout: Optional[int] = None) -> bool:
+    """Set only if the key is absent; True when this call stored the value (usable as a lock)."""
+    return cache.add(self.key(*parts), value, self.timeout if timeout is None else timeout, version=self.version)
+
+  def get_or_set(self, *parts, default: Callable[[], T], timeout: Optional[int] = None) -> T:
+    value = self.get(*parts)
+    if value is None:
+      value = default()
+      if value is not None:
+        self.set(*parts, value=value, timeout=timeout)
+    return value
+
+  def delete(self, *parts) -> None:
+    cache.delete(self.key(*parts), version=self.version)
+
+  def _count(self, hit: bool):
+    with _counts_lock:
+      _counts[self.name]["hits" if hit else "misses"] += 1
+
+
+USERS = CacheNamespace("auth:user")
+NARRATIVES = CacheNamespace("narrative", timeout=3600)
+SESSIONS = CacheNamespace("analytics:sessions")
+HOUSEKEEPING = CacheNamespace("housekeeping", timeout=None)
+
+# DRF throttles format their own keys; this keeps them under a namespace too
+THROTTLE_KEY_FORMAT = "throttle:%(scope)s:%(ident)s"
+
+
+def cache_stats() -> dict:
+  """Per-process hit/miss counts by namespace, plus server-wide Redis counters when available."""
+  with _counts_lock:
+    namespaces = {}
+    for name in _namespaces:
+      counts = dict(_counts[name])
+      total = counts["hits"] + counts["misses"]
+      namespaces[name] = {**counts, "hit_rate": round(counts["hits"] / total, 4) if total else None}
+
+  stats = {"backend": f"{type(cache).__module__}.{type(cache).__name__}", "namespaces": namespaces}
+  client = getattr(cache, "_cache", None)
+  if hasattr(client, "get_client"):
+    try:
+      info = client.get_client().info("stats")
+      hits, misses = info.get("keyspace_hits", 0), info.get("keyspace_misses", 0)
+      stats["server"] = {
+        "keyspace_hits": hits,
+        "keyspace_misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+      }
+    except Exception as e:
+      stats["server"] = {"error": str(e)}
+  return stats
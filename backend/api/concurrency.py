@@ -0,0 +1,108 @@
+# backend/api/concurrency.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.utils.functional import classproperty
+from rest_framework.views import APIView
+
+# Shared, bounded pool for blocking work started from async views. Bounding it
+# caps the number of threads (and therefore DB connections) a worker can hold
+# no matter how many slow requests are in flight on the event loop.
+_blocking_executor = ThreadPoolExecutor(
+  max_workers=settings.BLOCKING_IO_POOL_SIZE,
+  thread_name_prefix="cast-blocking",
+)
+
+_STREAM_DONE = object()
+
+
+def _run_with_db_cleanup(func, *args, **kwargs):
+  # Pool threads outlive requests, so release connections the same way the
+  # request_started/request_finished signals would for a normal sync view.
+  close_old_connections()
+  try:
+    return func(*args, **kwargs)
+  finally:
+    close_old_connections()
+
+
+async def run_blocking(func, *args, **kwargs):
+  """Run a blocking callable on the bounded pool and await its result."""
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(
+    _blocking_executor, partial(_run_with_db_cleanup, func, *args, **kwargs)
+  )
+
+
+async def iterate_in_pool(iterator, prefetch: int = 16):
+  """
+  Adapt a blocking iterator (e.g. one backed by a DB cursor) into an async one.
+
+  The whole iteration runs on a single pool thread so the cursor keeps using
+  the same connection; at most `prefetch` items are buffered ahead of the client.
+  """
+  loop = asyncio.get_running_loop()
+  queue = asyncio.Queue(maxsize=prefetch)
+  stopped = threading.Event()
+
+  def produce():
+    try:
+      for item in iterator:
+        if stopped.is_set():
+          return
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+    finally:
+      if not stopped.is_set():
+        asyncio.run_coroutine_threadsafe(queue.put(_STREAM_DONE), loop).result()
+
+  producer = loop.run_in_executor(_blocking_executor, partial(_run_with_db_cleanup, produce))
+  try:
+    while True:
+      item = await queue.get()
+      if item is _STREAM_DONE:
+        break
+      yield item
+    await producer  # surface errors raised while producing
+  finally:
+    # Client went away (or we finished): unblock the producer and let it exit.
+    stopped.set()
+    while not producer.done():
+      try:
+        queue.get_nowait()
+      except asyncio.QueueEmpty:
+        await asyncio.sleep(0.01)
+
+
+def is_asgi_request(request) -> bool:
+  return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def streaming_content(request, iterator):
+  """
+  Return content suitable for StreamingHttpResponse under the current server.
+  Under ASGI Django would otherwise buffer a sync iterator in full before
+  sending it, so the iterator is pulled on the bounded pool instead.
+  """
+  if is_asgi_request(request):
+    return iterate_in_pool(iterator)
+  return iterator
+
+
+class PooledAPIView(APIView):
+  """
+  APIView that Django treats as an async view. The regular (blocking) DRF
+  dispatch runs on the bounded pool so slow handlers never occupy the event
+  loop. Under WSGI Django adapts the coroutine back to a sync call.
+  """
+
+  @classproperty
+  def view_is_async(cls):
+    return True
+
+  async def dispatch(self, request, *args, **kwargs):
+    return await run_blocking(super().dispatch, request, *args, **kwargs)
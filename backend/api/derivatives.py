@@ -0,0 +1,128 @@
+# backend/api/derivatives.py
+"""
+Sized copies of uploaded figures for the board, thumbnails and print.
+
+Each derivative is stored next to the original in figure storage under a
+predictable flat name, `<uuid>.<size>.<ext>` (e.g. `<uuid>.canvas.webp`), so
+it lands in the same ab/cd directory and nginx serves it from
+/images/<uuid>.canvas.webp with the same mapping as the original. Images are
+only ever scaled down; an image smaller than a size is just re-encoded.
+"""
+import io
+import logging
+import os
+import re
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .figure_storage import candidate_paths, delete_figure, figure_storage, save_figure
+
+logger = logging.getLogger(__name__)
+
+# name -> (longest edge in px, format, extension, save options)
+SIZES = {
+  "thumb": (320, "WEBP", "webp", {"quality": 80, "method": 4}),
+  "canvas": (1280, "WEBP", "webp", {"quality": 85, "method": 4}),
+  "print": (2400, "JPEG", "jpg", {"quality": 90, "optimize": True, "progressive": True}),
+}
+
+DERIVATIVE_NAME = re.compile(r"^(?P<stem>[^/]+)\.(?P<size>" + "|".join(SIZES) + r")\.(?:webp|jpg)$")
+
+
+def derivative_name(filepath, size) -> str:
+  """Flat name of the `size` derivative of the figure stored as `filepath`."""
+  stem = os.path.splitext(filepath)[0]
+  return f"{stem}.{size}.{SIZES[size][2]}"
+
+
+def _open_original(filepath):
+  storage = figure_storage()
+  for path in candidate_paths(filepath):
+    try:
+      with storage.open(path, "rb") as f:
+        image = Image.open(f)
+        image.load()
+        return image
+    except FileNotFoundError:
+      continue
+  raise FileNotFoundError(filepath)
+
+
+def _to_encodable(image):
+  """Convert modes Pillow can't resample or write as WebP/JPEG (palette, 16/32-bit, CMYK, ...) to 8-bit."""
+  if image.mode in ("RGB", "RGBA", "L", "LA"):
+    return image
+  if image.mode.startswith("I"):
+    # 16-bit greyscale PNGs load as I / I;16; scale the 16-bit range down instead of clipping it
+    return image.convert("I").point(lambda v: v / 256).convert("L")
+  has_alpha = "A" in image.getbands() or "transparency" in image.info
+  return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _encode(image, size):
+  edge, fmt, _, options = SIZES[size]
+  resized = image.copy()
+  resized.thumbnail((edge, edge), Image.LANCZOS)
+  has_alpha = resized.mode in ("RGBA", "LA") or "transparency" in resized.info
+  if fmt == "JPEG" and has_alpha:
+    # JPEG has no alpha channel; flatten onto white like the board background
+    rgba = resized.convert("RGBA")
+    flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+    flattened.paste(rgba, mask=rgba.getchannel("A"))
+    resized = flattened
+  else:
+    resized = resized.convert("RGBA" if has_alpha else "RGB")
+  buffer = io.BytesIO()
+  resized.save(buffer, fmt, **options)
+  buffer.seek(0)
+  return buffer, resized.size
+
+
+def build_derivatives(image_data) -> dict:
+  """
+  Record the original's width/height/format on `image_data` and write every
+  derivative. Safe to re-run: existing derivatives are replaced.
+  """
+  try:
+    original = _open_original(image_data.filepath)
+  except (UnidentifiedImageError, Image.DecompressionBombError):
+    # Not a raster image Pillow can read (e.g. SVG): serve the original as-is
+    image_data.image_format = os.path.splitext(image_data.filepath)[1].lstrip(".").upper()
+    image_data.derivatives = {}
+    image_data.save(update_fields=["image_format", "derivatives"])
+    return {}
+
+  image_data.width, image_data.height = original.size
+  image_data.image_format = original.format or ""
+  derivatives = {}
+  try:
+    original = _to_encodable(ImageOps.exif_transpose(original))
+  except (OSError, ValueError) as e:
+    logger.warning(f"[DERIVATIVES] Cannot convert {image_data.filepath} ({original.mode}): {e}")
+    original = None
+
+  for size in SIZES if original is not None else ():
+    name = derivative_name(image_data.filepath, size)
+    try:
+      buffer, (width, height) = _encode(original, size)
+    except (OSError, ValueError) as e:
+      # Keep going: the original's metadata and any other sizes are still worth saving
+      logger.warning(f"[DERIVATIVES] {size} failed for {image_data.filepath}: {e}")
+      continue
+    delete_figure(name)  # replace rather than get a suffixed name from the storage
+    derivatives[size] = {"path": save_figure(name, buffer), "width": width, "height": height}
+
+  image_data.derivatives = derivatives
+  image_data.save(update_fields=["width", "height", "image_format", "derivatives"])
+  return derivatives
+
+
+def delete_derivatives(filepath) -> None:
+  for size in SIZES:
+    delete_figure(derivative_name(filepath, size))
+
+
+def derivative_stem(name):
+  """The figure stem a derivative name belongs to, or None if `name` is not a derivative."""
+  match = DERIVATIVE_NAME.match(name)
+  return match.group("stem") if match else None
@@ -0,0 +1,127 @@
+# backend/api/exports.py
+"""
+Row streams for log exports.
+
+Exports read through `.iterator(chunk_size=...)` (server-side cursors on
+Postgres) and emit rows with a fixed column order, so memory stays flat no
+matter how many rows match.
+"""
+import json
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .blobs import rehydrate_outputs
+from .headers import expand_headers
+from .models import JupyterLog
+from .parquet_export import PARQUET_CONTENT_TYPE
+
+EXPORT_CHUNK_SIZE = 2000
+
+JUPYTER_EXPORT_FIELDS = [
+  "id", "user", "cell_type", "source", "metadata", "outputs",
+  "execution_count", "timestamp", "request_headers",
+]
+# Fields holding JSON values; CSV writes them as JSON text
+JUPYTER_JSON_FIELDS = {"metadata", "outputs", "request_headers"}
+
+_timestamp_field = serializers.DateTimeField()
+
+
+class ExportFilterError(ValueError):
+  pass
+
+
+def _parse_bound(value: str, end: bool) -> datetime:
+  """A datetime, or a date meaning the whole day (so `end` dates are inclusive)."""
+  parsed = parse_datetime(value)
+  if parsed is not None:
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+  day = parse_date(value)
+  if day is None:
+    raise ExportFilterError(f"Invalid date: {value}")
+  bound = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+  return bound + timedelta(days=1) if end else bound
+
+
+def apply_export_filters(qs, params):
+  """
+  Narrow a telemetry queryset by export params: user (id or username) and
+  start / end (ISO date or datetime, end inclusive for dates).
+  """
+  user_ref = params.get("user")
+  if user_ref:
+    try:
+      qs = qs.filter(user_id=uuid.UUID(user_ref))
+    except ValueError:
+      qs = qs.filter(user__username=user_ref)
+
+  if params.get("start"):
+    qs = qs.filter(timestamp__gte=_parse_bound(params["start"], end=False))
+  if params.get("end"):
+    qs = qs.filter(timestamp__lt=_parse_bound(params["end"], end=True))
+  return qs
+
+
+def filter_jupyter_logs(params):
+  """JupyterLog queryset for export params; adds a cell_type filter to apply_export_filters."""
+  qs = apply_export_filters(JupyterLog.objects.select_related("header_set").order_by("timestamp", "id"), params)
+  if params.get("cell_type"):
+    qs = qs.filter(cell_type=params["cell_type"])
+  return qs
+
+
+def jupyter_log_row(log, rehydrate=False) -> dict:
+  return {
+    "id": str(log.id),
+    "user": str(log.user_id),
+    "cell_type": log.cell_type,
+    "source": log.source,
+    "metadata": log.metadata,
+    "outputs": rehydrate_outputs(log.outputs) if rehydrate else log.outputs,
+    "execution_count": log.execution_count,
+    "timestamp": _timestamp_field.to_representation(log.timestamp),
+    "request_headers": expand_headers(log),
+  }
+
+
+def jupyter_log_rows(queryset, rehydrate=False):
+  for log in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+    yield jupyter_log_row(log, rehydrate)
+
+
+def csv_value(field, value):
+  return json.dumps(value, ensure_ascii=False) if field in JUPYTER_JSON_FIELDS else value
+
+
+class ExportRenderer(BaseRenderer):
+  """
+  Declares an export format so DRF's `?format=` override accepts it instead
+  of answering 404. Export views stream the file themselves; only their JSON
+  replies (errors, no rows) are rendered here.
+  """
+  charset = None
+
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    return JSONRenderer().render(data)
+
+
+class JSONLinesExportRenderer(ExportRenderer):
+  media_type = "application/x-ndjson"
+  format = "jsonl"
+
+
+class CSVExportRenderer(ExportRenderer):
+  media_type = "text/csv"
+  format = "csv"
+
+
+class ParquetExportRenderer(ExportRenderer):
+  media_type = PARQUET_CONTENT_TYPE
+  format = "parquet"
+
+
+EXPORT_RENDERERS = [JSONRenderer, JSONLinesExportRenderer, CSVExportRenderer, ParquetExportRenderer]
@@ -0,0 +1,163 @@
+# backend/api/figure_gc.py
+"""
+Reconcile uploaded figure files in DATA_PATH with ImageData rows
+(local figure storage only).
+
+Files are streamed with os.scandir and checked against the table in batches
+(one `filepath IN (...)` query per batch); rows are streamed from a
+server-side cursor and checked with a stat each. Only one batch is held in
+memory at a time, so a run stays small however many files there are.
+
+Orphan files (no row) are reported and can be moved to DATA_PATH/.quarantine;
+dangling rows (no file) are only reported. Sized derivatives count as known
+while their original's row exists. Dot-directories such as .jupyter-blobs and
+.quarantine are never scanned.
+"""
+import operator
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+
+from .derivatives import derivative_stem
+from .figure_storage import candidate_paths, local_root, shard_path
+from .models import ImageData
+
+BATCH_SIZE = 2000
+QUARANTINE_DIR = ".quarantine"
+
+
+def _figure_root():
+  root = local_root()
+  if root is None:
+    raise ValueError("Figure GC scans the local figure directory; FIGURE_STORAGE is not local")
+  return root
+
+
+def iter_figure_files(root, exclude=()):
+  """Yield (relative posix path, DirEntry) for every figure file under `root`, skipping `exclude` dirs."""
+  exclude = {os.path.realpath(path) for path in exclude}
+  stack = [""]
+  while stack:
+    prefix = stack.pop()
+    try:
+      entries = os.scandir(os.path.join(root, prefix))
+    except FileNotFoundError:
+      continue
+    with entries:
+      for entry in entries:
+        if entry.name.startswith("."):
+          continue
+        relative = f"{prefix}/{entry.name}" if prefix else entry.name
+        if entry.is_dir(follow_symlinks=False):
+          if os.path.realpath(entry.path) not in exclude:
+            stack.append(relative)
+        elif entry.is_file(follow_symlinks=False):
+          yield relative, entry
+
+
+def _batches(iterable, size):
+  batch = []
+  for item in iterable:
+    batch.append(item)
+    if len(batch) >= size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+def find_orphan_files(root=None, grace_seconds=None, batch_size=BATCH_SIZE):
+  """
+  Yield (relative path, size) for files without an ImageData row. Files
+  younger than `grace_seconds` are skipped: an upload writes the file before
+  it saves the row.
+  """
+  root = root or _figure_root()
+  grace_seconds = settings.FIGURE_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+  cutoff = time.time() - grace_seconds
+  # Per-user Jupyter workspaces are not figures, even if USER_DIR sits inside DATA_PATH
+  files = iter_figure_files(root, exclude=[settings.USER_DIR] if settings.USER_DIR else [])
+  for batch in _batches(files, batch_size):
+    names = [_figure_name(path) for path, _ in batch]
+    known = set(ImageData.objects.filter(filepath__in=names).values_list("filepath", flat=True))
+    # Derivatives (<stem>.<size>.<ext>) belong to the row whose filepath has that stem
+    stems = {name: derivative_stem(name) for name in names if derivative_stem(name)}
+    known_stems = _known_stems(set(stems.values()))
+    for (path, entry), name in zip(batch, names):
+      if name in known or stems.get(name) in known_stems:
+        continue
+      try:
+        stat = entry.stat(follow_symlinks=False)
+      except FileNotFoundError:
+        continue  # deleted while we were scanning
+      if stat.st_mtime <= cutoff:
+        yield path, stat.st_size
+
+
+def _figure_name(path):
+  """The flat name recorded in ImageData.filepath for a file found at `path`."""
+  name = path.rsplit("/", 1)[-1]
+  return name if path in (name, shard_path(name)) else path
+
+
+def _known_stems(stems):
+  """
+  The `stems` that are an ImageData filepath minus its extension. Derivatives
+  are named after the filepath, which seeded rows don't share with their id.
+  """
+  if not stems:
+    return set()
+  query = reduce(operator.or_, (Q(filepath__startswith=f"{stem}.") for stem in stems))
+  filepaths = ImageData.objects.filter(query).values_list("filepath", flat=True)
+  return {os.path.splitext(filepath)[0] for filepath in filepaths} & stems
+
+
+def find_dangling_rows(root=None, batch_size=BATCH_SIZE):
+  """Yield (id, user_id, filepath) for ImageData rows whose file is missing."""
+  root = root or _figure_root()
+  rows = ImageData.objects.order_by().values_list("id", "user_id", "filepath")
+  for image_id, user_id, filepath in rows.iterator(chunk_size=batch_size):
+    if not filepath or not any(os.path.isfile(os.path.join(root, p)) for p in candidate_paths(filepath)):
+      yield image_id, user_id, filepath
+
+
+def quarantine_file(relative_path, root=None, run_stamp=None) -> str:
+  """Move an orphan into DATA_PATH/.quarantine/<run>/, keeping its relative path. Returns the new path."""
+  root = root or _figure_root()
+  run_stamp = run_stamp or datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+  target = os.path.join(root, QUARANTINE_DIR, run_stamp, relative_path)
+  os.makedirs(os.path.dirname(target), exist_ok=True)
+  os.replace(os.path.join(root, relative_path), target)
+  return target
+
+
+def collect_garbage(quarantine=False, root=None, grace_seconds=None, batch_size=BATCH_SIZE, on_orphan=None, on_dangling=None):
+  """
+  One reconciliation pass. Calls `on_orphan(path, size)` / `on_dangling(id, user_id, path)`
+  for each finding and returns the totals.
+  """
+  root = root or _figure_root()
+  run_stamp = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+  totals = {"orphan_files": 0, "orphan_bytes": 0, "quarantined": 0, "dangling_rows": 0}
+
+  for path, size in find_orphan_files(root, grace_seconds, batch_size):
+    totals["orphan_files"] += 1
+    totals["orphan_bytes"] += size
+    if quarantine:
+      try:
+        quarantine_file(path, root, run_stamp)
+        totals["quarantined"] += 1
+      except FileNotFoundError:
+        pass
+    if on_orphan:
+      on_orphan(path, size)
+
+  for image_id, user_id, path in find_dangling_rows(root, batch_size):
+    totals["dangling_rows"] += 1
+    if on_dangling:
+      on_dangling(image_id, user_id, path)
+  return totals
@@ -0,0 +1,124 @@
+# backend/api/figure_storage.py
+"""
+Access to uploaded figures through the `figures` storage (settings.STORAGES).
+
+Locally this is a FileSystemStorage rooted at DATA_PATH, which nginx keeps
+serving under /images/. With FIGURE_STORAGE=s3 it is django-storages'
+S3Storage (AWS S3, MinIO or any S3-compatible endpoint), so web and Celery
+nodes no longer need a shared volume. Writes go through Storage.save, which
+streams upload chunks; ranged reads use a ranged GET on S3 instead of
+downloading the whole object.
+
+Figures keep their flat name (`<uuid>.<ext>`) in ImageData.filepath, URLs and
+prompts. On storage they fan out into two directory levels taken from the
+start of the name, `ab/cd/abcd....png`, so no directory grows past a few
+thousand entries. Reads fall back to the flat location, so files that
+`shard_figures` has not moved yet keep working.
+"""
+import mimetypes
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
+
+CHUNK_SIZE = 64 * 1024
+
+# Same pattern nginx uses to map /images/<name> onto the sharded layout
+_SHARDABLE = re.compile(r"^([0-9a-f]{2})([0-9a-f]{2})[^/]*$")
+
+
+def figure_storage():
+  return storages["figures"]
+
+
+def local_root():
+  """Directory holding the figures when they are on local disk, else None."""
+  storage = figure_storage()
+  return storage.location if isinstance(storage, FileSystemStorage) else None
+
+
+def shard_path(name) -> str:
+  """Storage path for the flat figure `name`; names that don't start with 4 hex chars stay flat."""
+  match = _SHARDABLE.match(name)
+  return f"{match.group(1)}/{match.group(2)}/{name}" if match else name
+
+
+def candidate_paths(name) -> list:
+  """Where `name` may be stored: the sharded path first, then the legacy flat one."""
+  sharded = shard_path(name)
+  return [sharded, name] if sharded != name else [name]
+
+
+def storage_path(name):
+  """The path `name` is actually stored at, or None if it is missing."""
+  storage = figure_storage()
+  for path in candidate_paths(name):
+    if storage.exists(path):
+      return path
+  return None
+
+
+def save_figure(name, content) -> str:
+  """Stream `content` into storage under the layout in FIGURE_LAYOUT. Returns the flat name to record."""
+  path = shard_path(name) if settings.FIGURE_LAYOUT == "sharded" else name
+  stored = figure_storage().save(path, content)
+  return stored.rsplit("/", 1)[-1]
+
+
+def delete_figure(name) -> bool:
+  """Delete every stored copy of `name`. True if anything was deleted."""
+  storage = figure_storage()
+  deleted = False
+  for path in candidate_paths(name):
+    if storage.exists(path):
+      storage.delete(path)
+      deleted = True
+  return deleted
+
+
+def read_figure(name) -> bytes:
+  storage = figure_storage()
+  for path in candidate_paths(name):
+    try:
+      with storage.open(path, "rb") as f:
+        return f.read()
+    except FileNotFoundError:
+      continue  # not moved yet, or moved while we looked
+  raise FileNotFoundError(name)
+
+
+def figure_exists(name) -> bool:
+  return bool(name) and storage_path(name) is not None
+
+
+def content_type(name) -> str:
+  return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _s3_object(storage, path):
+  key = f"{storage.location.strip('/')}/{path}" if storage.location else path
+  return storage.bucket.Object(key)
+
+
+def iter_figure(path, start=0, end=None, chunk_size=CHUNK_SIZE):
+  """Yield the bytes of the stored `path` (see storage_path) from `start` to `end` inclusive."""
+  storage = figure_storage()
+  if hasattr(storage, "bucket"):
+    extra = {"Range": f"bytes={start}-{'' if end is None else end}"} if start or end is not None else {}
+    body = _s3_object(storage, path).get(**extra)["Body"]
+    try:
+      yield from body.iter_chunks(chunk_size)
+    finally:
+      body.close()
+    return
+
+  with storage.open(path, "rb") as f:
+    f.seek(start)
+    remaining = None if end is None else end - start + 1
+    while remaining is None or remaining > 0:
+      chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+      if not chunk:
+        break
+      if remaining is not None:
+        remaining -= len(chunk)
+      yield chunk
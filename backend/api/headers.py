@@ -0,0 +1,87 @@
+# backend/api/headers.py
+"""
+Deduplicated storage for the request headers attached to telemetry rows.
+
+Headers are hashed and stored once in `request_header_sets`; telemetry rows
+hold a foreign key to the shared set. `expand_headers` turns either the new or
+the legacy inline representation back into a plain dict for exports.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from django.db import connection
+
+from .models import RequestHeaderSet
+
+# digest -> RequestHeaderSet.id, so repeat senders skip the lookup entirely
+_CACHE_SIZE = 4096
+_digest_ids: "OrderedDict[str, int]" = OrderedDict()
+_digest_lock = Lock()
+
+
+def header_digest(headers: dict) -> str:
+  canonical = json.dumps(headers, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+  return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _cached(digest):
+  with _digest_lock:
+    pk = _digest_ids.get(digest)
+    if pk is not None:
+      _digest_ids.move_to_end(digest)
+    return pk
+
+
+def _remember(digest, pk):
+  with _digest_lock:
+    _digest_ids[digest] = pk
+    _digest_ids.move_to_end(digest)
+    while len(_digest_ids) > _CACHE_SIZE:
+      _digest_ids.popitem(last=False)
+
+
+def intern_many(header_dicts) -> list:
+  """Return a RequestHeaderSet id (or None for empty headers) for each dict."""
+  header_dicts = [dict(h) if h else None for h in header_dicts]
+  digests = [header_digest(h) if h else None for h in header_dicts]
+
+  resolved = {}
+  missing = {}
+  for digest, headers in zip(digests, header_dicts):
+    if digest is None or digest in resolved:
+      continue
+    pk = _cached(digest)
+    if pk is not None:
+      resolved[digest] = pk
+    else:
+      missing[digest] = headers
+
+  if missing:
+    RequestHeaderSet.objects.bulk_create(
+      [RequestHeaderSet(digest=d, headers=h) for d, h in missing.items()],
+      ignore_conflicts=True,
+    )
+    rows = RequestHeaderSet.objects.filter(digest__in=list(missing)).values_list("digest", "id")
+    for digest, pk in rows:
+      resolved[digest] = pk
+      # Ids created inside an outer transaction may still be rolled back.
+      if not connection.in_atomic_block:
+        _remember(digest, pk)
+
+  return [resolved.get(d) if d else None for d in digests]
+
+
+def intern_headers(headers) -> int | None:
+  return intern_many([headers])[0]
+
+
+def expand_headers(obj) -> dict:
+  """
+  Headers for a telemetry row, whichever way they were stored. Querysets
+  should select_related('header_set') to avoid a query per row.
+  """
+  if obj.header_set_id:
+    return obj.header_set.headers
+  return obj.request_headers or {}
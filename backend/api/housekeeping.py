@@ -0,0 +1,76 @@
+# backend/api/housekeeping.py
+"""
+Lock-protected runner for periodic cleanup jobs.
+
+Each job takes a lock in the shared cache (`cache.add`), so overlapping beat
+ticks or several workers never run the same job twice at once; jobs are
+written to be safe to repeat anyway. Duration, rows affected and the last
+error are kept per job in the cache and reported through the metrics endpoint.
+"""
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import HOUSEKEEPING
+from .models import ImageData
+
+logger = logging.getLogger(__name__)
+
+JOBS = (
+  "reset-stale-description-flags",
+  "clear-expired-sessions",
+  "clear-expired-reset-codes",
+  "gc-figures",
+)
+
+
+def run_job(name, func, lock_timeout):
+  """
+  Run `func` (returning the number of rows it affected) unless another process
+  holds the job's lock. Returns the row count, or None when skipped.
+  """
+  token = uuid.uuid4().hex
+  if not HOUSEKEEPING.add("lock", name, value=token, timeout=lock_timeout):
+    logger.info(f"[HOUSEKEEPING] {name} already running; skipped")
+    return None
+
+  stats = HOUSEKEEPING.get("stats", name) or {"runs": 0, "rows_total": 0}
+  start = time.monotonic()
+  try:
+    rows = func()
+  except Exception as e:
+    stats.update(last_error=str(e), last_error_at=timezone.now().isoformat())
+    raise
+  else:
+    stats.update(
+      runs=stats["runs"] + 1,
+      rows_total=stats["rows_total"] + rows,
+      last_rows=rows,
+      last_run_at=timezone.now().isoformat(),
+    )
+    if rows:
+      logger.info(f"[HOUSEKEEPING] {name}: {rows} row(s) in {time.monotonic() - start:.2f}s")
+    return rows
+  finally:
+    stats["last_duration_seconds"] = round(time.monotonic() - start, 3)
+    HOUSEKEEPING.set("stats", name, value=stats)
+    if HOUSEKEEPING.get("lock", name) == token:
+      HOUSEKEEPING.delete("lock", name)
+
+
+def housekeeping_stats() -> dict:
+  return {name: HOUSEKEEPING.get("stats", name) for name in JOBS}
+
+
+def reset_stale_description_flags() -> int:
+  """
+  Clear long_desc_generating on images whose description task died without
+  clearing it (worker crash, OOM kill). The flag's age is taken from
+  last_saved, which is refreshed whenever the flag is set.
+  """
+  cutoff = timezone.now() - timedelta(seconds=settings.DESCRIPTION_STALE_AFTER_SECONDS)
+  return ImageData.objects.filter(long_desc_generating=True, last_saved__lt=cutoff).update(long_desc_generating=False)
@@ -0,0 +1,68 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+
+class Command(BaseCommand):
+    help = ('Compare the per-request cost of opening a fresh database connection against the '
+            'configured connection handling (psycopg pool or persistent connections).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Simulated requests per mode')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        fresh = self._measure(iterations, self._fresh_connection)
+        configured = self._measure(iterations, self._configured_connection)
+
+        pool = getattr(connection, 'pool', None)
+        mode = 'pool' if pool is not None else f"CONN_MAX_AGE={connection.settings_dict.get('CONN_MAX_AGE')}"
+
+        self.stdout.write(f'{iterations} simulated requests, each running SELECT 1')
+        self._report('fresh connection', fresh)
+        self._report(f'configured ({mode})', configured)
+
+        saved = statistics.mean(fresh) - statistics.mean(configured)
+        self.stdout.write(self.style.SUCCESS(f'Connection overhead removed per request: {saved:.2f} ms (mean)'))
+        if pool is not None:
+            self.stdout.write(f'Pool stats: {pool.get_stats()}')
+
+    def _measure(self, iterations, fn):
+        fn()  # warm up (DNS, TLS session, pool open)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def _fresh_connection(self):
+        # What every request paid before: connect, query, disconnect.
+        params = connection.get_connection_params()
+        conn = connection.Database.connect(**params)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        finally:
+            conn.close()
+
+    def _configured_connection(self):
+        # Mirror the request lifecycle: request_started/request_finished both
+        # run close_old_connections(), which honours the pool / CONN_MAX_AGE.
+        close_old_connections()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        close_old_connections()
+
+    def _report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        self.stdout.write(
+            f'  {label:<28} mean {statistics.mean(timings):7.2f} ms  '
+            f'p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms'
+        )
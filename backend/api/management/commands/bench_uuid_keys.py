@@ -0,0 +1,53 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.ids import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare insert throughput and primary key index size for random (v4) and '
+            'time-ordered (v7) UUID keys, using temporary tables shaped like the telemetry tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('This benchmark needs PostgreSQL')
+
+        rows, batch_size = options['rows'], options['batch_size']
+        self.stdout.write(f'Inserting {rows} rows per key type in batches of {batch_size}')
+        with transaction.atomic(), connection.cursor() as cursor:
+            for name, generate in GENERATORS.items():
+                table = f'bench_keys_{name}'
+                cursor.execute(
+                    f'CREATE TEMP TABLE {table} (id uuid PRIMARY KEY, user_id uuid NOT NULL, '
+                    f'payload jsonb NOT NULL DEFAULT \'{{}}\', timestamp timestamptz NOT NULL DEFAULT now()) '
+                    f'ON COMMIT DROP'
+                )
+                user_id = uuid.uuid4()
+                start = time.perf_counter()
+                for offset in range(0, rows, batch_size):
+                    count = min(batch_size, rows - offset)
+                    cursor.executemany(
+                        f'INSERT INTO {table} (id, user_id) VALUES (%s, %s)',
+                        [(generate(), user_id) for _ in range(count)],
+                    )
+                elapsed = time.perf_counter() - start
+
+                cursor.execute(f"SELECT pg_relation_size('{table}_pkey'), pg_relation_size('{table}')")
+                index_bytes, table_bytes = cursor.fetchone()
+                self.stdout.write(
+                    f'  {name}: {rows / elapsed:>10,.0f} rows/s  '
+                    f'pkey index {index_bytes / 1024 / 1024:7.1f} MB  table {table_bytes / 1024 / 1024:7.1f} MB'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,158 @@
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from users.models import User
+from api.models import ImageData, GroupData, ScaffoldData, UserAction, MousePositionLog, ScrollLog, JupyterLog
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Seed a realistic volume of synthetic rows inside a transaction, ANALYZE, and check with '
+            'EXPLAIN that each hot query shape uses its composite/partial index. Everything is rolled '
+            'back afterwards; run it against a database that has the current migrations applied.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--rows-per-user', type=int, default=500,
+                            help='Images, groups and rows per telemetry table for each synthetic user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are only checked on PostgreSQL')
+
+        results = []
+        try:
+            with transaction.atomic():
+                start = time.monotonic()
+                probe = self._seed(options['users'], options['rows_per_user'], options['batch_size'])
+                self.stdout.write(f'Seeded synthetic data in {time.monotonic() - start:.1f}s')
+                with connection.cursor() as cursor:
+                    for model in (ImageData, GroupData, UserAction, MousePositionLog, ScrollLog, JupyterLog):
+                        cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+                results = [self._check(label, qs, index) for label, qs, index in self._hot_queries(probe)]
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        failed = [label for label, ok in results if not ok]
+        if failed:
+            raise CommandError(f'{len(failed)} query shape(s) did not use their index: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} hot query shapes use their indexes'))
+
+    def _hot_queries(self, probe):
+        user, scaffold, group, since = probe['user'], probe['scaffold'], probe['group'], probe['since']
+        return [
+            ('storyboard images', ImageData.objects.filter(user=user, in_storyboard=True), 'image_user_storyboard_idx'),
+            ('group images', ImageData.objects.filter(user=user, group_id=group), 'image_user_group_idx'),
+            ('scaffold element images',
+             ImageData.objects.filter(user=user, scaffold_id=scaffold, scaffold_group_number=1), 'image_user_scaffold_idx'),
+            ('descriptions still generating',
+             ImageData.objects.filter(user=user, in_storyboard=True, long_desc_generating=True), 'image_desc_generating_idx'),
+            ('scaffold groups', GroupData.objects.filter(user=user, scaffold_id=scaffold), 'group_user_scaffold_idx'),
+            ('user actions by time',
+             UserAction.objects.filter(user=user, timestamp__gte=since).order_by('timestamp'), 'user_action_user_ts_idx'),
+            ('mouse logs by time',
+             MousePositionLog.objects.filter(user=user, timestamp__gte=since).order_by('timestamp'), 'mouse_log_user_ts_idx'),
+            ('scroll logs by time',
+             ScrollLog.objects.filter(user=user, timestamp__gte=since).order_by('timestamp'), 'scroll_log_user_ts_idx'),
+            ('jupyter logs by time',
+             JupyterLog.objects.filter(user=user, timestamp__gte=since).order_by('timestamp'), 'jupyter_log_user_ts_idx'),
+        ]
+
+    def _check(self, label, queryset, index):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        used = sorted(self._index_names(plan[0]['Plan']))
+        ok = bool(set(used) & self._index_family(index))
+        status = self.style.SUCCESS('PASS') if ok else self.style.ERROR('FAIL')
+        self.stdout.write(f'  {status} {label:<32} expected {index}; plan uses {used or "no index"} '
+                          f'(cost {plan[0]["Plan"]["Total Cost"]})')
+        return label, ok
+
+    def _index_family(self, index):
+        # On partitioned tables the plan names each partition's own copy of the index
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_partition_tree(%s::regclass) t JOIN pg_class c ON c.oid = t.relid',
+                [index],
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def _index_names(self, node):
+        names = {node['Index Name']} if 'Index Name' in node else set()
+        for child in node.get('Plans', []):
+            names |= self._index_names(child)
+        return names
+
+    def _seed(self, user_count, per_user, batch_size):
+        tag = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(username=f'plan-check-{tag}-{i}', email=f'plan-check-{tag}-{i}@example.invalid', password='!')
+            for i in range(user_count)
+        ])
+        scaffolds = ScaffoldData.objects.bulk_create([ScaffoldData(user=u, name='Plan check') for u in users])
+        groups_per_user = max(per_user // 10, 1)
+        groups = GroupData.objects.bulk_create(
+            [GroupData(user=u, scaffold_id=s if g % 2 else None, scaffold_group_number=g % 3 or None)
+             for u, s in zip(users, scaffolds) for g in range(groups_per_user)],
+            batch_size=batch_size,
+        )
+        groups_by_user = {}
+        for group in groups:
+            groups_by_user.setdefault(group.user_id, []).append(group)
+
+        rng = random.Random(0)
+        base = now() - timedelta(days=90)
+        images = []
+        for user, scaffold in zip(users, scaffolds):
+            user_groups = groups_by_user[user.pk]
+            for i in range(per_user):
+                in_scaffold = i % 4 == 0
+                images.append(ImageData(
+                    user=user, filepath=f'{uuid.uuid4()}.png', in_storyboard=i % 3 != 0,
+                    group_id=user_groups[i % len(user_groups)] if i % 2 else None,
+                    scaffold_id=scaffold if in_scaffold else None,
+                    scaffold_group_number=(i % 3) + 1 if in_scaffold else None,
+                    long_desc_generating=i == 0,
+                ))
+        ImageData.objects.bulk_create(images, batch_size=batch_size)
+
+        def stamps():
+            return base + timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+
+        for model, build in (
+            (UserAction, lambda u: UserAction(user=u, element='plan-check', timestamp=stamps())),
+            (MousePositionLog, lambda u: MousePositionLog(user=u, timestamp=stamps())),
+            (ScrollLog, lambda u: ScrollLog(user=u, timestamp=stamps())),
+            (JupyterLog, lambda u: JupyterLog(user=u, cell_type='code')),
+        ):
+            model.objects.bulk_create([build(u) for u in users for _ in range(per_user)], batch_size=batch_size)
+
+        # JupyterLog.timestamp is auto_now_add; spread it out so time filters are selective
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE jupyter_logs SET timestamp = %s + random() * interval '90 days' WHERE cell_type = 'code' "
+                "AND user_id = ANY(%s)",
+                [base, [u.pk for u in users]],
+            )
+        return {
+            'user': users[0],
+            'scaffold': scaffolds[0],
+            'group': groups_by_user[users[0].pk][0],
+            'since': now() - timedelta(days=7),
+        }
@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import ExportFilterError, apply_export_filters, filter_jupyter_logs
+from api.parquet_export import ROW_GROUP_SIZE, TABLES, write_parquet
+
+
+class Command(BaseCommand):
+    help = ('Export a telemetry or Jupyter log table to a zstd-compressed Parquet file, '
+            'streamed from a database cursor one row group at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(TABLES))
+        parser.add_argument('output', help='Path of the .parquet file to write')
+        parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+        parser.add_argument('--start', help='Only rows at or after this ISO date/datetime')
+        parser.add_argument('--end', help='Only rows before this ISO datetime (dates are inclusive)')
+        parser.add_argument('--user', help='Only rows for this user id or username')
+        parser.add_argument('--cell-type', help='jupyter_logs only: filter on cell_type')
+        parser.add_argument('--rehydrate', action='store_true',
+                            help='jupyter_logs only: inline outputs offloaded to the blob store')
+
+    def handle(self, *args, **options):
+        table = options['table']
+        filters = {k: options[k] for k in ('start', 'end', 'user') if options[k]}
+        queryset = None
+        if table == 'jupyter_logs':
+            if options['cell_type']:
+                filters['cell_type'] = options['cell_type']
+            try:
+                queryset = filter_jupyter_logs(filters)
+            except ExportFilterError as e:
+                raise CommandError(str(e))
+        elif filters:
+            try:
+                queryset = apply_export_filters(TABLES[table][0](), filters)
+            except ExportFilterError as e:
+                raise CommandError(str(e))
+
+        start = time.monotonic()
+        rows = write_parquet(table, options['output'], queryset=queryset,
+                             row_group_size=options['row_group_size'], rehydrate=options['rehydrate'])
+        elapsed = time.monotonic() - start
+        size_mb = os.path.getsize(options['output']) / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f'{table}: {rows} rows -> {options["output"]} ({size_mb:.1f} MB) in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.figure_gc import BATCH_SIZE, collect_garbage
+
+
+class Command(BaseCommand):
+    help = ('Reconcile figure files in DATA_PATH with ImageData rows. Reports files without a row '
+            '(optionally moving them to DATA_PATH/.quarantine) and rows whose file is missing. '
+            'Streams both sides in batches, so memory stays flat on very large directories.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quarantine', action='store_true',
+                            help='Move orphan files to DATA_PATH/.quarantine/<timestamp>/ instead of only reporting them')
+        parser.add_argument('--grace-seconds', type=int, default=None,
+                            help='Ignore files modified more recently than this (default: FIGURE_GC_GRACE_SECONDS)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--report', help='Write every finding as NDJSON to this file')
+        parser.add_argument('--show', type=int, default=20, help='Findings of each kind to print')
+
+    def handle(self, *args, **options):
+        report = open(options['report'], 'w', encoding='utf-8') if options['report'] else None
+        shown = {'orphan': 0, 'dangling': 0}
+
+        def emit(kind, record, line):
+            if report:
+                report.write(json.dumps({'kind': kind, **record}) + '\n')
+            if shown[kind] < options['show']:
+                shown[kind] += 1
+                self.stdout.write(line)
+
+        def on_orphan(path, size):
+            emit('orphan', {'path': path, 'size': size}, f'  orphan file   {path} ({size} bytes)')
+
+        def on_dangling(image_id, user_id, path):
+            emit('dangling', {'id': str(image_id), 'user_id': str(user_id), 'path': path},
+                 f'  missing file  {path} (image {image_id}, user {user_id})')
+
+        try:
+            totals = collect_garbage(
+                quarantine=options['quarantine'],
+                grace_seconds=options['grace_seconds'],
+                batch_size=options['batch_size'],
+                on_orphan=on_orphan,
+                on_dangling=on_dangling,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if report:
+                report.close()
+
+        action = f"{totals['quarantined']} quarantined" if options['quarantine'] else 'reported only'
+        self.stdout.write(self.style.SUCCESS(
+            f"{settings.DATA_PATH}: {totals['orphan_files']} orphan file(s), "
+            f"{totals['orphan_bytes'] / 1024 / 1024:.1f} MiB ({action}); "
+            f"{totals['dangling_rows']} row(s) with a missing file"
+        ))
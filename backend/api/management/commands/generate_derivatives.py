@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.derivatives import build_derivatives
+from api.models import ImageData
+from api.tasks import generate_derivatives_task
+
+
+class Command(BaseCommand):
+    help = ('Write the thumb/canvas/print derivatives (and record width, height and format) for '
+            'existing figures. Re-running replaces existing derivatives unless --missing-only is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only figures that have no derivatives recorded yet')
+        parser.add_argument('--async', dest='run_async', action='store_true',
+                            help='Queue one Celery task per figure instead of working inline')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        images = ImageData.objects.order_by('created_at')
+        if options['missing_only']:
+            images = images.filter(derivatives={})
+
+        start = time.monotonic()
+        totals = {'done': 0, 'queued': 0, 'missing': 0, 'failed': 0}
+        for image in images.only('id', 'filepath').iterator(chunk_size=options['batch_size']):
+            if options['run_async']:
+                generate_derivatives_task.delay(str(image.id))
+                totals['queued'] += 1
+                continue
+            try:
+                build_derivatives(image)
+                totals['done'] += 1
+            except FileNotFoundError:
+                totals['missing'] += 1
+            except Exception as e:
+                self.stderr.write(f'{image.filepath}: {e}')
+                totals['failed'] += 1
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['done']} figure(s) processed, {totals['queued']} queued, {totals['missing']} missing, "
+            f"{totals['failed']} failed in {elapsed:.1f}s"
+        ))
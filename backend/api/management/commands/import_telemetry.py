@@ -0,0 +1,236 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+import uuid
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from users.models import User
+from api.batch_encoding import encode_mouse_batch, encode_scroll_batch, packed_for_storage
+from api.blobs import offload_outputs
+from api.headers import intern_many
+from api.ids import uuid7
+from api.models import UserAction
+
+ACTION_TYPES = {choice.value for choice in UserAction.ActionType}
+
+
+def _json_field(row, key, default, expected_type):
+    value = row.get(key, default)
+    if isinstance(value, str):
+        value = json.loads(value) if value.strip() else default
+    if value is None:
+        value = default
+    if not isinstance(value, expected_type):
+        raise ValueError(f'{key} must be a {expected_type.__name__}')
+    return value
+
+
+def _user_action(row, user_id, header_set_id):
+    action = row.get('action') or UserAction.ActionType.CLICK
+    if action not in ACTION_TYPES:
+        raise ValueError(f'unknown action {action!r}')
+    return [row['id'], user_id, action, json.dumps(_json_field(row, 'state_info', {}, dict)),
+            row.get('element') or '', '{}', header_set_id, row['timestamp']]
+
+
+def _mouse_positions(row, user_id, header_set_id):
+    batch, packed = packed_for_storage(encode_mouse_batch, _json_field(row, 'mouse_pos_batch', [], list))
+    return [row['id'], user_id, json.dumps(batch), packed, '{}', header_set_id, row['timestamp']]
+
+
+def _scroll(row, user_id, header_set_id):
+    batch, packed = packed_for_storage(encode_scroll_batch, _json_field(row, 'scroll_batch', [], list))
+    return [row['id'], user_id, json.dumps(batch), packed, '{}', header_set_id, row['timestamp']]
+
+
+def _jupyter(row, user_id, header_set_id):
+    execution_count = row.get('execution_count')
+    return [row['id'], user_id, row.get('cell_type') or '', row.get('source') or '',
+            json.dumps(_json_field(row, 'metadata', {}, dict)),
+            json.dumps(offload_outputs(_json_field(row, 'outputs', [], list))),
+            int(execution_count) if execution_count not in (None, '') else 0,
+            row['timestamp'], '{}', header_set_id]
+
+
+# table -> (id column, COPY column list, row builder)
+TABLES = {
+    'user_actions': ('id', ['id', 'user_id', 'action', 'state_info', 'element',
+                            'request_headers', 'header_set_id', 'timestamp'], _user_action),
+    'mouse_position_logs': ('log_id', ['log_id', 'user_id', 'mouse_pos_batch', 'mouse_pos_packed',
+                                       'request_headers', 'header_set_id', 'timestamp'], _mouse_positions),
+    'scroll_logs': ('log_id', ['log_id', 'user_id', 'scroll_batch', 'scroll_packed',
+                               'request_headers', 'header_set_id', 'timestamp'], _scroll),
+    'jupyter_logs': ('id', ['id', 'user_id', 'cell_type', 'source', 'metadata', 'outputs', 'execution_count',
+                            'timestamp', 'request_headers', 'header_set_id'], _jupyter),
+}
+
+
+class Command(BaseCommand):
+    help = ('Bulk-load telemetry or Jupyter logs from NDJSON or CSV (e.g. our own exports) with '
+            'Postgres COPY FROM STDIN. Users are matched by id or username in batches; rows for '
+            'unknown users or with invalid fields are skipped and counted. Rows whose id already '
+            'exists are left untouched, so re-running an import is safe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(TABLES))
+        parser.add_argument('input', help="NDJSON or CSV file (optionally .gz), or '-' for stdin")
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format; guessed from the file name when omitted')
+        parser.add_argument('--batch-size', type=int, default=20000,
+                            help='Rows per COPY batch; each batch commits on its own')
+        parser.add_argument('--match', choices=['auto', 'id', 'username'], default='auto',
+                            help='How to map rows to users: user_id/user column, username column, or whichever is present')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('COPY import needs PostgreSQL')
+
+        table = options['table']
+        fmt = options['format'] or ('csv' if options['input'].removesuffix('.gz').endswith('.csv') else 'jsonl')
+        self.match = options['match']
+        totals = {'read': 0, 'inserted': 0, 'skipped': 0}
+        start = time.monotonic()
+
+        with self._open(options['input']) as stream:
+            batch = []
+            for row in self._rows(stream, fmt):
+                batch.append(row)
+                if len(batch) >= options['batch_size']:
+                    self._load_batch(table, batch, totals)
+                    batch = []
+                    self._progress(totals, start)
+            if batch:
+                self._load_batch(table, batch, totals)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{table}: {totals['inserted']} inserted, {totals['skipped']} skipped, "
+            f"{totals['read'] - totals['inserted'] - totals['skipped']} already present "
+            f"of {totals['read']} read in {elapsed:.1f}s ({totals['read'] / max(elapsed, 1e-9):,.0f} rows/s)"
+        ))
+
+    def _open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+        return open(path, encoding='utf-8', newline='')
+
+    def _rows(self, stream, fmt):
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise CommandError(f'Line {line_number}: invalid JSON: {e}')
+
+    def _user_ref(self, row):
+        if self.match in ('auto', 'id'):
+            ref = row.get('user_id') or row.get('user')
+            if ref:
+                return 'id', str(ref)
+        if self.match in ('auto', 'username') and row.get('username'):
+            return 'username', row['username']
+        return None, None
+
+    def _resolve_users(self, batch):
+        """Map each row's user reference to an existing user id with two queries per batch."""
+        refs = [self._user_ref(row) for row in batch]
+        ids, usernames = set(), set()
+        for kind, ref in refs:
+            if kind == 'id':
+                try:
+                    ids.add(uuid.UUID(ref))
+                except ValueError:
+                    pass
+            elif kind == 'username':
+                usernames.add(ref)
+        known = {str(pk): pk for pk in User.objects.filter(id__in=ids).values_list('id', flat=True)}
+        known_usernames = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        resolved = []
+        for kind, ref in refs:
+            if kind == 'id':
+                try:
+                    resolved.append(known.get(str(uuid.UUID(ref))))
+                except ValueError:
+                    resolved.append(None)
+            else:
+                resolved.append(known_usernames.get(ref) if kind == 'username' else None)
+        return resolved
+
+    def _load_batch(self, table, batch, totals):
+        id_column, columns, build = TABLES[table]
+        totals['read'] += len(batch)
+        user_ids = self._resolve_users(batch)
+
+        records, headers = [], []
+        for row, user_id in zip(batch, user_ids):
+            if user_id is None:
+                totals['skipped'] += 1
+                continue
+            try:
+                row = dict(row)
+                row['id'] = str(uuid.UUID(str(row.get(id_column) or row.get('id') or uuid7())))
+                row['timestamp'] = self._timestamp(row.get('timestamp')).isoformat()
+                records.append(build(row, user_id, None))
+                headers.append(self._headers(row))
+            except (KeyError, TypeError, ValueError) as e:
+                totals['skipped'] += 1
+                self.stderr.write(f'Skipping row: {e}')
+
+        if not records:
+            return
+        # Header sets are interned only for rows that are actually loaded
+        header_position = columns.index('header_set_id')
+        for record, header_set_id in zip(records, intern_many(headers)):
+            record[header_position] = header_set_id
+        quoted = ', '.join(connection.ops.quote_name(c) for c in columns)
+        staging = f'import_{table}'
+        with transaction.atomic(), connection.cursor() as cursor:
+            # COPY into a scratch table, then insert what is new; COPY alone cannot skip duplicates
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} (LIKE {connection.ops.quote_name(table)} INCLUDING DEFAULTS)'
+            )
+            with cursor.cursor.copy(f'COPY {staging} ({quoted}) FROM STDIN') as copy:
+                for record in records:
+                    copy.write_row(record)
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(table)} ({quoted}) '
+                f'SELECT {quoted} FROM {staging} ON CONFLICT DO NOTHING'
+            )
+            totals['inserted'] += cursor.rowcount
+            # Dropped explicitly: inside an outer transaction this block is only a savepoint, so ON COMMIT DROP would not fire
+            cursor.execute(f'DROP TABLE {staging}')
+
+    def _timestamp(self, value):
+        if not value:
+            return now()
+        parsed = parse_datetime(str(value))
+        if parsed is None:
+            raise ValueError(f'invalid timestamp {value!r}')
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+    def _headers(self, row):
+        headers = row.get('request_headers')
+        if isinstance(headers, str):
+            try:
+                headers = json.loads(headers) if headers.strip() else None
+            except ValueError:
+                headers = None
+        return headers if isinstance(headers, dict) else None
+
+    def _progress(self, totals, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(f"  {totals['read']} rows read, {totals['inserted']} inserted "
+                          f"({totals['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.headers import intern_many
+from api.models import UserAction, MousePositionLog, ScrollLog, JupyterLog
+
+MODELS = {
+    'user_actions': UserAction,
+    'mouse_position_logs': MousePositionLog,
+    'scroll_logs': ScrollLog,
+    'jupyter_logs': JupyterLog,
+}
+
+
+class Command(BaseCommand):
+    help = ('Backfill request_header_sets from the inline request_headers JSON on telemetry rows. '
+            'Each row is pointed at its deduplicated header set and the inline copy is cleared. '
+            'Safe to re-run; only rows without a header set are touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(MODELS), action='append',
+                            help='Limit to one table (repeatable). Defaults to all telemetry tables.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--keep-inline', action='store_true',
+                            help='Link header sets but leave the inline request_headers JSON in place')
+
+    def handle(self, *args, **options):
+        tables = options['table'] or sorted(MODELS)
+        batch_size = options['batch_size']
+        update_fields = ['header_set'] if options['keep_inline'] else ['header_set', 'request_headers']
+
+        for table in tables:
+            model = MODELS[table]
+            pk_name = model._meta.pk.name
+            pending = (
+                model.objects
+                .filter(header_set__isnull=True)
+                .exclude(request_headers={})
+                .only(pk_name, 'request_headers')
+                .order_by(pk_name)
+            )
+
+            start = time.monotonic()
+            done = 0
+            last_pk = None
+            while True:
+                # Keyset pagination: rows drop out of `pending` as they are
+                # linked, and --keep-inline rows are skipped by the pk cursor.
+                batch_qs = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+                batch = list(batch_qs[:batch_size])
+                if not batch:
+                    break
+
+                header_set_ids = intern_many([row.request_headers for row in batch])
+                for row, header_set_id in zip(batch, header_set_ids):
+                    row.header_set_id = header_set_id
+                    if not options['keep_inline']:
+                        row.request_headers = {}
+                model.objects.bulk_update(batch, update_fields)
+
+                done += len(batch)
+                last_pk = batch[-1].pk
+                self.stdout.write(f'{table}: {done} rows linked')
+
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(f'{table}: done, {done} rows in {elapsed:.1f}s'))
+
+        if not options['keep_inline']:
+            self.stdout.write('Run VACUUM (FULL) on the backfilled tables to return the freed space to the OS.')
@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.blobs import offload_outputs
+from api.models import JupyterLog
+
+
+class Command(BaseCommand):
+    help = ('Move large outputs of existing Jupyter logs into the content-addressed blob store, '
+            'leaving references in jupyter_logs.outputs. Safe to re-run; values already '
+            'offloaded or below JUPYTER_BLOB_MIN_BYTES are left alone.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        start = time.monotonic()
+        scanned = changed = 0
+        last_pk = None
+
+        while True:
+            qs = JupyterLog.objects.only('id', 'outputs').order_by('id')
+            if last_pk is not None:
+                qs = qs.filter(id__gt=last_pk)
+            batch = list(qs[:batch_size])
+            if not batch:
+                break
+
+            updated = []
+            for log in batch:
+                outputs = offload_outputs(log.outputs)
+                if json.dumps(outputs, sort_keys=True) != json.dumps(log.outputs, sort_keys=True):
+                    log.outputs = outputs
+                    updated.append(log)
+            JupyterLog.objects.bulk_update(updated, ['outputs'])
+
+            scanned += len(batch)
+            changed += len(updated)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'{scanned} logs scanned, {changed} offloaded')
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(f'Done: {changed} of {scanned} logs offloaded in {elapsed:.1f}s'))
+        if changed:
+            self.stdout.write('Run VACUUM (FULL) on jupyter_logs to return the freed space to the OS.')
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.partitions import PARTITIONED_TABLES, convert_to_partitioned, is_partitioned, maintain_partitions
+
+
+class Command(BaseCommand):
+    help = ('Convert the telemetry tables to monthly range partitions on timestamp. '
+            'Each table is rebuilt in one transaction under an exclusive lock, so run it in a '
+            'maintenance window. Already partitioned tables are skipped; afterwards the '
+            'partitions are maintained by maintain_partitions_task.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=sorted(PARTITIONED_TABLES), action='append',
+                            help='Limit to one table (repeatable). Defaults to all telemetry tables.')
+        parser.add_argument('--months-ahead', type=int, default=settings.TELEMETRY_PARTITIONS_AHEAD,
+                            help='Future monthly partitions to create up front')
+        parser.add_argument('--maintain', action='store_true',
+                            help='Only run the periodic maintenance (create upcoming months, apply retention)')
+
+    def handle(self, *args, **options):
+        if options['maintain']:
+            for table, result in maintain_partitions().items():
+                self.stdout.write(f'{table}: {result}')
+            return
+
+        for table in options['table'] or sorted(PARTITIONED_TABLES):
+            if is_partitioned(table):
+                self.stdout.write(f'{table}: already partitioned, skipping')
+                continue
+
+            start = time.monotonic()
+            try:
+                result = convert_to_partitioned(table, options['months_ahead'])
+            except Exception as e:
+                raise CommandError(f'{table}: conversion failed and was rolled back: {e}')
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f"{table}: {result['rows']} rows moved into monthly partitions from "
+                f"{result['first_month']:%Y-%m} in {elapsed:.1f}s"
+            ))
+            self.stdout.write(f"  The original table is kept as {result['legacy_table']}; drop it once verified.")
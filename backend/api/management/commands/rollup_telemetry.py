@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import RollupWatermark
+from api.rollups import WATERMARK, run_rollups
+
+
+class Command(BaseCommand):
+    help = ('Fold raw telemetry into the rollup tables up to the current lag boundary. '
+            'Useful for the initial backfill; afterwards rollup_telemetry_task keeps them current.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-windows', type=int, default=None,
+                            help='Stop after this many windows (resume by running again)')
+        parser.add_argument('--reset', action='store_true',
+                            help='Forget the watermark and rebuild from the oldest telemetry. '
+                                 'Truncate session_rollups first, or sessions will be counted twice.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            RollupWatermark.objects.filter(name=WATERMARK).delete()
+
+        start = time.monotonic()
+        totals = run_rollups(max_windows=options['max_windows'])
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {totals['windows']} window(s), {totals['events']} events in {elapsed:.1f}s; "
+            f"processed until {totals.get('processed_until')}"
+        ))
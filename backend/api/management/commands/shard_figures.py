@@ -0,0 +1,110 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from api.figure_storage import figure_storage, local_root, shard_path
+
+
+class Command(BaseCommand):
+    help = ('Move figures from the flat DATA_PATH layout into the ab/cd/<name> fan-out, in parallel. '
+            'Each file is moved atomically and only flat files are listed, so an interrupted run '
+            'simply continues where it stopped when started again. Reads fall back to the flat '
+            'path, so the site keeps working while this runs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Files listed and moved per round; bounds memory on huge directories')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many files')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files that would move')
+
+    def handle(self, *args, **options):
+        root = local_root()
+        names = self._local_names(root) if root else self._s3_names()
+        move = self._move_local if root else self._move_s3
+
+        start = time.monotonic()
+        totals = {'moved': 0, 'skipped': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            for name in names:
+                batch.append(name)
+                if options['limit'] and sum(totals.values()) + len(batch) >= options['limit']:
+                    break
+                if len(batch) >= options['batch_size']:
+                    self._run_batch(pool, move, batch, root, totals, options['dry_run'])
+                    self._progress(totals, start)
+                    batch = []
+            if batch:
+                self._run_batch(pool, move, batch, root, totals, options['dry_run'])
+
+        elapsed = time.monotonic() - start
+        verb = 'would move' if options['dry_run'] else 'moved'
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['moved']} figure(s) {verb}, {totals['skipped']} skipped, {totals['failed']} failed "
+            f"in {elapsed:.1f}s ({totals['moved'] / max(elapsed, 1e-9):,.0f} files/s)"
+        ))
+
+    def _run_batch(self, pool, move, batch, root, totals, dry_run):
+        if dry_run:
+            totals['moved'] += len(batch)
+            return
+        for name, result in zip(batch, pool.map(lambda n: self._safe_move(move, root, n), batch)):
+            totals[result] += 1
+
+    def _safe_move(self, move, root, name):
+        try:
+            return move(root, name)
+        except Exception as e:
+            self.stderr.write(f'{name}: {e}')
+            return 'failed'
+
+    def _progress(self, totals, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(f"  {totals['moved']} moved, {totals['skipped']} skipped, {totals['failed']} failed "
+                          f"({totals['moved'] / max(elapsed, 1e-9):,.0f} files/s)")
+
+    # Local disk
+
+    def _local_names(self, root):
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                if shard_path(entry.name) != entry.name:
+                    yield entry.name
+
+    def _move_local(self, root, name):
+        source = os.path.join(root, name)
+        target = os.path.join(root, shard_path(name))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            if os.path.getsize(target) != os.path.getsize(source):
+                self.stderr.write(f'{name}: a different file already exists at {shard_path(name)}; left in place')
+                return 'skipped'
+            os.remove(source)  # already copied by an earlier run
+            return 'moved'
+        os.replace(source, target)
+        return 'moved'
+
+    # S3-compatible storage
+
+    def _s3_names(self):
+        storage = figure_storage()
+        prefix = f"{storage.location.strip('/')}/" if storage.location else ''
+        paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=storage.bucket_name, Prefix=prefix, Delimiter='/'):
+            for obj in page.get('Contents', []):
+                name = obj['Key'][len(prefix):]
+                if name and shard_path(name) != name:
+                    yield name
+
+    def _move_s3(self, root, name):
+        storage = figure_storage()
+        prefix = f"{storage.location.strip('/')}/" if storage.location else ''
+        source, target = prefix + name, prefix + shard_path(name)
+        storage.bucket.Object(target).copy_from(CopySource={'Bucket': storage.bucket_name, 'Key': source})
+        storage.bucket.Object(source).delete()
+        return 'moved'
@@ -0,0 +1,36 @@
+# backend/api/metrics.py
+import os
+
+from django.db import connections
+
+from .cache import cache_stats
+from .housekeeping import housekeeping_stats
+
+
+def database_stats() -> dict:
+  """
+  Connection stats for this process. Pools are per process, so each gunicorn
+  worker or Celery child reports its own numbers.
+  """
+  stats = {}
+  for alias in connections:
+    conn = connections[alias]
+    pool = getattr(conn, "pool", None)
+    if pool is not None:
+      stats[alias] = {"mode": "pool", **pool.get_stats()}
+    else:
+      stats[alias] = {
+        "mode": "persistent" if conn.settings_dict.get("CONN_MAX_AGE") else "per_request",
+        "conn_max_age": conn.settings_dict.get("CONN_MAX_AGE"),
+        "connected": conn.connection is not None,
+      }
+  return stats
+
+
+def collect_metrics() -> dict:
+  return {
+    "pid": os.getpid(),
+    "database": database_stats(),
+    "cache": cache_stats(),
+    "housekeeping": housekeeping_stats(),
+  }
@@ -1,7 +1,28 @@
 from django.db import models
+from django.utils import timezone
 from users.models import User
 import uuid
 
+from .batch_encoding import decode_mouse_batch, decode_scroll_batch
+from .ids import uuid7
+
+class RequestHeaderSet(models.Model):
+  """
+  A distinct set of request headers, stored once and shared by every
+  telemetry row that was sent with it.
+  """
+  digest = models.CharField(max_length=64, unique=True)  # sha256 of the canonical JSON
+  headers = models.JSONField(default=dict)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return self.digest
+
+  class Meta:
+    db_table = 'request_header_sets'
+    managed = True
+
+
 class UserAction(models.Model):
   """
   User actions.
@@ -12,13 +33,14 @@ class UserAction(models.Model):
     DRAG = "drag", "Drag"
     DROP = "drop", "Drop"
   
-  id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  id = models.UUIDField(primary_key=True, default=uuid7, editable=False)  # time-ordered, see api/ids.py
   user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='user_actions')
   action = models.CharField(max_length=10, choices=ActionType.choices, default=ActionType.CLICK)
   state_info = models.JSONField(default=dict)
   element = models.TextField(default="")
-  request_headers = models.JSONField(default=dict)
-  timestamp = models.DateTimeField(auto_now_add=True)
+  request_headers = models.JSONField(default=dict)  # legacy inline copy; new rows use header_set
+  header_set = models.ForeignKey(RequestHeaderSet, on_delete=models.PROTECT, db_column='header_set_id', null=True, blank=True, related_name='+')
+  timestamp = models.DateTimeField(default=timezone.now)  # set explicitly when flushed from the ingest stream
 
   def __str__(self):
     return f"{self.user.username} - {self.action} - {self.timestamp}"
@@ -26,42 +48,69 @@ class UserAction(models.Model):
   class Meta:
     db_table = 'user_actions'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'timestamp'], name='user_action_user_ts_idx'),
+    ]
 
 class ScrollLog(models.Model):
   """
   Logs scroll events.
   """
-  log_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  log_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)  # time-ordered, see api/ids.py
   user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='scroll_logs')
   scroll_batch = models.JSONField(default=list)  # List of scroll positions
-  request_headers = models.JSONField(default=dict)
-  timestamp = models.DateTimeField(auto_now_add=True)
+  scroll_packed = models.BinaryField(null=True, blank=True, editable=False)  # scroll_batch in batch_encoding format
+  request_headers = models.JSONField(default=dict)  # legacy inline copy; new rows use header_set
+  header_set = models.ForeignKey(RequestHeaderSet, on_delete=models.PROTECT, db_column='header_set_id', null=True, blank=True, related_name='+')
+  timestamp = models.DateTimeField(default=timezone.now)  # set explicitly when flushed from the ingest stream
+
+  @property
+  def sessions(self):
+    """Scroll sessions in their JSON shape, whichever column holds them."""
+    if self.scroll_packed is not None:
+      return decode_scroll_batch(bytes(self.scroll_packed))
+    return self.scroll_batch
 
   class Meta:
     db_table = 'scroll_logs'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'timestamp'], name='scroll_log_user_ts_idx'),
+    ]
 
 
 class MousePositionLog(models.Model):
   """
   Logs mouse position (normalized to window)
   """
-  log_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  log_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)  # time-ordered, see api/ids.py
   user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='storystudio_logs')
   mouse_pos_batch = models.JSONField(default=list)  # List of mouse positions
-  request_headers = models.JSONField(default=dict)
-  timestamp = models.DateTimeField(auto_now_add=True)
+  mouse_pos_packed = models.BinaryField(null=True, blank=True, editable=False)  # mouse_pos_batch in batch_encoding format
+  request_headers = models.JSONField(default=dict)  # legacy inline copy; new rows use header_set
+  header_set = models.ForeignKey(RequestHeaderSet, on_delete=models.PROTECT, db_column='header_set_id', null=True, blank=True, related_name='+')
+  timestamp = models.DateTimeField(default=timezone.now)  # set explicitly when flushed from the ingest stream
+
+  @property
+  def positions(self):
+    """Mouse positions in their JSON shape, whichever column holds them."""
+    if self.mouse_pos_packed is not None:
+      return decode_mouse_batch(bytes(self.mouse_pos_packed))
+    return self.mouse_pos_batch
 
   class Meta:
     db_table = 'mouse_position_logs'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'timestamp'], name='mouse_log_user_ts_idx'),
+    ]
 
    
 class JupyterLog(models.Model):
   """
   User-code execution logs from the JupyterHub server.
   """
-  id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+  id = models.UUIDField(primary_key=True, default=uuid7, editable=False)  # time-ordered, see api/ids.py
   user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='jupyter_logs')
   cell_type = models.TextField(default="")
   source = models.TextField(default="")
@@ -69,7 +118,8 @@ class JupyterLog(models.Model):
   outputs = models.JSONField(default=list)
   execution_count = models.IntegerField(default=0)
   timestamp = models.DateTimeField(auto_now_add=True)
-  request_headers = models.JSONField(default=dict)
+  request_headers = models.JSONField(default=dict)  # legacy inline copy; new rows use header_set
+  header_set = models.ForeignKey(RequestHeaderSet, on_delete=models.PROTECT, db_column='header_set_id', null=True, blank=True, related_name='+')
   
   def __str__(self):
     return f"{self.user.username} - {self.cell_type} - {self.timestamp}"
@@ -77,6 +127,9 @@ class JupyterLog(models.Model):
   class Meta:
     db_table = 'jupyter_logs'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'timestamp'], name='jupyter_log_user_ts_idx'),
+    ]
 
 
 class ScaffoldData(models.Model):
@@ -124,6 +177,9 @@ class GroupData(models.Model):
   class Meta:
     db_table = 'group_data'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'scaffold_id'], name='group_user_scaffold_idx'),
+    ]
     
     
 class ImageData(models.Model):
@@ -146,6 +202,11 @@ class ImageData(models.Model):
   has_order = models.BooleanField(default=False)
   order_num = models.IntegerField(default=0)
   index = models.IntegerField(default=0)
+  # Filled in by generate_derivatives_task after upload
+  width = models.PositiveIntegerField(null=True, blank=True)
+  height = models.PositiveIntegerField(null=True, blank=True)
+  image_format = models.CharField(max_length=16, blank=True, default="")
+  derivatives = models.JSONField(default=dict, blank=True)  # size -> {"path", "width", "height"}
   last_saved = models.DateTimeField(auto_now=True)
   created_at = models.DateTimeField(auto_now_add=True)
 
@@ -155,6 +216,13 @@ class ImageData(models.Model):
   class Meta:
     db_table = 'image_data'
     managed = True
+    indexes = [
+      models.Index(fields=['user', 'in_storyboard'], name='image_user_storyboard_idx'),
+      models.Index(fields=['user', 'group_id'], name='image_user_group_idx'),
+      models.Index(fields=['user', 'scaffold_id', 'scaffold_group_number'], name='image_user_scaffold_idx'),
+      # Polled by the narrative task while descriptions are generating; stays tiny
+      models.Index(fields=['user', 'in_storyboard'], condition=models.Q(long_desc_generating=True), name='image_desc_generating_idx'),
+    ]
 
     
 class NarrativeCache(models.Model):
@@ -177,3 +245,118 @@ class NarrativeCache(models.Model):
     db_table = 'narrative_cache'
     managed = True
   
+
+
+class RollupWatermark(models.Model):
+  """
+  How far a rollup job has folded raw telemetry (exclusive upper bound).
+  """
+  name = models.CharField(max_length=64, unique=True)
+  processed_until = models.DateTimeField()
+  updated_at = models.DateTimeField(auto_now=True)
+
+  def __str__(self):
+    return f"{self.name} - {self.processed_until}"
+
+  class Meta:
+    db_table = 'rollup_watermarks'
+    managed = True
+
+
+class UserActivityRollup(models.Model):
+  """
+  Hourly per-user telemetry totals.
+  """
+  user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='activity_rollups')
+  bucket_start = models.DateTimeField()
+  actions = models.IntegerField(default=0)
+  clicks = models.IntegerField(default=0)
+  hovers = models.IntegerField(default=0)
+  drags = models.IntegerField(default=0)
+  drops = models.IntegerField(default=0)
+  mouse_batches = models.IntegerField(default=0)
+  mouse_points = models.IntegerField(default=0)
+  scroll_events = models.IntegerField(default=0)
+  active_ms = models.BigIntegerField(default=0)  # time between events closer than the session gap
+
+  def __str__(self):
+    return f"{self.user.username} - {self.bucket_start}"
+
+  class Meta:
+    db_table = 'user_activity_rollups'
+    managed = True
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'bucket_start'], name='uniq_user_activity_bucket'),
+    ]
+
+
+class ElementActivityRollup(models.Model):
+  """
+  Hourly per-user, per-element action counts and dwell time.
+  """
+  user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='element_rollups')
+  bucket_start = models.DateTimeField()
+  element = models.TextField(default="")
+  clicks = models.IntegerField(default=0)
+  hovers = models.IntegerField(default=0)
+  drags = models.IntegerField(default=0)
+  drops = models.IntegerField(default=0)
+  dwell_ms = models.BigIntegerField(default=0)  # time until the user's next action, capped
+
+  def __str__(self):
+    return f"{self.user.username} - {self.element} - {self.bucket_start}"
+
+  class Meta:
+    db_table = 'element_activity_rollups'
+    managed = True
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'bucket_start', 'element'], name='uniq_element_activity_bucket'),
+    ]
+
+
+class ScrollDepthRollup(models.Model):
+  """
+  Hourly per-user, per-element scroll depth histogram (ten 10% bins).
+  """
+  user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='scroll_rollups')
+  bucket_start = models.DateTimeField()
+  element_id = models.TextField(default="")
+  events = models.IntegerField(default=0)
+  max_depth = models.FloatField(default=0.0)  # highest scrollPercentage seen
+  depth_histogram = models.JSONField(default=list)
+
+  def __str__(self):
+    return f"{self.user.username} - {self.element_id} - {self.bucket_start}"
+
+  class Meta:
+    db_table = 'scroll_depth_rollups'
+    managed = True
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'bucket_start', 'element_id'], name='uniq_scroll_depth_bucket'),
+    ]
+
+
+class SessionRollup(models.Model):
+  """
+  Per-user sessions (events separated by less than the inactivity gap) with
+  their totals. A session still open at the end of a rollup window is
+  extended by the next window.
+  """
+  user = models.ForeignKey(User, on_delete=models.CASCADE, db_column='user_id', related_name='session_rollups')
+  started_at = models.DateTimeField()
+  ended_at = models.DateTimeField()
+  actions = models.IntegerField(default=0)
+  drags = models.IntegerField(default=0)
+  drops = models.IntegerField(default=0)
+  mouse_points = models.IntegerField(default=0)
+  scroll_events = models.IntegerField(default=0)
+
+  def __str__(self):
+    return f"{self.user.username} - {self.started_at}"
+
+  class Meta:
+    db_table = 'session_rollups'
+    managed = True
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'started_at'], name='uniq_session_rollup_start'),
+    ]
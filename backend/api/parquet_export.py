@@ -0,0 +1,193 @@
+# backend/api/parquet_export.py
+"""
+Typed, zstd-compressed Parquet exports of telemetry and Jupyter logs.
+
+Rows are read from `.iterator()` cursors, gathered into column buffers and
+written one row group at a time, so memory is bounded by the row group size.
+JSON columns are flattened where the shape is fixed: mouse batches become one
+row per point and scroll batches one row per scroll event. Free-form JSON
+(state_info, metadata, outputs, request headers) is kept as JSON text.
+"""
+import io
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .blobs import rehydrate_outputs
+from .headers import expand_headers
+from .models import UserAction, MousePositionLog, ScrollLog, JupyterLog
+
+ROW_GROUP_SIZE = 50_000
+CHUNK_SIZE = 2000
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+# Microseconds, the precision of Django DateTimeFields; a ms column would reject them
+_TS = pa.timestamp("us", tz="UTC")
+
+
+def _json(value) -> str:
+  return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _user_action_rows(queryset, **_):
+  for a in queryset.iterator(chunk_size=CHUNK_SIZE):
+    yield {
+      "id": str(a.id), "user_id": str(a.user_id), "timestamp": a.timestamp,
+      "action": a.action, "element": a.element,
+      "state_info": _json(a.state_info), "request_headers": _json(expand_headers(a)),
+    }
+
+
+def _mouse_rows(queryset, **_):
+  for log in queryset.iterator(chunk_size=CHUNK_SIZE):
+    for point in log.positions:
+      yield {
+        "log_id": str(log.log_id), "user_id": str(log.user_id), "logged_at": log.timestamp,
+        "x": point.get("x"), "y": point.get("y"), "point_timestamp": point.get("timestamp"),
+      }
+
+
+def _scroll_rows(queryset, **_):
+  for log in queryset.iterator(chunk_size=CHUNK_SIZE):
+    for session in log.sessions:
+      for event in session.get("events") or []:
+        yield {
+          "log_id": str(log.log_id), "user_id": str(log.user_id), "logged_at": log.timestamp,
+          "element_id": str(session.get("elementId", "")),
+          "client_height": session.get("clientHeight"), "scroll_height": session.get("scrollHeight"),
+          "scroll_top": event.get("scrollTop"), "scroll_percentage": event.get("scrollPercentage"),
+          "event_timestamp": event.get("timestamp"),
+        }
+
+
+def _jupyter_rows(queryset, rehydrate=False, **_):
+  for log in queryset.iterator(chunk_size=CHUNK_SIZE):
+    outputs = rehydrate_outputs(log.outputs) if rehydrate else log.outputs
+    yield {
+      "id": str(log.id), "user_id": str(log.user_id), "timestamp": log.timestamp,
+      "cell_type": log.cell_type, "source": log.source, "execution_count": log.execution_count,
+      "output_types": [o.get("output_type") for o in outputs if isinstance(o, dict)] if isinstance(outputs, list) else [],
+      "metadata": _json(log.metadata), "outputs": _json(outputs), "request_headers": _json(expand_headers(log)),
+    }
+
+
+# name -> (base queryset, schema, row generator)
+TABLES = {
+  "user_actions": (
+    lambda: UserAction.objects.select_related("header_set").order_by("timestamp"),
+    pa.schema([
+      ("id", pa.string()), ("user_id", pa.string()), ("timestamp", _TS),
+      ("action", pa.dictionary(pa.int8(), pa.string())), ("element", pa.string()),
+      ("state_info", pa.string()), ("request_headers", pa.string()),
+    ]),
+    _user_action_rows,
+  ),
+  "mouse_position_logs": (
+    lambda: MousePositionLog.objects.order_by("timestamp"),
+    pa.schema([
+      ("log_id", pa.string()), ("user_id", pa.string()), ("logged_at", _TS),
+      ("x", pa.float64()), ("y", pa.float64()), ("point_timestamp", _TS),
+    ]),
+    _mouse_rows,
+  ),
+  "scroll_logs": (
+    lambda: ScrollLog.objects.order_by("timestamp"),
+    pa.schema([
+      ("log_id", pa.string()), ("user_id", pa.string()), ("logged_at", _TS),
+      ("element_id", pa.string()), ("client_height", pa.float64()), ("scroll_height", pa.float64()),
+      ("scroll_top", pa.float64()), ("scroll_percentage", pa.float64()), ("event_timestamp", _TS),
+    ]),
+    _scroll_rows,
+  ),
+  "jupyter_logs": (
+    lambda: JupyterLog.objects.select_related("header_set").order_by("timestamp", "id"),
+    pa.schema([
+      ("id", pa.string()), ("user_id", pa.string()), ("timestamp", _TS),
+      ("cell_type", pa.dictionary(pa.int8(), pa.string())), ("source", pa.string()),
+      ("execution_count", pa.int64()), ("output_types", pa.list_(pa.string())),
+      ("metadata", pa.string()), ("outputs", pa.string()), ("request_headers", pa.string()),
+    ]),
+    _jupyter_rows,
+  ),
+}
+
+
+def _column(values, field):
+  if pa.types.is_timestamp(field.type):
+    # Client-side timestamps arrive as ISO strings; unparseable ones become null
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), utc=True, errors="coerce", format="ISO8601")
+    return pa.Array.from_pandas(parsed).cast(field.type)
+  if pa.types.is_floating(field.type):
+    return pa.array(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce"), type=field.type)
+  if pa.types.is_dictionary(field.type):
+    return pa.array(values, type=field.type.value_type).dictionary_encode()
+  return pa.array(values, type=field.type)
+
+
+def _record_batches(rows, schema, row_group_size):
+  buffer = {name: [] for name in schema.names}
+  count = 0
+  for row in rows:
+    for name in schema.names:
+      buffer[name].append(row.get(name))
+    count += 1
+    if count == row_group_size:
+      yield pa.Table.from_arrays([_column(buffer[f.name], f) for f in schema], schema=schema)
+      buffer = {name: [] for name in schema.names}
+      count = 0
+  if count:
+    yield pa.Table.from_arrays([_column(buffer[f.name], f) for f in schema], schema=schema)
+
+
+def write_parquet(table_name, sink, queryset=None, row_group_size=ROW_GROUP_SIZE, **options):
+  """Write `table_name` (optionally a filtered queryset of it) to a path or file object. Returns rows written."""
+  base_queryset, schema, row_generator = TABLES[table_name]
+  queryset = base_queryset() if queryset is None else queryset
+  rows = 0
+  with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+    for table in _record_batches(row_generator(queryset, **options), schema, row_group_size):
+      writer.write_table(table, row_group_size=row_group_size)
+      rows += table.num_rows
+  return rows
+
+
+class _DrainableBuffer(io.RawIOBase):
+  """Write-only sink whose contents can be taken after each row group."""
+  def __init__(self):
+    self._chunks = []
+    self._position = 0
+
+  def writable(self):
+    return True
+
+  def write(self, data):
+    self._chunks.append(bytes(data))
+    self._position += len(data)
+    return len(data)
+
+  def tell(self):
+    return self._position
+
+  def drain(self) -> bytes:
+    data = b"".join(self._chunks)
+    self._chunks = []
+    return data
+
+
+def iter_parquet(table_name, queryset=None, row_group_size=ROW_GROUP_SIZE, **options):
+  """Parquet file bytes for a streaming response, produced one row group at a time."""
+  base_queryset, schema, row_generator = TABLES[table_name]
+  queryset = base_queryset() if queryset is None else queryset
+  sink = _DrainableBuffer()
+  writer = pq.ParquetWriter(sink, schema, compression="zstd")
+  try:
+    for table in _record_batches(row_generator(queryset, **options), schema, row_group_size):
+      writer.write_table(table, row_group_size=row_group_size)
+      chunk = sink.drain()
+      if chunk:
+        yield chunk
+  finally:
+    writer.close()
+  yield sink.drain()
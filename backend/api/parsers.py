@@ -0,0 +1,30 @@
+# backend/api/parsers.py
+import io
+import zlib
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class GzipJSONParser(JSONParser):
+  """
+  JSON parser that also accepts `Content-Encoding: gzip` bodies. The
+  decompressed size is capped at JUPYTER_BATCH_MAX_BYTES.
+  """
+  def parse(self, stream, media_type=None, parser_context=None):
+    request = (parser_context or {}).get('request')
+    encoding = request.META.get('HTTP_CONTENT_ENCODING', '').lower() if request is not None else ''
+    if encoding == 'gzip':
+      limit = settings.JUPYTER_BATCH_MAX_BYTES
+      decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+      try:
+        body = decompressor.decompress(stream.read(), limit)
+      except zlib.error as e:
+        raise ParseError(f'Invalid gzip body: {e}')
+      if decompressor.unconsumed_tail:
+        raise ParseError(f'Decompressed body exceeds {limit} bytes')
+      stream = io.BytesIO(body)
+    elif encoding not in ('', 'identity'):
+      raise ParseError(f'Unsupported Content-Encoding: {encoding}')
+    return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,259 @@
+# backend/api/partitions.py
+"""
+Monthly range partitioning for the telemetry tables.
+
+Each table is partitioned on `timestamp` into `<table>_pYYYYMM` children plus a
+`<table>_default` catch-all. `convert_to_partitioned` rebuilds an existing
+plain table once (see the partition_telemetry_tables command); afterwards
+`maintain_partitions` keeps future months created and detaches or drops
+months that fall outside the retention window, so nothing is deleted row by row.
+"""
+import logging
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils.timezone import now
+
+logger = logging.getLogger(__name__)
+
+# table -> primary key column; the partition key has to be part of the key
+PARTITIONED_TABLES = {
+  "user_actions": "id",
+  "mouse_position_logs": "log_id",
+  "scroll_logs": "log_id",
+  "jupyter_logs": "id",
+}
+
+PARTITION_KEY = "timestamp"
+
+
+def _qn(name: str) -> str:
+  return connection.ops.quote_name(name)
+
+
+def _add_months(month: date, n: int) -> date:
+  index = month.year * 12 + month.month - 1 + n
+  return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+  today = now().date()
+  return date(today.year, today.month, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+  return f"{table}_p{month:%Y%m}"
+
+
+def _partition_month(table: str, name: str) -> date | None:
+  match = re.fullmatch(re.escape(table) + r"_p(\d{4})(\d{2})", name)
+  return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def is_partitioned(table: str) -> bool:
+  with connection.cursor() as cursor:
+    cursor.execute(
+      "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+      "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace",
+      [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(table: str) -> list[str]:
+  with connection.cursor() as cursor:
+    cursor.execute(
+      "SELECT child.relname FROM pg_inherits i "
+      "JOIN pg_class parent ON parent.oid = i.inhparent "
+      "JOIN pg_class child ON child.oid = i.inhrelid "
+      "WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace "
+      "ORDER BY child.relname",
+      [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_month_partition(table: str, month: date) -> bool:
+  """
+  Create the partition for `month` if missing. Returns True if it was created.
+
+  Postgres refuses to create a partition while the default partition holds
+  rows in its range, so any such rows are moved into the new partition in the
+  same transaction: it is built as a plain table, filled from the default
+  partition, then attached.
+  """
+  name = partition_name(table, month)
+  partitions = list_partitions(table)
+  if name in partitions:
+    return False
+  bounds = [f"{month:%Y-%m-%d} 00:00:00+00", f"{_add_months(month, 1):%Y-%m-%d} 00:00:00+00"]
+  default = f"{table}_default"
+  in_range = f"{_qn(PARTITION_KEY)} >= %s AND {_qn(PARTITION_KEY)} < %s"
+
+  with transaction.atomic(), connection.cursor() as cursor:
+    stray = False
+    if default in partitions:
+      # Keep new rows for this month out of the default partition until the new one is attached
+      cursor.execute(f"LOCK TABLE {_qn(default)} IN ACCESS EXCLUSIVE MODE")
+      cursor.execute(f"SELECT 1 FROM {_qn(default)} WHERE {in_range} LIMIT 1", bounds)
+      stray = cursor.fetchone() is not None
+
+    if not stray:
+      cursor.execute(f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(table)} FOR VALUES FROM (%s) TO (%s)", bounds)
+      return True
+
+    cursor.execute(f"CREATE TABLE {_qn(name)} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)")
+    cursor.execute(
+      f"WITH moved AS (DELETE FROM {_qn(default)} WHERE {in_range} RETURNING *) "
+      f"INSERT INTO {_qn(name)} SELECT * FROM moved",
+      bounds,
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(name)} FOR VALUES FROM (%s) TO (%s)", bounds)
+  logger.warning(f"Moved {moved} row(s) from {default} into new partition {name}")
+  return True
+
+
+def ensure_partitions(table: str, months_ahead: int) -> list[str]:
+  """Create partitions from the current month through `months_ahead` months out."""
+  start = current_month()
+  created = []
+  for offset in range(months_ahead + 1):
+    month = _add_months(start, offset)
+    if create_month_partition(table, month):
+      created.append(partition_name(table, month))
+  return created
+
+
+def expire_partitions(table: str, retention_months: int, action: str) -> list[str]:
+  """
+  Detach (or detach and drop) monthly partitions that lie entirely before the
+  retention window. Detached tables keep their data and can be archived or
+  re-attached by hand.
+  """
+  if retention_months <= 0:
+    return []
+  cutoff = _add_months(current_month(), -retention_months)
+  expired = []
+  for name in list_partitions(table):
+    month = _partition_month(table, name)
+    if month is None or _add_months(month, 1) > cutoff:
+      continue
+    with transaction.atomic(), connection.cursor() as cursor:
+      cursor.execute(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(name)}")
+      if action == "drop":
+        cursor.execute(f"DROP TABLE {_qn(name)}")
+    expired.append(name)
+  return expired
+
+
+def maintain_partitions() -> dict:
+  """Pre-create upcoming partitions and apply retention on every partitioned telemetry table."""
+  summary = {}
+  for table in PARTITIONED_TABLES:
+    if not is_partitioned(table):
+      continue
+    try:
+      created = ensure_partitions(table, settings.TELEMETRY_PARTITIONS_AHEAD)
+      expired = expire_partitions(table, settings.TELEMETRY_RETENTION_MONTHS, settings.TELEMETRY_RETENTION_ACTION)
+    except DatabaseError as e:
+      # e.g. rows for a new month already sitting in the default partition
+      logger.error(f"Partition maintenance failed for {table}: {e}")
+      summary[table] = {"error": str(e)}
+      continue
+    if created or expired:
+      logger.info(f"{table}: created {created}, {settings.TELEMETRY_RETENTION_ACTION} {expired}")
+    summary[table] = {"created": created, "expired": expired}
+  return summary
+
+
+LEGACY_SUFFIX = "_unpartitioned"
+
+
+def _legacy_name(name: str) -> str:
+  # Postgres identifiers are capped at 63 bytes
+  return name[:63 - len(LEGACY_SUFFIX)] + LEGACY_SUFFIX
+
+
+def _primary_key_name(cursor, table: str) -> str:
+  cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+  return cursor.fetchone()[0]
+
+
+def _move_foreign_keys(cursor, source: str, target: str):
+  """
+  Recreate `source`'s foreign keys on `target` under their original names and
+  drop them from `source`, so the kept legacy table never blocks deleting a user.
+  """
+  cursor.execute(
+    "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+    "WHERE conrelid = %s::regclass AND contype = 'f'",
+    [source],
+  )
+  for name, definition in cursor.fetchall():
+    cursor.execute(f"ALTER TABLE {_qn(source)} DROP CONSTRAINT {_qn(name)}")
+    cursor.execute(f"ALTER TABLE {_qn(target)} ADD CONSTRAINT {_qn(name)} {definition}")
+
+
+def _move_indexes(cursor, source: str, target: str):
+  """
+  Rename `source`'s indexes to `<name>_unpartitioned` and recreate them on
+  `target` under the original names, which migrations and check_query_plans
+  refer to. Non-unique indexes only; the primary key is recreated with the
+  partition key.
+  """
+  cursor.execute(
+    "SELECT ic.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+    "JOIN pg_class ic ON ic.oid = i.indexrelid "
+    "WHERE i.indrelid = %s::regclass AND NOT i.indisunique",
+    [source],
+  )
+  for name, definition in cursor.fetchall():
+    cursor.execute(f"ALTER INDEX {_qn(name)} RENAME TO {_qn(_legacy_name(name))}")
+    definition = re.sub(r" ON (ONLY )?(\S+\.)?" + re.escape(source) + r" ", f" ON {_qn(target)} ", definition, count=1)
+    cursor.execute(definition)
+
+
+def convert_to_partitioned(table: str, months_ahead: int) -> dict:
+  """
+  Rebuild a plain telemetry table as a partitioned one, in a single
+  transaction holding an exclusive lock on the table. The new table takes over
+  the original primary key, foreign key and index names. The original is kept
+  as `<table>_unpartitioned`, without foreign keys and with its indexes renamed
+  `<name>_unpartitioned`, until it is dropped by hand.
+  """
+  pk = PARTITIONED_TABLES[table]
+  staging = f"{table}_partitioned"
+  legacy = _legacy_name(table)
+
+  with transaction.atomic(), connection.cursor() as cursor:
+    cursor.execute(f"LOCK TABLE {_qn(table)} IN ACCESS EXCLUSIVE MODE")
+    pk_name = _primary_key_name(cursor, table)
+    cursor.execute(f"ALTER TABLE {_qn(table)} RENAME CONSTRAINT {_qn(pk_name)} TO {_qn(_legacy_name(pk_name))}")
+    cursor.execute(
+      f"CREATE TABLE {_qn(staging)} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE, "
+      f"CONSTRAINT {_qn(pk_name)} PRIMARY KEY ({_qn(pk)}, {_qn(PARTITION_KEY)})) PARTITION BY RANGE ({_qn(PARTITION_KEY)})"
+    )
+    _move_foreign_keys(cursor, table, staging)
+    _move_indexes(cursor, table, staging)
+
+    cursor.execute(f"SELECT min({_qn(PARTITION_KEY)}), count(*) FROM {_qn(table)}")
+    oldest, rows = cursor.fetchone()
+    first = date(oldest.year, oldest.month, 1) if oldest else current_month()
+    month = first
+    last = _add_months(current_month(), months_ahead)
+    while month <= last:
+      cursor.execute(
+        f"CREATE TABLE {_qn(partition_name(table, month))} PARTITION OF {_qn(staging)} FOR VALUES FROM (%s) TO (%s)",
+        [f"{month:%Y-%m-%d} 00:00:00+00", f"{_add_months(month, 1):%Y-%m-%d} 00:00:00+00"],
+      )
+      month = _add_months(month, 1)
+    cursor.execute(f"CREATE TABLE {_qn(table + '_default')} PARTITION OF {_qn(staging)} DEFAULT")
+
+    cursor.execute(f"INSERT INTO {_qn(staging)} SELECT * FROM {_qn(table)}")
+    cursor.execute(f"ALTER TABLE {_qn(table)} RENAME TO {_qn(legacy)}")
+    cursor.execute(f"ALTER TABLE {_qn(staging)} RENAME TO {_qn(table)}")
+
+  return {"rows": rows, "first_month": first, "legacy_table": legacy}
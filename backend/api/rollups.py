@@ -0,0 +1,332 @@
+# backend/api/rollups.py
+"""
+Fold raw telemetry into small precomputed rollup tables.
+
+`run_rollups` walks forward from a stored watermark in hour-aligned windows.
+Each window's UserAction, MousePositionLog and ScrollLog rows are loaded into
+pandas frames once and aggregated with vectorized group-bys into:
+
+  - UserActivityRollup     hourly per-user totals and active time
+  - ElementActivityRollup  hourly per-user, per-element counts and dwell time
+  - ScrollDepthRollup      hourly per-user, per-element scroll depth histograms
+  - SessionRollup          sessions split on TELEMETRY_SESSION_GAP_SECONDS
+
+A window and its watermark advance commit together, so each window is folded
+exactly once; bucket rows are upserted, so re-running after resetting the
+watermark rewrites them instead of double counting.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Func, IntegerField, Min
+from django.utils.timezone import now
+
+from .batch_encoding import packed_mouse_count
+from .models import (
+  UserAction, MousePositionLog, ScrollLog,
+  RollupWatermark, UserActivityRollup, ElementActivityRollup, ScrollDepthRollup, SessionRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "telemetry"
+DEPTH_BINS = 10
+ACTION_TYPES = [choice.value for choice in UserAction.ActionType]
+
+
+def _floor_hour(dt):
+  return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _initial_start():
+  firsts = [m.objects.aggregate(t=Min("timestamp"))["t"] for m in (UserAction, MousePositionLog, ScrollLog)]
+  firsts = [t for t in firsts if t is not None]
+  return _floor_hour(min(firsts)) if firsts else None
+
+
+def _frame(rows, columns) -> pd.DataFrame:
+  df = pd.DataFrame.from_records(rows, columns=columns)
+  df["user_id"] = df["user_id"].astype(str)
+  if not df.empty:
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+  else:
+    df["timestamp"] = pd.Series(dtype="datetime64[ns, UTC]")
+  return df
+
+
+class JSONArrayLength(Func):
+  """
+  Length of a JSON array column, or 0 when a (legacy) row holds an object or
+  scalar; plain jsonb_array_length raises on those and aborts the query.
+  """
+  template = "CASE WHEN jsonb_typeof(%(expressions)s) = 'array' THEN jsonb_array_length(%(expressions)s) ELSE 0 END"
+  output_field = IntegerField()
+
+  def as_sqlite(self, compiler, connection, **extra_context):
+    return self.as_sql(
+      compiler, connection,
+      template="CASE WHEN json_type(%(expressions)s) = 'array' THEN json_array_length(%(expressions)s) ELSE 0 END",
+      **extra_context,
+    )
+
+
+def _load_actions(start, end) -> pd.DataFrame:
+  rows = (
+    UserAction.objects
+    .filter(timestamp__gte=start, timestamp__lt=end)
+    .values_list("user_id", "timestamp", "action", "element")
+    .iterator(chunk_size=5000)
+  )
+  return _frame(rows, ["user_id", "timestamp", "action", "element"])
+
+
+def _load_mouse(start, end) -> pd.DataFrame:
+  rows = (
+    MousePositionLog.objects
+    .filter(timestamp__gte=start, timestamp__lt=end)
+    .annotate(points=JSONArrayLength(F("mouse_pos_batch")))
+    .values_list("user_id", "timestamp", "points", "mouse_pos_packed")
+    .iterator(chunk_size=5000)
+  )
+  # Packed rows keep an empty JSON list; their count lives in the packed header.
+  records = (
+    (user_id, ts, packed_mouse_count(bytes(packed)) if packed is not None else (points or 0))
+    for user_id, ts, points, packed in rows
+  )
+  return _frame(records, ["user_id", "timestamp", "points"])
+
+
+def _load_scroll(start, end) -> pd.DataFrame:
+  """One row per scroll event, stamped with its log row's timestamp."""
+  users, stamps, elements, depths = [], [], [], []
+  rows = (
+    ScrollLog.objects
+    .filter(timestamp__gte=start, timestamp__lt=end)
+    .only("user_id", "timestamp", "scroll_batch", "scroll_packed")
+    .iterator(chunk_size=1000)
+  )
+  for row in rows:
+    for session in row.sessions:
+      events = session.get("events") or []
+      users.extend([row.user_id] * len(events))
+      stamps.extend([row.timestamp] * len(events))
+      elements.extend([str(session.get("elementId", ""))] * len(events))
+      depths.extend(e.get("scrollPercentage", 0) or 0 for e in events)
+  df = _frame(zip(users, stamps, elements), ["user_id", "timestamp", "element_id"])
+  df["depth"] = np.clip(np.asarray(depths, dtype=np.float64), 0, 100)
+  return df
+
+
+def _open_sessions(user_ids, start, gap) -> dict:
+  """
+  Latest session per user that a window starting at `start` may still extend.
+  Sessions ending at or after `start` were written by an earlier run over this
+  window (the watermark was reset) and are rewritten by the upsert instead.
+  """
+  sessions = (
+    SessionRollup.objects
+    .filter(user_id__in=user_ids, ended_at__gte=start - gap, ended_at__lt=start)
+    .order_by("user_id", "-ended_at")
+    .distinct("user_id")
+  )
+  return {str(s.user_id): s for s in sessions}
+
+
+def _bucket(df):
+  return df["timestamp"].dt.floor("h")
+
+
+def _user_activity(actions, mouse, scroll, events) -> pd.DataFrame:
+  keys = ["user_id", "bucket_start"]
+  action_counts = [f"{a}s" for a in ACTION_TYPES]
+  frames = [events.assign(bucket_start=_bucket(events)).groupby(keys)["active_ms"].sum()]
+  if not actions.empty:
+    counts = pd.crosstab([actions["user_id"], _bucket(actions).rename("bucket_start")], actions["action"])
+    counts = counts.reindex(columns=ACTION_TYPES, fill_value=0)
+    counts.columns = action_counts
+    counts["actions"] = counts.sum(axis=1)
+    frames.append(counts)
+  if not mouse.empty:
+    frames.append(mouse.assign(bucket_start=_bucket(mouse)).groupby(keys).agg(
+      mouse_batches=("points", "size"), mouse_points=("points", "sum"),
+    ))
+  if not scroll.empty:
+    frames.append(scroll.assign(bucket_start=_bucket(scroll)).groupby(keys).size().rename("scroll_events"))
+
+  columns = ["actions", *action_counts, "mouse_batches", "mouse_points", "scroll_events", "active_ms"]
+  df = pd.concat(frames, axis=1).reindex(columns=columns).fillna(0).astype(np.int64)
+  return df.reset_index()
+
+
+def _element_activity(actions) -> pd.DataFrame:
+  if actions.empty:
+    return pd.DataFrame()
+  df = actions.sort_values(["user_id", "timestamp"])
+  cap = pd.Timedelta(seconds=settings.TELEMETRY_DWELL_CAP_SECONDS)
+  # Dwell on an element runs until the user's next action in this window.
+  dwell = df.groupby("user_id")["timestamp"].shift(-1) - df["timestamp"]
+  df = df.assign(
+    bucket_start=_bucket(df),
+    dwell_ms=(dwell.clip(upper=cap).dt.total_seconds() * 1000).fillna(0).astype(np.int64),
+  )
+  for action in ACTION_TYPES:
+    df[f"{action}s"] = (df["action"] == action).astype(np.int64)
+  columns = [f"{a}s" for a in ACTION_TYPES] + ["dwell_ms"]
+  return df.groupby(["user_id", "bucket_start", "element"])[columns].sum().reset_index()
+
+
+def _scroll_depth(scroll) -> pd.DataFrame:
+  if scroll.empty:
+    return pd.DataFrame()
+  df = scroll.assign(
+    bucket_start=_bucket(scroll),
+    bin=np.minimum((scroll["depth"].to_numpy() // (100 / DEPTH_BINS)).astype(np.int64), DEPTH_BINS - 1),
+  )
+  keys = ["user_id", "bucket_start", "element_id"]
+  histograms = df.groupby(keys + ["bin"]).size().unstack("bin", fill_value=0).reindex(columns=range(DEPTH_BINS), fill_value=0)
+  summary = df.groupby(keys).agg(events=("depth", "size"), max_depth=("depth", "max"))
+  summary["depth_histogram"] = histograms.to_numpy().tolist()
+  return summary.reset_index()
+
+
+def _sessionize(actions, mouse, scroll, start, gap):
+  """
+  Merge all event timestamps per user, split on the inactivity gap and
+  aggregate per session. Returns the event frame (with active_ms) and the
+  session aggregates, where `continues` marks a session extending one that
+  an earlier window left open.
+  """
+  events = pd.concat([
+    actions.assign(kind="action", weight=1, drag=actions["action"].eq("drag").astype(np.int64), drop=actions["action"].eq("drop").astype(np.int64)),
+    mouse.assign(kind="mouse", weight=mouse["points"], drag=0, drop=0),
+    scroll.assign(kind="scroll", weight=1, drag=0, drop=0),
+  ], ignore_index=True)[["user_id", "timestamp", "kind", "weight", "drag", "drop"]]
+  events = events.sort_values(["user_id", "timestamp"], kind="stable").reset_index(drop=True)
+
+  open_sessions = _open_sessions(events["user_id"].unique().tolist(), start, gap)
+  last_seen = {u: s.ended_at for u, s in open_sessions.items()}
+
+  prev = events.groupby("user_id")["timestamp"].shift(1)
+  first = prev.isna()
+  # map() yields float NaN when no user has an open session; keep the column datetime
+  prev = prev.where(~first, pd.to_datetime(events["user_id"].map(last_seen), utc=True))
+  delta = events["timestamp"] - prev
+  new_session = delta.isna() | (delta > gap)
+  events["active_ms"] = (delta.where(~new_session, pd.Timedelta(0)).dt.total_seconds() * 1000).fillna(0).astype(np.int64)
+  # A user's first event always starts a group here, even when it extends an open session.
+  events["session"] = (new_session | first).cumsum()
+
+  sessions = events.groupby("session").agg(
+    user_id=("user_id", "first"),
+    started_at=("timestamp", "min"),
+    ended_at=("timestamp", "max"),
+    drags=("drag", "sum"),
+    drops=("drop", "sum"),
+  )
+  per_kind = events.pivot_table(index="session", columns="kind", values="weight", aggfunc="sum", fill_value=0)
+  per_kind = per_kind.reindex(columns=["action", "mouse", "scroll"], fill_value=0)
+  sessions["actions"] = per_kind["action"]
+  sessions["mouse_points"] = per_kind["mouse"]
+  sessions["scroll_events"] = per_kind["scroll"]
+  session_starts = events.groupby("session").head(1).index
+  sessions["continues"] = ~new_session[session_starts].to_numpy()
+  return events, sessions.reset_index(drop=True), open_sessions
+
+
+def _write_sessions(sessions, open_sessions) -> int:
+  counters = ["actions", "drags", "drops", "mouse_points", "scroll_events"]
+  new_rows = []
+  for row in sessions.itertuples(index=False):
+    if row.continues:
+      session = open_sessions[row.user_id]
+      session.ended_at = row.ended_at.to_pydatetime()
+      for field in counters:
+        setattr(session, field, getattr(session, field) + int(getattr(row, field)))
+      session.save(update_fields=["ended_at"] + counters)
+    else:
+      new_rows.append(SessionRollup(
+        user_id=row.user_id,
+        started_at=row.started_at.to_pydatetime(),
+        ended_at=row.ended_at.to_pydatetime(),
+        **{field: int(getattr(row, field)) for field in counters},
+      ))
+  SessionRollup.objects.bulk_create(
+    new_rows, update_conflicts=True,
+    unique_fields=["user", "started_at"], update_fields=["ended_at"] + counters,
+  )
+  return len(new_rows)
+
+
+def _python_value(value):
+  if isinstance(value, pd.Timestamp):
+    return value.to_pydatetime()
+  if isinstance(value, np.generic):
+    return value.item()
+  return value
+
+
+def _upsert(model, df, unique_fields, batch_size=1000) -> int:
+  if df.empty:
+    return 0
+  update_fields = [c for c in df.columns if c not in unique_fields and c != "user_id"]
+  objs = [model(**{k: _python_value(v) for k, v in record.items()}) for record in df.to_dict("records")]
+  model.objects.bulk_create(
+    objs, batch_size=batch_size, update_conflicts=True,
+    unique_fields=["user" if f == "user_id" else f for f in unique_fields],
+    update_fields=update_fields,
+  )
+  return len(objs)
+
+
+def fold_window(start, end) -> dict:
+  """Aggregate raw telemetry in [start, end) into the rollup tables."""
+  gap = timedelta(seconds=settings.TELEMETRY_SESSION_GAP_SECONDS)
+  actions = _load_actions(start, end)
+  mouse = _load_mouse(start, end)
+  scroll = _load_scroll(start, end)
+  if actions.empty and mouse.empty and scroll.empty:
+    return {"events": 0}
+
+  events, sessions, open_sessions = _sessionize(actions, mouse, scroll, start, gap)
+  return {
+    "events": len(events),
+    "user_buckets": _upsert(UserActivityRollup, _user_activity(actions, mouse, scroll, events), ["user_id", "bucket_start"]),
+    "element_buckets": _upsert(ElementActivityRollup, _element_activity(actions), ["user_id", "bucket_start", "element"]),
+    "scroll_buckets": _upsert(ScrollDepthRollup, _scroll_depth(scroll), ["user_id", "bucket_start", "element_id"]),
+    "new_sessions": _write_sessions(sessions, open_sessions),
+  }
+
+
+def run_rollups(max_windows: int | None = None) -> dict:
+  """
+  Fold every complete window since the watermark. Windows end at least
+  TELEMETRY_ROLLUP_LAG_SECONDS in the past so buffered telemetry has landed.
+  """
+  window = timedelta(hours=settings.TELEMETRY_ROLLUP_WINDOW_HOURS)
+  limit = _floor_hour(now() - timedelta(seconds=settings.TELEMETRY_ROLLUP_LAG_SECONDS))
+
+  watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+  start = watermark.processed_until if watermark else _initial_start()
+  totals = {"windows": 0, "events": 0}
+  if start is None:
+    return totals
+
+  while start < limit and (max_windows is None or totals["windows"] < max_windows):
+    end = min(start + window, limit)
+    with transaction.atomic():
+      # Lock the watermark so overlapping runs cannot fold the same window twice.
+      current = RollupWatermark.objects.select_for_update().filter(name=WATERMARK).first()
+      if current is not None and current.processed_until != start:
+        break
+      counts = fold_window(start, end)
+      RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={"processed_until": end})
+    totals["windows"] += 1
+    totals["events"] += counts["events"]
+    start = end
+
+  totals["processed_until"] = start
+  return totals
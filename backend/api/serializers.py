@@ -4,8 +4,19 @@ from .models import (
   UserAction, MousePositionLog, ScrollLog,
   GroupData, ScaffoldData
 )
+from .headers import expand_headers
 
-class UserActionSerializer(serializers.ModelSerializer):
+
+class ExpandedHeadersMixin:
+  """Render telemetry rows with their full request headers, however they are stored."""
+  def to_representation(self, instance):
+    data = super().to_representation(instance)
+    data.pop('header_set', None)
+    data['request_headers'] = expand_headers(instance)
+    return data
+
+
+class UserActionSerializer(ExpandedHeadersMixin, serializers.ModelSerializer):
   class Meta:
     model = UserAction
     fields = '__all__'
@@ -25,21 +36,39 @@ class NarrativeCacheSerializer(serializers.ModelSerializer):
     model = NarrativeCache
     fields = '__all__'
 
-class MousePositionLogSerializer(serializers.ModelSerializer):
+class MousePositionLogSerializer(ExpandedHeadersMixin, serializers.ModelSerializer):
   class Meta:
     model = MousePositionLog
-    fields = '__all__'
+    exclude = ('mouse_pos_packed',)
+    read_only_fields = ('timestamp',)
+
+  def to_representation(self, instance):
+    data = super().to_representation(instance)
+    data['mouse_pos_batch'] = instance.positions
+    return data
 
-class ScrollLogSerializer(serializers.ModelSerializer):
+class ScrollLogSerializer(ExpandedHeadersMixin, serializers.ModelSerializer):
   class Meta:
     model = ScrollLog
-    fields = '__all__'
+    exclude = ('scroll_packed',)
+    read_only_fields = ('timestamp',)
+
+  def to_representation(self, instance):
+    data = super().to_representation(instance)
+    data['scroll_batch'] = instance.sessions
+    return data
 
-class JupyterLogsSerializer(serializers.ModelSerializer):
+class JupyterLogsSerializer(ExpandedHeadersMixin, serializers.ModelSerializer):
   class Meta:
     model = JupyterLog
     fields = '__all__'
 
+class JupyterLogBatchItemSerializer(serializers.ModelSerializer):
+  """One cell event in a batch upload; user and headers are set by the view."""
+  class Meta:
+    model = JupyterLog
+    fields = ('cell_type', 'source', 'metadata', 'outputs', 'execution_count')
+
 class ScaffoldDataSerializer(serializers.ModelSerializer):
   class Meta:
     model = ScaffoldData
@@ -0,0 +1,179 @@
+# backend/api/session_analytics.py
+"""
+Server-side session reconstruction for one user and day.
+
+UserAction, MousePositionLog, ScrollLog and JupyterLog rows are each read in
+timestamp order through server-side cursors and combined with heapq.merge, so
+only one chunk per table is held in memory. The merged stream is split into
+sessions wherever the user was idle for longer than
+TELEMETRY_SESSION_GAP_SECONDS. Results are cached per (user, day).
+"""
+import heapq
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import F
+from django.utils.timezone import now
+
+from .batch_encoding import packed_mouse_count
+from .cache import SESSIONS
+from .models import UserAction, MousePositionLog, ScrollLog, JupyterLog
+from .rollups import JSONArrayLength
+
+KIND_ACTION = "action"
+KIND_MOUSE = "mouse"
+KIND_SCROLL = "scroll"
+KIND_JUPYTER = "jupyter"
+
+CHUNK_SIZE = 2000
+# Days that can still receive events are cached briefly; past days for a day.
+OPEN_DAY_CACHE_SECONDS = 300
+CLOSED_DAY_CACHE_SECONDS = 24 * 60 * 60
+
+
+def _action_events(user_id, start, end):
+  rows = (
+    UserAction.objects
+    .filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+    .order_by("timestamp")
+    .values_list("timestamp", "action", "element")
+    .iterator(chunk_size=CHUNK_SIZE)
+  )
+  for ts, action, element in rows:
+    yield ts, KIND_ACTION, {"action": action, "element": element}
+
+
+def _mouse_events(user_id, start, end):
+  rows = (
+    MousePositionLog.objects
+    .filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+    .order_by("timestamp")
+    .annotate(points=JSONArrayLength(F("mouse_pos_batch")))  # 0 for legacy non-array rows
+    .values_list("timestamp", "points", "mouse_pos_packed")
+    .iterator(chunk_size=CHUNK_SIZE)
+  )
+  for ts, points, packed in rows:
+    yield ts, KIND_MOUSE, {"points": packed_mouse_count(bytes(packed)) if packed is not None else (points or 0)}
+
+
+def _scroll_events(user_id, start, end):
+  rows = (
+    ScrollLog.objects
+    .filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+    .order_by("timestamp")
+    .only("timestamp", "scroll_batch", "scroll_packed")
+    .iterator(chunk_size=CHUNK_SIZE)
+  )
+  for row in rows:
+    sessions = row.sessions
+    yield row.timestamp, KIND_SCROLL, {
+      "elements": [s.get("elementId") for s in sessions],
+      "events": sum(len(s.get("events") or []) for s in sessions),
+      "max_depth": max((e.get("scrollPercentage") or 0 for s in sessions for e in s.get("events") or []), default=0),
+    }
+
+
+def _jupyter_events(user_id, start, end):
+  rows = (
+    JupyterLog.objects
+    .filter(user_id=user_id, timestamp__gte=start, timestamp__lt=end)
+    .order_by("timestamp")
+    .values_list("timestamp", "cell_type", "execution_count")
+    .iterator(chunk_size=CHUNK_SIZE)
+  )
+  for ts, cell_type, execution_count in rows:
+    yield ts, KIND_JUPYTER, {"cell_type": cell_type, "execution_count": execution_count}
+
+
+def iter_events(user_id, start, end):
+  """All of a user's telemetry in [start, end) as (timestamp, kind, detail), oldest first."""
+  return heapq.merge(
+    _action_events(user_id, start, end),
+    _mouse_events(user_id, start, end),
+    _scroll_events(user_id, start, end),
+    _jupyter_events(user_id, start, end),
+    key=itemgetter(0),
+  )
+
+
+class _SessionBuilder:
+  def __init__(self, started_at, include_timeline):
+    self.started_at = started_at
+    self.ended_at = started_at
+    self.counts = Counter()
+    self.actions = Counter()
+    self.elements = set()
+    self.mouse_points = 0
+    self.scroll_events = 0
+    self.max_scroll_depth = 0
+    self.timeline = [] if include_timeline else None
+
+  def add(self, ts, kind, detail):
+    self.ended_at = ts
+    self.counts[kind] += 1
+    if kind == KIND_ACTION:
+      self.actions[detail["action"]] += 1
+      self.elements.add(detail["element"])
+    elif kind == KIND_MOUSE:
+      self.mouse_points += detail["points"]
+    elif kind == KIND_SCROLL:
+      self.scroll_events += detail["events"]
+      self.max_scroll_depth = max(self.max_scroll_depth, detail["max_depth"])
+    if self.timeline is not None:
+      self.timeline.append({"timestamp": ts.isoformat(), "kind": kind, **detail})
+
+  def result(self):
+    data = {
+      "started_at": self.started_at.isoformat(),
+      "ended_at": self.ended_at.isoformat(),
+      "duration_seconds": (self.ended_at - self.started_at).total_seconds(),
+      "event_counts": dict(self.counts),
+      "action_counts": dict(self.actions),
+      "distinct_elements": len(self.elements),
+      "mouse_points": self.mouse_points,
+      "scroll_events": self.scroll_events,
+      "max_scroll_depth": self.max_scroll_depth,
+    }
+    if self.timeline is not None:
+      data["timeline"] = self.timeline
+    return data
+
+
+def reconstruct_sessions(user_id, day, include_timeline=False) -> dict:
+  """Sessions for `user_id` on the UTC calendar day `day`, with summary metrics."""
+  start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+  end = start + timedelta(days=1)
+  gap = timedelta(seconds=settings.TELEMETRY_SESSION_GAP_SECONDS)
+
+  sessions = []
+  current = None
+  for ts, kind, detail in iter_events(user_id, start, end):
+    if current is None or ts - current.ended_at > gap:
+      if current is not None:
+        sessions.append(current.result())
+      current = _SessionBuilder(ts, include_timeline)
+    current.add(ts, kind, detail)
+  if current is not None:
+    sessions.append(current.result())
+
+  return {
+    "user_id": str(user_id),
+    "date": day.isoformat(),
+    "session_gap_seconds": settings.TELEMETRY_SESSION_GAP_SECONDS,
+    "session_count": len(sessions),
+    "active_seconds": sum(s["duration_seconds"] for s in sessions),
+    "event_count": sum(sum(s["event_counts"].values()) for s in sessions),
+    "sessions": sessions,
+  }
+
+
+def cached_sessions(user_id, day, include_timeline=False) -> dict:
+  key = (user_id, day.isoformat(), int(include_timeline), settings.TELEMETRY_SESSION_GAP_SECONDS)
+  result = SESSIONS.get(*key)
+  if result is None:
+    result = reconstruct_sessions(user_id, day, include_timeline)
+    still_open = day >= (now() - timedelta(seconds=settings.TELEMETRY_SESSION_GAP_SECONDS)).date()
+    SESSIONS.set(*key, value=result, timeout=OPEN_DAY_CACHE_SECONDS if still_open else CLOSED_DAY_CACHE_SECONDS)
+  return result
@@ -0,0 +1,12 @@
+# backend/api/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import NARRATIVES
+from .models import NarrativeCache
+
+
+@receiver(post_save, sender=NarrativeCache)
+@receiver(post_delete, sender=NarrativeCache)
+def drop_cached_narrative(sender, instance, **kwargs):
+  NARRATIVES.delete(instance.user_id)
@@ -1,14 +1,18 @@
 # backend/api/tasks.py
 from celery import shared_task
-import os, base64, re, logging, json, mimetypes, time
+import os, base64, re, logging, json, time
+from datetime import timedelta
 from functools import lru_cache
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 from openai import OpenAI
 from .pydandtic import STORY_SCAFFOLDS
+from .figure_storage import figure_exists, read_figure, content_type
+from .derivatives import build_derivatives, derivative_name
 
 logger = logging.getLogger(__name__)
 
@@ -93,24 +97,19 @@ def _load_prompt(filename: str) -> str:
 
 @lru_cache(maxsize=256)
 def _image_to_data_url(relative_path: str) -> str | None:
-    """Convert an image on disk to a base64 data URL for OpenAI image inputs."""
-    data_root = os.getenv('DATA_PATH')
-    if not data_root:
-        logger.warning("DATA_PATH is not configured; skipping image embedding for feedback.")
-        return None
-
+    """Convert a stored figure to a base64 data URL for OpenAI image inputs."""
     try:
-        # Images are stored directly in DATA_PATH with filename only
-        abs_path = os.path.abspath(os.path.join(data_root, relative_path))
-        if not os.path.exists(abs_path):
-            logger.warning(f"Image not found for feedback embedding: {abs_path}")
+        # The canvas-sized derivative is plenty for feedback and far smaller than most originals
+        canvas = derivative_name(relative_path, "canvas")
+        if figure_exists(canvas):
+            relative_path = canvas
+        elif not figure_exists(relative_path):
+            logger.warning(f"Image not found for feedback embedding: {relative_path}")
             return None
 
-        with open(abs_path, "rb") as f:
-            encoded = base64.b64encode(f.read()).decode("ascii")
-
-        mime_type, _ = mimetypes.guess_type(abs_path)
-        if not mime_type:
+        encoded = base64.b64encode(read_figure(relative_path)).decode("ascii")
+        mime_type = content_type(relative_path)
+        if not mime_type.startswith("image/"):
             mime_type = "image/jpeg"
 
         return f"data:{mime_type};base64,{encoded}"
@@ -1067,14 +1066,27 @@ def generate_feedback_task(user_id: str, storyboard_id: str | None = None) -> li
         logger.error(f"Error generating feedback for user {user_id}: {e}")
         return [{"title": "Error", "text": str(e)}]
 
+@shared_task(ignore_result=True)
+def generate_derivatives_task(image_id):
+    """Record an upload's size/format and write its thumb/canvas/print derivatives."""
+    ImageData = _get_model('api', 'ImageData')
+    image = ImageData.objects.filter(id=image_id).first()
+    if image is None:
+        return None
+    try:
+        derivatives = build_derivatives(image)
+    except FileNotFoundError:
+        logger.warning(f"[DERIVATIVES] Original missing for image {image_id}: {image.filepath}")
+        return None
+    return sorted(derivatives)
+
+
 @shared_task
 def generate_description_task(image_id):
     ImageData = _get_model('api', 'ImageData')            # <— late import
     try:
         image = ImageData.objects.get(id=image_id)
-        image_path = os.path.join(os.getenv('DATA_PATH'), image.filepath)
-        with open(image_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
+        b64 = base64.b64encode(read_figure(image.filepath)).decode("utf-8")
 
         prompt = _load_prompt('generate_description.txt')
         client = _openai_client()
@@ -1108,6 +1120,69 @@ def generate_description_task(image_id):
         return f"Error generating description for image {image_id}: {e}"
 
 
+@shared_task(ignore_result=True)
+def flush_telemetry_task():
+    """Drain buffered telemetry events from the Redis stream into the database."""
+    from .telemetry import drain_stream, stream_ingest_enabled  # late import; needs the app registry
+
+    if not stream_ingest_enabled():
+        return None  # sync mode writes rows in the request; nothing is queued
+    counts = drain_stream()
+    if any(counts.values()):
+        logger.info(f"[TELEMETRY] Flushed {counts}")
+    return counts
+
+
+@shared_task(ignore_result=True)
+def rollup_telemetry_task():
+    """Fold telemetry since the last run into the rollup tables."""
+    from .rollups import run_rollups  # late import; needs the app registry
+
+    totals = run_rollups()
+    if totals["windows"]:
+        logger.info(f"[ROLLUPS] Folded {totals}")
+    return totals
+
+
+@shared_task(ignore_result=True)
+def maintain_partitions_task():
+    """Pre-create upcoming monthly telemetry partitions and expire old ones."""
+    from .partitions import maintain_partitions  # late import; needs the app registry
+
+    return maintain_partitions()
+
+
+@shared_task(ignore_result=True)
+def reset_stale_description_flags_task():
+    """Clear long_desc_generating flags left behind by crashed description tasks."""
+    from .housekeeping import run_job, reset_stale_description_flags  # late import; needs the app registry
+
+    return run_job(
+        "reset-stale-description-flags",
+        reset_stale_description_flags,
+        lock_timeout=settings.HOUSEKEEPING_STALE_FLAGS_INTERVAL_SECONDS,
+    )
+
+
+@shared_task(ignore_result=True)
+def gc_figures_task():
+    """Reconcile figure files with ImageData rows; quarantines orphans only if FIGURE_GC_QUARANTINE is set."""
+    from .figure_gc import collect_garbage  # late import; needs the app registry
+    from .figure_storage import local_root
+    from .housekeeping import run_job
+
+    if local_root() is None:
+        return None  # the scan only covers local figure storage
+
+    def reconcile():
+        totals = collect_garbage(quarantine=settings.FIGURE_GC_QUARANTINE)
+        if totals["orphan_files"] or totals["dangling_rows"]:
+            logger.warning(f"[FIGURE GC] {totals}")
+        return totals["orphan_files"] + totals["dangling_rows"]
+
+    return run_job("gc-figures", reconcile, lock_timeout=settings.FIGURE_GC_INTERVAL_SECONDS)
+
+
 def _build_figure_dict(images_queryset, skip_missing_desc=True):
     """
     Build a dictionary of figures from an images queryset.
@@ -1443,7 +1518,8 @@ def generate_narrative_task(user_id, story_structure_id=None, use_groups=False):
                 f"[NARRATIVE] Generating missing description for {image.filepath}"
             )
             image.long_desc_generating = True
-            image.save(update_fields=["long_desc_generating"])
+            # last_saved marks when generation started, for the stale-flag cleanup
+            image.save(update_fields=["long_desc_generating", "last_saved"])
 
             # Run description generation synchronously (blocking)
             generate_description_task(image.id)
@@ -1454,8 +1530,10 @@ def generate_narrative_task(user_id, story_structure_id=None, use_groups=False):
         wait_deadline = time.time() + wait_timeout_seconds
 
         while True:
+            # Flags older than DESCRIPTION_STALE_AFTER_SECONDS belong to dead tasks; don't wait on them
+            stale_cutoff = timezone.now() - timedelta(seconds=settings.DESCRIPTION_STALE_AFTER_SECONDS)
             pending_desc_qs = storyboard_qs.filter(
-                long_desc_generating=True
+                long_desc_generating=True, last_saved__gte=stale_cutoff
             ).filter(
                 Q(long_desc__isnull=True)
                 | Q(long_desc__exact="")
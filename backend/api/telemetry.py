@@ -0,0 +1,258 @@
+# backend/api/telemetry.py
+"""
+Buffered ingestion for the high-volume telemetry endpoints.
+
+In "stream" mode the log views only do cheap validation, append the event to a
+Redis stream and answer 202. `flush_telemetry_task` drains the stream in
+batches through a consumer group and writes rows with bulk_create. If a batch
+fails, its entries are retried one at a time and the ones that still fail go to
+the dead-letter stream (TELEMETRY_DEAD_LETTER_KEY), so one bad event cannot
+hold up the rest.
+"""
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+
+import redis
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils.timezone import now
+
+from users.models import User
+from .models import UserAction, MousePositionLog, ScrollLog
+from .headers import intern_many
+from .ids import uuid7
+from .batch_encoding import packed_for_storage, encode_mouse_batch, encode_scroll_batch
+
+logger = logging.getLogger(__name__)
+
+KIND_USER_ACTION = "user_action"
+KIND_MOUSE_POSITIONS = "mouse_positions"
+KIND_SCROLL = "scroll"
+
+CONSUMER_GROUP = "telemetry-writers"
+
+_redis_client = None
+
+
+def _redis():
+  global _redis_client
+  if _redis_client is None:
+    _redis_client = redis.Redis.from_url(settings.TELEMETRY_REDIS_URL)
+  return _redis_client
+
+
+def stream_ingest_enabled() -> bool:
+  return settings.TELEMETRY_INGEST_MODE == "stream"
+
+
+def enqueue_event(kind: str, user_id, payload: dict, headers: dict) -> str:
+  """
+  Append one telemetry event to the stream. Returns the id the row will be
+  stored under once flushed, so callers can still report it.
+  """
+  record_id = str(uuid7())
+  _redis().xadd(
+    settings.TELEMETRY_STREAM_KEY,
+    {
+      "kind": kind,
+      "id": record_id,
+      "user_id": str(user_id),
+      "received_at": now().isoformat(),
+      "payload": json.dumps(payload),
+      "headers": json.dumps(headers),
+    },
+    maxlen=settings.TELEMETRY_STREAM_MAXLEN,
+    approximate=True,
+  )
+  return record_id
+
+
+def _build_user_action(record_id, user_id, payload, header_set_id, received_at):
+  if not isinstance(payload.get("state_info") or {}, dict):
+    raise TypeError("state_info must be an object")
+  return UserAction(
+    id=record_id,
+    user_id=user_id,
+    action=payload["action"],
+    state_info=payload.get("state_info") or {},
+    element=payload.get("element") or "",
+    header_set_id=header_set_id,
+    timestamp=received_at,
+  )
+
+
+def _build_mouse_positions(record_id, user_id, payload, header_set_id, received_at):
+  mouse_pos_batch, packed = packed_for_storage(encode_mouse_batch, payload["pos_batch"])
+  return MousePositionLog(
+    log_id=record_id,
+    user_id=user_id,
+    mouse_pos_batch=mouse_pos_batch,
+    mouse_pos_packed=packed,
+    header_set_id=header_set_id,
+    timestamp=received_at,
+  )
+
+
+def _build_scroll(record_id, user_id, payload, header_set_id, received_at):
+  scroll_batch, packed = packed_for_storage(encode_scroll_batch, payload["sessions"])
+  return ScrollLog(
+    log_id=record_id,
+    user_id=user_id,
+    scroll_batch=scroll_batch,
+    scroll_packed=packed,
+    header_set_id=header_set_id,
+    timestamp=received_at,
+  )
+
+
+_BUILDERS = {
+  KIND_USER_ACTION: (UserAction, _build_user_action),
+  KIND_MOUSE_POSITIONS: (MousePositionLog, _build_mouse_positions),
+  KIND_SCROLL: (ScrollLog, _build_scroll),
+}
+
+
+def _ensure_group(client):
+  try:
+    client.xgroup_create(settings.TELEMETRY_STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
+  except redis.ResponseError as e:
+    if "BUSYGROUP" not in str(e):
+      raise
+
+
+def _decode(fields: dict) -> dict:
+  return {k.decode(): v.decode() for k, v in fields.items()}
+
+
+def validate_payload(kind: str, payload: dict) -> str | None:
+  """Shape checks done by the views before enqueueing. Returns an error message, or None."""
+  if kind == KIND_USER_ACTION and not isinstance(payload.get("state_info") or {}, dict):
+    return "state_info must be an object"
+  if kind == KIND_MOUSE_POSITIONS and not isinstance(payload.get("pos_batch"), list):
+    return "pos_batch must be a list"
+  if kind == KIND_SCROLL and not isinstance(payload.get("sessions"), list):
+    return "sessions must be a list"
+  return None
+
+
+def _write_batch(entries) -> dict:
+  """Turn stream entries into model rows and insert them, one bulk_create per model."""
+  decoded = []
+  for entry_id, fields in entries:
+    try:
+      event = _decode(fields)
+      decoded.append((entry_id, event, json.loads(event["payload"]), json.loads(event["headers"])))
+    except (KeyError, ValueError) as e:
+      logger.warning(f"Dropping malformed telemetry entry {entry_id}: {e}")
+
+  # Users can be deleted between enqueue and flush; skip their events rather
+  # than failing the whole batch on the foreign key.
+  user_ids = {event["user_id"] for _, event, _, _ in decoded}
+  known_users = {str(pk) for pk in User.objects.filter(id__in=user_ids).values_list("id", flat=True)}
+
+  # Resolve header sets up front, outside the insert transaction
+  header_set_ids = intern_many([headers for _, _, _, headers in decoded])
+
+  rows = {kind: [] for kind in _BUILDERS}
+  for (entry_id, event, payload, _), header_set_id in zip(decoded, header_set_ids):
+    if event["user_id"] not in known_users or event["kind"] not in _BUILDERS:
+      continue
+    _, build = _BUILDERS[event["kind"]]
+    try:
+      received_at = datetime.fromisoformat(event["received_at"])
+      rows[event["kind"]].append(build(event["id"], event["user_id"], payload, header_set_id, received_at))
+    except (KeyError, TypeError, ValueError) as e:
+      logger.warning(f"Dropping malformed telemetry entry {entry_id}: {e}")
+
+  counts = {}
+  with transaction.atomic():
+    for kind, objs in rows.items():
+      if objs:
+        model, _ = _BUILDERS[kind]
+        model.objects.bulk_create(objs, batch_size=settings.TELEMETRY_FLUSH_BATCH_SIZE, ignore_conflicts=True)
+      counts[kind] = len(objs)
+  return counts
+
+
+def _dead_letter(client, entry_id, fields, error):
+  client.xadd(
+    settings.TELEMETRY_DEAD_LETTER_KEY,
+    {**fields, b"entry_id": entry_id, b"error": str(error)[:1000]},
+    maxlen=settings.TELEMETRY_STREAM_MAXLEN,
+    approximate=True,
+  )
+
+
+def _write_or_dead_letter(client, entries) -> dict:
+  """
+  Write a batch; if it fails, write its entries one at a time and move the ones
+  that still fail to the dead-letter stream. Errors that mean the database is
+  unreachable are raised instead, leaving the batch pending for a later run.
+  """
+  try:
+    return _write_batch(entries)
+  except (OperationalError, InterfaceError):
+    raise
+  except Exception as e:
+    logger.warning(f"Telemetry batch of {len(entries)} failed ({e}); retrying entries one at a time")
+
+  totals = {kind: 0 for kind in _BUILDERS}
+  for entry_id, fields in entries:
+    try:
+      counts = _write_batch([(entry_id, fields)])
+    except (OperationalError, InterfaceError):
+      raise
+    except Exception as e:
+      logger.error(f"Moving telemetry entry {entry_id} to {settings.TELEMETRY_DEAD_LETTER_KEY}: {e}")
+      _dead_letter(client, entry_id, fields, e)
+      continue
+    for kind, count in counts.items():
+      totals[kind] += count
+  return totals
+
+
+def drain_stream(batch_size: int | None = None, time_budget: float | None = None) -> dict:
+  """
+  Drain queued telemetry into the database.
+
+  Entries are acknowledged (and deleted) only after their batch commits or is
+  dead-lettered, so a crashed worker leaves them pending; a later run reclaims
+  them once they have sat idle for several flush intervals.
+  """
+  client = _redis()
+  stream = settings.TELEMETRY_STREAM_KEY
+  batch_size = batch_size or settings.TELEMETRY_FLUSH_BATCH_SIZE
+  time_budget = time_budget if time_budget is not None else settings.TELEMETRY_FLUSH_INTERVAL_SECONDS
+  consumer = f"{socket.gethostname()}-{os.getpid()}"
+  deadline = time.monotonic() + time_budget
+
+  _ensure_group(client)
+
+  totals = {kind: 0 for kind in _BUILDERS}
+  reclaim_idle_ms = int(settings.TELEMETRY_FLUSH_INTERVAL_SECONDS * 1000 * 4)
+  _, entries, *_ = client.xautoclaim(stream, CONSUMER_GROUP, consumer, min_idle_time=reclaim_idle_ms, count=batch_size)
+
+  while True:
+    if not entries:
+      response = client.xreadgroup(CONSUMER_GROUP, consumer, {stream: ">"}, count=batch_size)
+      entries = response[0][1] if response else []
+      if not entries:
+        break
+
+    for kind, count in _write_or_dead_letter(client, entries).items():
+      totals[kind] += count
+
+    entry_ids = [entry_id for entry_id, _ in entries]
+    client.xack(stream, CONSUMER_GROUP, *entry_ids)
+    client.xdel(stream, *entry_ids)
+    entries = []
+
+    # Leave the rest for the next scheduled run instead of overlapping it.
+    if time.monotonic() >= deadline:
+      break
+
+  return totals
@@ -0,0 +1,393 @@
+import gzip
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+import pyarrow.parquet as pq
+from PIL import Image
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework.exceptions import ParseError
+
+from users.auth_cache import cache_user, get_cached_user
+from users.models import PasswordResetCode, User
+from users.tasks import send_password_reset_task, send_reset_email_task
+from .batch_encoding import encode_mouse_batch, encode_scroll_batch, packed_for_storage
+from .cache import HOUSEKEEPING, USERS
+from .derivatives import build_derivatives, derivative_name
+from .estimates import estimated_count
+from .figure_gc import QUARANTINE_DIR, collect_garbage
+from .figure_storage import delete_figure, figure_exists, read_figure, save_figure, shard_path, storage_path
+from .housekeeping import run_job
+from .models import (
+  ImageData, JupyterLog, MousePositionLog, RequestHeaderSet, RollupWatermark, ScrollLog, SessionRollup, UserAction, UserActivityRollup,
+)
+from .parquet_export import PARQUET_CONTENT_TYPE
+from .parsers import GzipJSONParser
+from .rollups import WATERMARK, run_rollups
+
+MOUSE_BATCH = [
+  {"x": 0.1234, "y": 0.5, "timestamp": "2025-01-01T12:00:00.000Z"},
+  {"x": 0.25, "y": 0.75, "timestamp": "2025-01-01T12:00:00.016Z"},
+]
+SCROLL_SESSIONS = [
+  {
+    "elementId": "story-panel",
+    "clientHeight": 800,
+    "scrollHeight": 2400,
+    "events": [
+      {"scrollTop": 0.0, "scrollPercentage": 0.0, "timestamp": "2025-01-01T12:00:00.000Z"},
+      {"scrollTop": 412.5, "scrollPercentage": 25.78, "timestamp": "2025-01-01T12:00:01.250Z"},
+    ],
+  },
+]
+
+
+@override_settings(TELEMETRY_PACKED_BATCHES=True)
+class PackedBatchRoundTripTests(TestCase):
+  """Packed rows read back through the model properties in their original JSON shape."""
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create_user(email="packed@example.com", username="packed")
+
+  def test_mouse_positions_round_trip(self):
+    mouse_pos_batch, packed = packed_for_storage(encode_mouse_batch, MOUSE_BATCH)
+    self.assertIsNotNone(packed)
+    log = MousePositionLog.objects.create(user=self.user, mouse_pos_batch=mouse_pos_batch, mouse_pos_packed=packed)
+
+    self.assertEqual(MousePositionLog.objects.get(pk=log.pk).positions, MOUSE_BATCH)
+
+  def test_scroll_sessions_round_trip(self):
+    scroll_batch, packed = packed_for_storage(encode_scroll_batch, SCROLL_SESSIONS)
+    self.assertIsNotNone(packed)
+    log = ScrollLog.objects.create(user=self.user, scroll_batch=scroll_batch, scroll_packed=packed)
+
+    self.assertEqual(ScrollLog.objects.get(pk=log.pk).sessions, SCROLL_SESSIONS)
+
+
+def _write_temp(suffix, text):
+  fd, path = tempfile.mkstemp(suffix=suffix)
+  with os.fdopen(fd, "w", encoding="utf-8") as f:
+    f.write(text)
+  return path
+
+
+@skipUnless(connection.vendor == "postgresql", "import_telemetry loads with COPY")
+class ImportTelemetryTests(TestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="import@example.com", username="importer")
+    self.action_id = str(uuid.uuid4())
+    rows = [
+      {"id": self.action_id, "username": "importer", "action": "click", "element": "card",
+       "timestamp": "2025-01-01T12:00:00Z", "request_headers": {"User-Agent": "kept"}},
+      {"username": "nobody", "action": "click", "request_headers": {"User-Agent": "unknown user"}},
+      {"username": "importer", "action": "teleport", "request_headers": {"User-Agent": "bad action"}},
+    ]
+    self.path = _write_temp(".jsonl", "".join(json.dumps(row) + "\n" for row in rows))
+    self.addCleanup(os.remove, self.path)
+
+  def test_round_trip_skips_bad_rows_and_duplicates(self):
+    call_command("import_telemetry", "user_actions", self.path, stdout=StringIO(), stderr=StringIO())
+
+    action = UserAction.objects.select_related("header_set").get()
+    self.assertEqual(str(action.id), self.action_id)
+    self.assertEqual((action.user_id, action.element), (self.user.id, "card"))
+    self.assertEqual(action.header_set.headers, {"User-Agent": "kept"})
+    # Skipped rows must not leave header sets behind
+    self.assertEqual(RequestHeaderSet.objects.count(), 1)
+
+    out = StringIO()
+    call_command("import_telemetry", "user_actions", self.path, stdout=out, stderr=StringIO())
+    self.assertEqual(UserAction.objects.count(), 1)
+    self.assertIn("0 inserted, 2 skipped, 1 already present", out.getvalue())
+
+
+@override_settings(AUTH_USER_CACHE_TTL=300, AUTH_USER_LOCAL_CACHE_TTL=10)
+class AuthUserCacheTests(TestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="cached@example.com", username="cached", password="not-in-cache", first_name="Ada")
+    self.addCleanup(USERS.delete, str(self.user.pk))
+
+  def test_cache_holds_only_auth_fields(self):
+    cache_user(self.user)
+
+    self.assertEqual(set(USERS.get(str(self.user.pk))), {"id", "username", "is_active", "is_staff", "is_superuser"})
+    cached = get_cached_user(self.user.pk)
+    self.assertEqual((cached.pk, cached.username, cached.is_staff), (self.user.pk, "cached", False))
+    self.assertIn("password", cached.get_deferred_fields())
+
+  def test_saving_a_cached_user_keeps_other_fields(self):
+    cache_user(self.user)
+    cached = get_cached_user(self.user.pk)
+    self.assertEqual(cached.first_name, "Ada")  # deferred fields load on access
+
+    cached.last_name = "Lovelace"
+    cached.save()
+    stored = User.objects.get(pk=self.user.pk)
+    self.assertEqual((stored.first_name, stored.last_name), ("Ada", "Lovelace"))
+    self.assertTrue(stored.check_password("not-in-cache"))
+    self.assertIsNone(get_cached_user(self.user.pk))  # the save signal invalidated the entry
+
+
+class PasswordResetTaskTests(TestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="reset@example.com", username="resetter")
+
+  @mock.patch("users.tasks.send_mail", side_effect=[smtplib.SMTPException("try again"), 1])
+  def test_retried_send_keeps_the_generated_code(self, send_mail):
+    with mock.patch.object(send_reset_email_task, "delay", side_effect=lambda *args: send_reset_email_task.apply(args=args)):
+      send_password_reset_task(self.user.email)
+
+    code = PasswordResetCode.objects.get(user=self.user).code
+    self.assertEqual(send_mail.call_count, 2)
+    self.assertTrue(all(code in c.args[1] for c in send_mail.call_args_list))
+
+
+def _at(hour, minute):
+  return datetime(2025, 1, 1, hour, minute, tzinfo=timezone.utc)
+
+
+@skipUnless(connection.vendor == "postgresql", "open sessions are looked up with DISTINCT ON")
+@override_settings(TELEMETRY_ROLLUP_WINDOW_HOURS=1, TELEMETRY_SESSION_GAP_SECONDS=1800)
+class RollupTests(TestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="rollup@example.com", username="rollup")
+    UserAction.objects.create(user=self.user, action="click", element="card", timestamp=_at(11, 40))
+    UserAction.objects.create(user=self.user, action="hover", element="card", timestamp=_at(11, 50))
+    UserAction.objects.create(user=self.user, action="click", element="panel", timestamp=_at(12, 10))
+    MousePositionLog.objects.create(user=self.user, mouse_pos_batch=MOUSE_BATCH, timestamp=_at(12, 5))
+
+  def _fold_from(self, start, windows):
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={"processed_until": start})
+    return run_rollups(max_windows=windows)
+
+  def _assert_folded(self):
+    session = SessionRollup.objects.get(user=self.user)
+    self.assertEqual((session.started_at, session.ended_at), (_at(11, 40), _at(12, 10)))
+    self.assertEqual((session.actions, session.mouse_points), (3, 2))
+    buckets = UserActivityRollup.objects.filter(user=self.user).order_by("bucket_start")
+    self.assertEqual(
+      [(b.bucket_start, b.actions, b.clicks, b.mouse_points) for b in buckets],
+      [(_at(11, 0), 2, 1, 0), (_at(12, 0), 1, 1, 2)],
+    )
+
+  def test_session_spanning_two_windows_is_extended(self):
+    totals = self._fold_from(_at(11, 0), windows=2)
+
+    self.assertEqual((totals["windows"], totals["events"], totals["processed_until"]), (2, 4, _at(13, 0)))
+    self._assert_folded()
+
+  def test_rerun_after_resetting_the_watermark_does_not_double_count(self):
+    self._fold_from(_at(11, 0), windows=2)
+    self._fold_from(_at(11, 0), windows=2)
+
+    self._assert_folded()
+
+  def test_empty_window_only_advances_the_watermark(self):
+    totals = self._fold_from(_at(9, 0), windows=1)
+
+    self.assertEqual((totals["windows"], totals["events"]), (1, 0))
+    self.assertEqual(RollupWatermark.objects.get(name=WATERMARK).processed_until, _at(10, 0))
+    self.assertFalse(SessionRollup.objects.exists())
+    self.assertFalse(UserActivityRollup.objects.exists())
+
+
+@override_settings(JUPYTER_BATCH_MAX_BYTES=64)
+class GzipJSONParserTests(SimpleTestCase):
+  def _parse(self, payload):
+    request = RequestFactory().post("/", HTTP_CONTENT_ENCODING="gzip")
+    body = BytesIO(gzip.compress(json.dumps(payload).encode()))
+    return GzipJSONParser().parse(body, "application/json", {"request": request})
+
+  def test_gzip_body_within_limit_is_parsed(self):
+    self.assertEqual(self._parse({"cells": [1, 2]}), {"cells": [1, 2]})
+
+  def test_gzip_body_over_limit_is_rejected(self):
+    # Compresses to a few dozen bytes but inflates well past the limit
+    with self.assertRaisesMessage(ParseError, "exceeds 64 bytes"):
+      self._parse({"cells": "x" * 10_000})
+
+
+# The export view dispatches on a pool thread with its own connection, so rows must be committed
+class ExportJupyterLogsTests(TransactionTestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="export@example.com", username="exporter")
+    for n in range(3):
+      JupyterLog.objects.create(user=self.user, cell_type="code", source=f"print({n})", execution_count=n)
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def test_format_parquet_streams_a_parquet_file(self):
+    response = self.client.get("/api/jupyter/logs/export/", {"format": "parquet"})
+
+    self.assertEqual(response.status_code, 200)
+    self.assertTrue(response.streaming)
+    self.assertEqual(response["Content-Type"], PARQUET_CONTENT_TYPE)
+    self.assertTrue(response["Content-Disposition"].endswith('.parquet"'))
+    table = pq.read_table(BytesIO(b"".join(response.streaming_content)))
+    self.assertEqual(table.column("source").to_pylist(), ["print(0)", "print(1)", "print(2)"])
+
+
+@skipUnless(connection.vendor == "postgresql", "estimates come from Postgres planner statistics")
+class EstimatedCountTests(TestCase):
+  def setUp(self):
+    self.user = User.objects.create_user(email="estimate@example.com", username="estimator")
+    UserAction.objects.bulk_create(UserAction(user=self.user) for _ in range(5))
+    with connection.cursor() as cursor:
+      cursor.execute(f"ANALYZE {UserAction._meta.db_table}")
+    # Rows added after ANALYZE are missing from the statistics, which tells estimates and exact counts apart
+    UserAction.objects.bulk_create(UserAction(user=self.user) for _ in range(2))
+
+  def test_large_tables_use_the_statistics_estimate(self):
+    self.assertEqual(estimated_count(UserAction.objects.all(), threshold=3), 5)
+    self.assertEqual(estimated_count(UserAction.objects.filter(user=self.user), threshold=3), 5)
+
+  def test_small_estimates_fall_back_to_an_exact_count(self):
+    self.assertEqual(estimated_count(UserAction.objects.all(), threshold=100), 7)
+    self.assertEqual(estimated_count(UserAction.objects.filter(user=self.user), threshold=100), 7)
+
+
+class RunJobLockTests(SimpleTestCase):
+  JOB = "test-job"
+
+  def setUp(self):
+    for kind in ("lock", "stats"):
+      self.addCleanup(HOUSEKEEPING.delete, kind, self.JOB)
+
+  def test_overlapping_run_is_skipped_while_the_lock_is_held(self):
+    overlapping = []
+
+    def job():
+      overlapping.append(run_job(self.JOB, lambda: 99, lock_timeout=60))
+      return 3
+
+    self.assertEqual(run_job(self.JOB, job, lock_timeout=60), 3)
+    self.assertEqual(overlapping, [None])
+    self.assertIsNone(HOUSEKEEPING.get("lock", self.JOB))  # released once the job finished
+    self.assertEqual(HOUSEKEEPING.get("stats", self.JOB)["rows_total"], 3)
+
+  def test_lock_is_released_when_the_job_fails(self):
+    def job():
+      raise RuntimeError("boom")
+
+    with self.assertRaises(RuntimeError):
+      run_job(self.JOB, job, lock_timeout=60)
+    self.assertEqual(run_job(self.JOB, lambda: 0, lock_timeout=60), 0)
+    self.assertEqual(HOUSEKEEPING.get("stats", self.JOB)["last_error"], "boom")
+
+
+def _touch(root, path, age=3600):
+  full = os.path.join(root, path)
+  os.makedirs(os.path.dirname(full), exist_ok=True)
+  with open(full, "wb") as f:
+    f.write(b"figure")
+  stamp = os.path.getmtime(full) - age
+  os.utime(full, (stamp, stamp))
+
+
+@override_settings(USER_DIR="")
+class FigureGCTests(TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.root)
+    user = User.objects.create_user(email="figures@example.com", username="figures")
+    self.sharded = ImageData.objects.create(user=user, filepath=f"{uuid.uuid4()}.png")
+    self.flat = ImageData.objects.create(user=user, filepath=f"{uuid.uuid4()}.png")
+    self.dangling = ImageData.objects.create(user=user, filepath=f"{uuid.uuid4()}.png")
+    _touch(self.root, shard_path(self.sharded.filepath))
+    _touch(self.root, self.flat.filepath)  # legacy layout, not sharded yet
+    _touch(self.root, os.path.join(QUARANTINE_DIR, "old-run", "ignored.png"))
+    self.orphan = shard_path(f"{uuid.uuid4()}.png")
+    _touch(self.root, self.orphan)
+    self.fresh = shard_path(f"{uuid.uuid4()}.png")
+    _touch(self.root, self.fresh, age=0)  # an upload that has not saved its row yet
+
+  def test_derivatives_belong_to_the_row_with_their_filepath_stem(self):
+    # Seeded rows (insert_image_data.sql) have a filepath unrelated to their id
+    derivative = shard_path(derivative_name(self.sharded.filepath, "thumb"))
+    orphan_derivative = shard_path(derivative_name(f"{uuid.uuid4()}.png", "canvas"))
+    _touch(self.root, derivative)
+    _touch(self.root, orphan_derivative)
+
+    orphans = []
+    collect_garbage(root=self.root, grace_seconds=60, on_orphan=lambda path, size: orphans.append(path))
+    self.assertCountEqual(orphans, [self.orphan, orphan_derivative])
+
+  def test_reports_orphans_and_dangling_rows_and_quarantines_orphans(self):
+    orphans, dangling = [], []
+    totals = collect_garbage(
+      quarantine=True, root=self.root, grace_seconds=60,
+      on_orphan=lambda path, size: orphans.append(path),
+      on_dangling=lambda image_id, user_id, path: dangling.append(image_id),
+    )
+
+    self.assertEqual(orphans, [self.orphan])
+    self.assertEqual(dangling, [self.dangling.id])
+    self.assertEqual(totals, {"orphan_files": 1, "orphan_bytes": 6, "quarantined": 1, "dangling_rows": 1})
+    self.assertFalse(os.path.exists(os.path.join(self.root, self.orphan)))
+    quarantined = os.listdir(os.path.join(self.root, QUARANTINE_DIR))
+    self.assertEqual(len(quarantined), 2)  # old-run plus this run
+    for kept in (shard_path(self.sharded.filepath), self.flat.filepath, self.fresh):
+      self.assertTrue(os.path.exists(os.path.join(self.root, kept)))
+
+
+class FigureStorageLayoutTests(SimpleTestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.root)
+    figures = {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.root}}
+    self.enterContext(override_settings(STORAGES={**settings.STORAGES, "figures": figures}, FIGURE_LAYOUT="sharded"))
+
+  def test_new_figures_are_sharded_under_their_flat_name(self):
+    self.assertEqual(save_figure("abcdef.png", ContentFile(b"new")), "abcdef.png")
+    self.assertTrue(os.path.isfile(os.path.join(self.root, "ab", "cd", "abcdef.png")))
+    self.assertEqual(shard_path("notes.png"), "notes.png")  # not 4 hex chars, stays flat
+
+  def test_reads_fall_back_to_the_legacy_flat_path(self):
+    _touch(self.root, "0123abcd.png", age=0)
+
+    self.assertEqual(storage_path("0123abcd.png"), "0123abcd.png")
+    self.assertTrue(figure_exists("0123abcd.png"))
+    self.assertEqual(read_figure("0123abcd.png"), b"figure")
+    self.assertFalse(figure_exists("4567abcd.png"))
+
+  def test_delete_removes_both_copies(self):
+    _touch(self.root, "0123abcd.png", age=0)
+    _touch(self.root, shard_path("0123abcd.png"), age=0)
+
+    self.assertEqual(storage_path("0123abcd.png"), "01/23/0123abcd.png")
+    self.assertTrue(delete_figure("0123abcd.png"))
+    self.assertIsNone(storage_path("0123abcd.png"))
+
+
+class FigureDerivativeTests(TestCase):
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.root)
+    figures = {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": self.root}}
+    self.enterContext(override_settings(STORAGES={**settings.STORAGES, "figures": figures}, FIGURE_LAYOUT="sharded"))
+    self.user = User.objects.create_user(email="derivatives@example.com", username="derivatives")
+
+  def test_16_bit_greyscale_is_scaled_not_clipped(self):
+    buffer = BytesIO()
+    Image.new("I;16", (40, 20), 128 * 257).save(buffer, "PNG")  # mid grey in the 16-bit range
+    buffer.seek(0)
+    image = ImageData.objects.create(user=self.user, filepath=save_figure(f"{uuid.uuid4()}.png", buffer))
+
+    derivatives = build_derivatives(image)
+
+    self.assertEqual(set(derivatives), {"thumb", "canvas", "print"})
+    self.assertEqual((image.width, image.height, image.image_format), (40, 20, "PNG"))
+    with Image.open(os.path.join(self.root, shard_path(derivatives["print"]["path"]))) as printed:
+      self.assertAlmostEqual(printed.convert("L").getpixel((20, 10)), 128, delta=2)
@@ -1,14 +1,15 @@
 from django.urls import path
 from .views import (
-    ImageDataView, UploadFigureView, DeleteFigureView,
+    ImageDataView, UploadFigureView, DeleteFigureView, FigureFileView,
     UpdateImageDataView, GenerateNarrativeAsyncView, GetNarrativeCacheView,
     UpdateNarrativeCacheView, ClearNarrativeCacheView,
     GenerateDescriptionsView, GenerateNarrativeView,
-    LogActionView, UploadJupyterLogView,
-    ExportJupyterLogsView, RequestFeedbackView,
+    LogActionView, UploadJupyterLogView, UploadJupyterLogBatchView,
+    ExportJupyterLogsView, JupyterBlobView, RequestFeedbackView,
     CreateGroupView, GetGroupView, UpdateGroupView, DeleteGroupView,
     LogMousePositionView, LogScrollView,
-    ExportStoryView, CreateScaffoldView, GetScaffoldView, UpdateScaffoldView, DeleteScaffoldView
+    ExportStoryView, CreateScaffoldView, GetScaffoldView, UpdateScaffoldView, DeleteScaffoldView,
+    MetricsView, SessionAnalyticsView
 )
 
 urlpatterns = [
@@ -23,6 +24,7 @@ urlpatterns = [
     path("images/upload/", UploadFigureView.as_view(), name="image-upload"),
     path("images/<uuid:image_id>/update/", UpdateImageDataView.as_view(), name="image-update"),
     path("images/<str:filename>/delete/", DeleteFigureView.as_view(), name="image-delete"),
+    path("images/<uuid:image_id>/file/", FigureFileView.as_view(), name="image-file"),
 
     # Groups
     path("groups/", GetGroupView.as_view(), name="group-list"),  # GET list or single via query param
@@ -42,7 +44,9 @@ urlpatterns = [
 
     # Jupyter Logs
     path("jupyter/logs/upload/", UploadJupyterLogView.as_view(), name="jupyter-log-upload"),
+    path("jupyter/logs/upload/batch/", UploadJupyterLogBatchView.as_view(), name="jupyter-log-upload-batch"),
     path("jupyter/logs/export/", ExportJupyterLogsView.as_view(), name="jupyter-log-export"),
+    path("jupyter/blobs/<str:digest>/", JupyterBlobView.as_view(), name="jupyter-blob"),
 
     # Export Story
     path("export/", ExportStoryView.as_view(), name="export-story"),
@@ -52,4 +56,10 @@ urlpatterns = [
     path("scaffolds/create/", CreateScaffoldView.as_view(), name="scaffold-create"),
     path("scaffolds/<uuid:scaffold_id>/update/", UpdateScaffoldView.as_view(), name="scaffold-update"),
     path("scaffolds/delete/", DeleteScaffoldView.as_view(), name="scaffold-delete"),
+
+    # Analytics
+    path("analytics/sessions/", SessionAnalyticsView.as_view(), name="analytics-sessions"),
+
+    # Operations
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
\ No newline at end of file
@@ -8,16 +8,16 @@ from openai import OpenAI
 from datetime import datetime, timezone
 
 # Django
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import FileResponse, StreamingHttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.timezone import now
-from django.utils._os import safe_join
 
 # REST Framework
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.throttling import UserRateThrottle
 from rest_framework.parsers import MultiPartParser, FormParser
 
@@ -44,28 +44,76 @@ from .models import (
 # Serializers
 from .serializers import (
   ImageDataSerializer, NarrativeCacheSerializer,
-  JupyterLogsSerializer, MousePositionLogSerializer,
+  JupyterLogsSerializer, JupyterLogBatchItemSerializer, MousePositionLogSerializer,
   UserActionSerializer, ScrollLogSerializer, GroupDataSerializer, ScaffoldDataSerializer
 )
 
 # Tasks
-from .tasks import generate_description_task, generate_narrative_task, generate_feedback_task
+from .tasks import generate_description_task, generate_narrative_task, generate_feedback_task, generate_derivatives_task
 
 # Scaffold mappings (moved to pydandtic.py)
 from .pydandtic import STORY_SCAFFOLDS
 
+# Async serving helpers
+from .concurrency import PooledAPIView, streaming_content
+
+# Operational metrics
+from .metrics import collect_metrics
+
+# Session reconstruction
+from .session_analytics import cached_sessions
+
+# Time-ordered ids for telemetry rows
+from .ids import uuid7
+
+# Deduplicated request headers
+from .headers import intern_headers, intern_many
+
+# Streaming log exports
+from .exports import filter_jupyter_logs, jupyter_log_rows, csv_value, ExportFilterError, JUPYTER_EXPORT_FIELDS, EXPORT_RENDERERS
+from .parquet_export import iter_parquet, PARQUET_CONTENT_TYPE
+
+# Gzip-aware JSON parsing for batch uploads
+from .parsers import GzipJSONParser
+
+# Content-addressed Jupyter output blobs
+from .blobs import offload_outputs, load_blob
+
+# Packed mouse/scroll batches
+from .batch_encoding import packed_for_storage, encode_mouse_batch, encode_scroll_batch
+
+# Figure storage (local disk or S3)
+from .figure_storage import (
+  figure_storage, read_figure, iter_figure, content_type, save_figure, delete_figure, storage_path
+)
+
+# Sized figure derivatives
+from .derivatives import delete_derivatives, derivative_name
+
+# Shared cache namespaces
+from .cache import NARRATIVES, THROTTLE_KEY_FORMAT
+
+# Buffered telemetry ingestion
+from .telemetry import (
+  stream_ingest_enabled, enqueue_event, validate_payload,
+  KIND_USER_ACTION, KIND_MOUSE_POSITIONS, KIND_SCROLL
+)
+
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
 class BurstRateThrottle(UserRateThrottle):
   rate = '10/min'
+  cache_format = THROTTLE_KEY_FORMAT  # counted in the shared cache, so limits hold across workers
 
 
 class LogsExportRateThrottle(UserRateThrottle):
-  rate = '5/hr'    
+  rate = '30/hr'  # exports stream from a cursor, so memory no longer limits how many can run    
+  cache_format = THROTTLE_KEY_FORMAT
 
 
 class LogActionView(APIView):
   permission_classes = [IsAuthenticated]
+  trust_token_claims = True  # see AUTH_TRUST_TOKEN_CLAIMS
   def post(self, request):
     try:
       action_type = request.data.get('action_type')
@@ -75,13 +123,28 @@ class LogActionView(APIView):
         "error": f"Action type {action_type} not recognized."
         }, status=status.HTTP_400_BAD_REQUEST)
 
+      if stream_ingest_enabled():
+        payload = {
+          "action": action_type,
+          "state_info": request.data.get('state_info', {}),
+          "element": request.data.get('element_id', ''),
+        }
+        error = validate_payload(KIND_USER_ACTION, payload)
+        if error:
+          return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        action_id = enqueue_event(KIND_USER_ACTION, request.user.id, payload, dict(request.headers))
+        return Response({
+          "message": "Action queued",
+          "action_id": action_id
+        }, status=status.HTTP_202_ACCEPTED)
+
       # Create UserAction directly
       user_action = UserAction.objects.create(
-        user=request.user,
+        user_id=request.user.id,
         action=action_type,
         state_info=request.data.get('state_info', {}),
         element=request.data.get('element_id', ''),
-        request_headers=dict(request.headers)
+        header_set_id=intern_headers(request.headers)
       )
       
       return Response({
@@ -101,19 +164,31 @@ class LogActionView(APIView):
 
 class LogMousePositionView(APIView):
   permission_classes = [IsAuthenticated]
+  trust_token_claims = True  # see AUTH_TRUST_TOKEN_CLAIMS
   def post(self, request):
     try:
+      if stream_ingest_enabled():
+        payload = {"pos_batch": request.data['pos_batch']}
+        error = validate_payload(KIND_MOUSE_POSITIONS, payload)
+        if error:
+          return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        enqueue_event(KIND_MOUSE_POSITIONS, request.user.id, payload, dict(request.headers))
+        return Response({
+          "message": "Mouse positions queued",
+        }, status=status.HTTP_202_ACCEPTED)
+
       log_data = {
-        'log_id': str(uuid.uuid4()),
+        'log_id': str(uuid7()),
         'user': request.user.id,
         'mouse_pos_batch': request.data['pos_batch'],  # list of {"x": ..., "y": ..., "timestamp": ...}
-        'request_headers': dict(request.headers),
+        'header_set': intern_headers(request.headers),
         'timestamp': request.data['timestamp']
       }
 
       log_serializer = MousePositionLogSerializer(data=log_data)
       if log_serializer.is_valid():
-        log_serializer.save()
+        mouse_pos_batch, packed = packed_for_storage(encode_mouse_batch, log_serializer.validated_data['mouse_pos_batch'])
+        log_serializer.save(mouse_pos_batch=mouse_pos_batch, mouse_pos_packed=packed)
         return Response({
           "message": "Mouse positions logged successfully",
         }, status=status.HTTP_200_OK)
@@ -133,22 +208,33 @@ class LogMousePositionView(APIView):
 
 class LogScrollView(APIView):
   permission_classes = [IsAuthenticated]
+  trust_token_claims = True  # see AUTH_TRUST_TOKEN_CLAIMS
   def post(self, request):
     try:
       # New optimized structure: sessions with batched events per element
       sessions = request.data.get('sessions', [])
 
+      if stream_ingest_enabled():
+        error = validate_payload(KIND_SCROLL, {"sessions": sessions})
+        if error:
+          return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        enqueue_event(KIND_SCROLL, request.user.id, {"sessions": sessions}, dict(request.headers))
+        return Response({
+          "message": f"Scroll log queued ({len(sessions)} element(s))",
+        }, status=status.HTTP_202_ACCEPTED)
+
       log_data = {
-        'log_id': str(uuid.uuid4()),
+        'log_id': str(uuid7()),
         'user': request.user.id,
         'scroll_batch': sessions,  # Store the optimized sessions structure
-        'request_headers': dict(request.headers),
+        'header_set': intern_headers(request.headers),
         'timestamp': request.data.get('timestamp')
       }
 
       scroll_serializer = ScrollLogSerializer(data=log_data)
       if scroll_serializer.is_valid():
-        scroll_serializer.save()
+        scroll_batch, packed = packed_for_storage(encode_scroll_batch, scroll_serializer.validated_data['scroll_batch'])
+        scroll_serializer.save(scroll_batch=scroll_batch, scroll_packed=packed)
 
         # Count total events across all sessions for logging
         total_events = sum(len(session.get('events', [])) for session in sessions)
@@ -168,9 +254,15 @@ class LogScrollView(APIView):
 
 class UploadJupyterLogView(APIView):
   permission_classes = [IsAuthenticated]
+  trust_token_claims = True  # see AUTH_TRUST_TOKEN_CLAIMS
   def post(self, request):
     log_data = request.data
-    log_data['user'] = User.objects.get(username=request.user.username).id
+    log_data['user'] = request.user.id
+    # Headers forwarded by the Jupyter extension are stored once per distinct set
+    log_data['header_set'] = intern_headers(log_data.pop('request_headers', None))
+    # Large outputs (plots, long streams) go to the blob store; the row keeps references
+    if 'outputs' in log_data:
+      log_data['outputs'] = offload_outputs(log_data['outputs'])
     serializer = JupyterLogsSerializer(data=log_data)
     if serializer.is_valid():
       serializer.save()
@@ -179,57 +271,121 @@ class UploadJupyterLogView(APIView):
       return Response({"message": "Jupyter log upload failed", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ExportJupyterLogsView(APIView):
+class UploadJupyterLogBatchView(APIView):
+  permission_classes = [IsAuthenticated]
+  trust_token_claims = True  # see AUTH_TRUST_TOKEN_CLAIMS
+  parser_classes = [GzipJSONParser]
+
+  def post(self, request):
+    """
+    Upload many cell events at once: a JSON array (or {"logs": [...]}) of the
+    bodies UploadJupyterLogView accepts, optionally sent with Content-Encoding: gzip.
+    All events are validated before any is stored.
+    """
+    events = request.data.get('logs') if isinstance(request.data, dict) else request.data
+    if not isinstance(events, list) or not events:
+      return Response({"message": "Expected a non-empty list of Jupyter logs"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > settings.JUPYTER_BATCH_MAX_EVENTS:
+      return Response({
+        "message": f"Too many Jupyter logs in one batch (max {settings.JUPYTER_BATCH_MAX_EVENTS})"
+      }, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(event, dict) for event in events):
+      return Response({"message": "Each Jupyter log must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = JupyterLogBatchItemSerializer(data=events, many=True)
+    if not serializer.is_valid():
+      errors = {i: e for i, e in enumerate(serializer.errors) if e}
+      return Response({"message": "Jupyter log batch upload failed", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    header_set_ids = intern_many([event.get('request_headers') for event in events])
+    logs = [
+      JupyterLog(
+        user_id=request.user.id,
+        header_set_id=header_set_id,
+        **{**item, 'outputs': offload_outputs(item.get('outputs', []))},
+      )
+      for item, header_set_id in zip(serializer.validated_data, header_set_ids)
+    ]
+    JupyterLog.objects.bulk_create(logs)
+    return Response({"message": f"{len(logs)} Jupyter logs uploaded successfully"}, status=status.HTTP_200_OK)
+
+
+class ExportJupyterLogsView(PooledAPIView):
   permission_classes = [IsAuthenticated]
   throttle_classes = [LogsExportRateThrottle]
+  renderer_classes = EXPORT_RENDERERS  # so ?format=jsonl|csv|parquet passes content negotiation
 
   def get(self, request):
+    """
+    Stream Jupyter logs as JSONL (default), CSV or Parquet, oldest first.
+    Filters: user (id or username), start / end (ISO date or datetime), cell_type.
+    """
     fmt = (request.query_params.get("format") or "jsonl").lower()
-    
-    # Pull all logs
-    logs_qs = JupyterLog.objects.all()
+    # Outputs hold blob references unless rehydrate=1; fetch single blobs from jupyter/blobs/<digest>/
+    rehydrate = request.query_params.get("rehydrate") in ("1", "true", "yes")
 
-    if not logs_qs.exists():
-      return Response({"message": "No Jupyter logs found"}, status=status.HTTP_204_NO_CONTENT)
+    try:
+      logs_qs = filter_jupyter_logs(request.query_params)
+    except ExportFilterError as e:
+      return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST, content_type="application/json")
 
-    # Serialize so we don't rely on model internals / related fields
-    serializer = JupyterLogsSerializer(logs_qs, many=True)
-    data_list = serializer.data
+    if not logs_qs.exists():
+      return Response({"message": "No Jupyter logs found"}, status=status.HTTP_204_NO_CONTENT, content_type="application/json")
 
     timestamp = now().strftime("%Y%m%dT%H%M%SZ")
-    username = request.user.username
 
-    if fmt == "csv":
-      # Stream CSV so we don’t build a huge string in memory
+    if fmt == "parquet":
+      # Typed, zstd-compressed columns, flushed to the client one row group at a time
+      parquet_stream = iter_parquet("jupyter_logs", logs_qs, rehydrate=rehydrate)
+      response = StreamingHttpResponse(streaming_content(request, parquet_stream), content_type=PARQUET_CONTENT_TYPE)
+      filename = f"jupyter-logs-{timestamp}.parquet"
+
+    elif fmt == "csv":
+      # Rows are written as they come off the cursor; JSON columns are JSON text
       def row_stream():
-        # Build a union of all keys to make a consistent header
-        fieldnames = sorted({k for item in data_list for k in item.keys()})
         sio = StringIO()
-        writer = csv.DictWriter(sio, fieldnames=fieldnames, extrasaction="ignore")
+        writer = csv.DictWriter(sio, fieldnames=JUPYTER_EXPORT_FIELDS)
         writer.writeheader()
         yield sio.getvalue(); sio.seek(0); sio.truncate(0)
-        for item in data_list:
-          writer.writerow(item)
+        for item in jupyter_log_rows(logs_qs, rehydrate):
+          writer.writerow({k: csv_value(k, v) for k, v in item.items()})
           yield sio.getvalue(); sio.seek(0); sio.truncate(0)
 
-      response = StreamingHttpResponse(row_stream(), content_type="text/csv")
+      response = StreamingHttpResponse(streaming_content(request, row_stream()), content_type="text/csv")
       filename = f"jupyter-logs-{timestamp}.csv"
 
     else:
       # Default to newline-delimited JSON (NDJSON / JSONL)
       def line_stream():
-        for item in data_list:
+        for item in jupyter_log_rows(logs_qs, rehydrate):
           yield json.dumps(item, ensure_ascii=False) + "\n"
 
-      response = StreamingHttpResponse(line_stream(), content_type="application/x-ndjson")
+      response = StreamingHttpResponse(streaming_content(request, line_stream()), content_type="application/x-ndjson")
       filename = f"jupyter-logs-{timestamp}.jsonl"
 
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
     response["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*")
     response["Access-Control-Allow-Credentials"] = "true"
     return response
-  
-  
+
+
+class JupyterBlobView(APIView):
+  permission_classes = [IsAuthenticated]
+
+  def get(self, request, digest):
+    """A single offloaded Jupyter output value, referenced as {"$blob": digest} in exported outputs."""
+    try:
+      value = load_blob(digest)
+    except ValueError:
+      return Response({"error": "Invalid blob digest"}, status=status.HTTP_400_BAD_REQUEST)
+    except FileNotFoundError:
+      return Response({"error": "Blob not found"}, status=status.HTTP_404_NOT_FOUND)
+    response = Response({"digest": digest, "value": value}, status=status.HTTP_200_OK)
+    # Content-addressed, so it never changes
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+
 class ImageDataView(APIView):
   permission_classes = [IsAuthenticated]
   def get(self, request):
@@ -256,23 +412,13 @@ class UploadFigureView(APIView):
     if not figure:
       return Response({"message": "No file part in the request"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Build file path - save directly to DATA_PATH root to match nginx serving location
-    data_path = os.getenv('DATA_PATH')
-    if not data_path:
-      return Response({"message": "DATA_PATH not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    # Ensure DATA_PATH directory exists
-    os.makedirs(data_path, exist_ok=True)
-
-    # Build file path
+    # Build file name and stream the upload into figure storage (ab/cd/<uuid><ext> under DATA_PATH, or S3)
     figure_id = str(uuid.uuid4())
     ext = os.path.splitext(figure.name)[1]
-    figure_path = os.path.join(data_path, f"{figure_id}{ext}")
-
-    # Save file
-    with open(figure_path, 'wb+') as destination:
-      for chunk in figure.chunks():
-        destination.write(chunk)
+    try:
+      filepath = save_figure(f"{figure_id}{ext}", figure)
+    except Exception as e:
+      return Response({"message": f"Failed to store figure: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
     
@@ -288,7 +434,7 @@ class UploadFigureView(APIView):
     serializer = ImageDataSerializer(data={
       "id": figure_id,
       "user": request.user.id,
-      "filepath": f"{figure_id}{ext}",
+      "filepath": filepath,
       "short_desc": request.data.get('short_desc') or "Add a description for this visual.",
       "long_desc": request.data.get('long_desc') or "Ask AI to create a description for this visual.",
       "source": request.data.get('source') or "",
@@ -304,6 +450,8 @@ class UploadFigureView(APIView):
 
     if serializer.is_valid():
       serializer.save()
+      # Thumbnail/canvas/print copies are made in the background; the board uses the original until then
+      generate_derivatives_task.delay(figure_id)
       fig_data = serializer.validated_data
       fig_data['user'] = request.user.id
       return Response({"message": "Figure uploaded successfully", "fig_data": fig_data }, status=status.HTTP_200_OK)
@@ -322,14 +470,8 @@ class DeleteFigureView(APIView):
     if not filename:
       return Response({"message": "No filename provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Build file path - use DATA_PATH root to match upload location and nginx serving
-    data_path = os.getenv('DATA_PATH')
-    if not data_path:
-      return Response({"message": "DATA_PATH not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    try:
-      filepath = safe_join(data_path, filename)
-    except ValueError:
+    # Names are flat "<uuid>.<ext>"; reject anything that could point elsewhere in storage
+    if '/' in filename or '\\' in filename or filename.startswith('.'):
       return Response({"message": "Invalid filename"}, status=status.HTTP_400_BAD_REQUEST)
 
     base_name, _ = os.path.splitext(filename)
@@ -350,17 +492,16 @@ class DeleteFigureView(APIView):
         if other_user_image:
           return Response({"status": "error", "message": "Image belongs to another user"}, status=status.HTTP_403_FORBIDDEN)
 
-    # Remove image file if it exists
-    file_deleted = False
-    if os.path.exists(filepath):
-      try:
-        os.remove(filepath)
-        file_deleted = True
-      except Exception as e:
-        return Response({"status": "error", "message": f"Failed to delete file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    else:
-      # Log warning but don't fail - file might have been manually deleted
-      print(f"Warning: File not found at {filepath}")
+    # Remove image file (sharded or legacy flat location) if it exists
+    stored_name = image_data.filepath if image_data else filename
+    try:
+      delete_derivatives(stored_name)
+      file_deleted = delete_figure(stored_name)
+      if not file_deleted:
+        # Log warning but don't fail - file might have been manually deleted
+        print(f"Warning: File not found in figure storage: {stored_name}")
+    except Exception as e:
+      return Response({"status": "error", "message": f"Failed to delete file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # Remove DB record if it exists
     if image_data:
@@ -377,6 +518,62 @@ class DeleteFigureView(APIView):
         return Response({"status": "error", "message": f"Image record not found for filename: {filename} (base_name: {base_name})"}, status=status.HTTP_404_NOT_FOUND)
 
 
+class FigureFileView(APIView):
+  permission_classes = [IsAuthenticated]
+
+  def get(self, request, image_id):
+    """
+    Stream a figure from figure storage, honouring a single-range Range header.
+    Works the same on local disk and S3, so no node needs DATA_PATH mounted.
+    """
+    image = ImageData.objects.filter(id=image_id).only('filepath', 'user_id').first()
+    if image is None or (image.user_id != request.user.id and not request.user.is_staff):
+      return Response({"message": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    storage = figure_storage()
+    try:
+      path = storage_path(image.filepath)
+      if path is None:
+        raise FileNotFoundError(image.filepath)
+      size = storage.size(path)
+    except (FileNotFoundError, OSError):
+      return Response({"message": "Image file not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+      # S3 reports a missing key as a client error
+      return Response({"message": f"Image file not available: {str(e)}"}, status=status.HTTP_404_NOT_FOUND)
+
+    start, end = 0, size - 1
+    range_header = request.headers.get('Range', '')
+    partial = range_header.startswith('bytes=') and ',' not in range_header and size > 0
+    if partial:
+      first, _, last = range_header[len('bytes='):].strip().partition('-')
+      try:
+        if first:
+          start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+          start, end = max(size - int(last), 0), size - 1
+      except ValueError:
+        partial = False
+        start, end = 0, size - 1
+      else:
+        if start > end:
+          response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+          response["Content-Range"] = f"bytes */{size}"
+          return response
+
+    response = StreamingHttpResponse(
+      streaming_content(request, iter_figure(path, start, end) if size else iter(())),
+      status=status.HTTP_206_PARTIAL_CONTENT if partial else status.HTTP_200_OK,
+      content_type=content_type(image.filepath),
+    )
+    response["Content-Length"] = str(end - start + 1 if size else 0)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, max-age=86400"
+    if partial:
+      response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+
 class UpdateImageDataView(APIView):
   permission_classes = [IsAuthenticated]
   def post(self, request, image_id=None):
@@ -514,11 +711,18 @@ class GetNarrativeCacheView(APIView):
   permission_classes = [IsAuthenticated]
 
   def get(self, request):
-    cache = NarrativeCache.objects.filter(user=request.user).first()
-    if cache is None:
-      return Response(status=status.HTTP_204_NO_CONTENT)
+    # Formatted payload is cached until the row changes (see api/signals.py)
+    data = NARRATIVES.get(request.user.id)
+    if data is None:
+      cache = NarrativeCache.objects.filter(user_id=request.user.id).first()
+      if cache is None:
+        return Response(status=status.HTTP_204_NO_CONTENT)
+      data = self._format(NarrativeCacheSerializer(cache).data)
+      NARRATIVES.set(request.user.id, value=data)
+    return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
 
-    data = NarrativeCacheSerializer(cache).data
+  def _format(self, data):
+    data = dict(data)
     
     # Convert JSON fields to strings for frontend compatibility
     if 'order' in data and isinstance(data['order'], list):
@@ -532,8 +736,7 @@ class GetNarrativeCacheView(APIView):
         if isinstance(item, dict) and 'filename' in item and 'category' in item
       ])
       data['categories'] = categories_str
-    
-    return Response({"status": "success", "data": data}, status=status.HTTP_200_OK)
+    return data
 
   
 class UpdateNarrativeCacheView(APIView):
@@ -599,7 +802,7 @@ class GenerateDescriptionsView(APIView):
       )
 
   
-class GenerateNarrativeView(APIView):
+class GenerateNarrativeView(PooledAPIView):
   permission_classes = [IsAuthenticated]
   throttle_classes = [BurstRateThrottle]
 
@@ -631,7 +834,7 @@ class GenerateNarrativeView(APIView):
       return Response({"message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class RequestFeedbackView(APIView):
+class RequestFeedbackView(PooledAPIView):
   permission_classes = [IsAuthenticated]
   throttle_classes = [BurstRateThrottle]
 
@@ -688,7 +891,7 @@ class RequestFeedbackView(APIView):
       return Response({"status": "error", "message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class ExportStoryView(APIView):
+class ExportStoryView(PooledAPIView):
   permission_classes = [IsAuthenticated]
   throttle_classes = [BurstRateThrottle]
 
@@ -792,9 +995,6 @@ class ExportStoryView(APIView):
 
         # Add images referenced by [FIGURE: filename] inline; replace placeholders with inline <img/>
         figure_pattern = re.compile(r"\[\s*FIGURE\s*[:：﹕]\s*([^\]]+?)\s*\]", re.IGNORECASE | re.UNICODE)
-        data_path = os.getenv('DATA_PATH')
-        if not data_path:
-          data_path = ''  # Fallback to empty string if not configured
 
         for raw in lines:
           line = raw.rstrip()
@@ -818,12 +1018,14 @@ class ExportStoryView(APIView):
           # Build block image flowables for each figure and replace placeholders
           img_flowables = []
           def build_img_flowable(filename: str):
-            # Images are stored directly in DATA_PATH root, matching upload/delete/nginx serving location
-            figure_path = os.path.join(data_path, filename)
-            if not os.path.exists(figure_path):
-              return None
+            # Figures are read through figure storage, so the export works without a shared volume
             try:
-              ir = ImageReader(figure_path)
+              # The print-sized derivative keeps the PDF small; fall back to the original
+              try:
+                figure_bytes = read_figure(derivative_name(filename, "print"))
+              except FileNotFoundError:
+                figure_bytes = read_figure(filename)
+              ir = ImageReader(BytesIO(figure_bytes))
               iw, ih = ir.getSize()
               if not iw or not ih:
                 return None
@@ -837,7 +1039,7 @@ class ExportStoryView(APIView):
                 scale_w = float(max_content_width) / target_w
                 target_w = float(max_content_width)
                 target_h = target_h * scale_w
-              return RLImage(figure_path, width=target_w, height=target_h)
+              return RLImage(BytesIO(figure_bytes), width=target_w, height=target_h)
             except Exception:
               return None
 
@@ -894,7 +1096,7 @@ class ExportStoryView(APIView):
       pdf_bytes = buffer.getvalue()
       buffer.close()
 
-      response = FileResponse(BytesIO(pdf_bytes), content_type="application/pdf")
+      response = HttpResponse(pdf_bytes, content_type="application/pdf")
       response["Content-Disposition"] = f'attachment; filename="data-story-{timestamp}.pdf"'
       response["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*")
       response["Access-Control-Allow-Credentials"] = "true"
@@ -1059,3 +1261,39 @@ class DeleteScaffoldView(APIView):
       return Response({"message": "All scaffolds deleted successfully"}, status=status.HTTP_200_OK)
     except Exception as e:
       return Response({"errors": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class MetricsView(APIView):
+  permission_classes = [IsAdminUser]
+
+  def get(self, request):
+    """Per-process operational metrics (DB connection pool, ...) for staff."""
+    return Response(collect_metrics(), status=status.HTTP_200_OK)
+
+
+class SessionAnalyticsView(PooledAPIView):
+  permission_classes = [IsAdminUser]
+
+  def get(self, request):
+    """
+    Reconstructed sessions for one user and UTC day.
+    Query params: user (id or username), date (YYYY-MM-DD, default today), timeline (1 to include events).
+    """
+    user_ref = request.query_params.get("user")
+    if not user_ref:
+      return Response({"error": "user is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+      user_id = uuid.UUID(user_ref)
+    except ValueError:
+      user_id = User.objects.filter(username=user_ref).values_list("id", flat=True).first()
+    if user_id is None or not User.objects.filter(id=user_id).exists():
+      return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    date_param = request.query_params.get("date")
+    try:
+      day = datetime.strptime(date_param, "%Y-%m-%d").date() if date_param else now().date()
+    except ValueError:
+      return Response({"error": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+    include_timeline = request.query_params.get("timeline") in ("1", "true", "yes")
+    return Response(cached_sessions(user_id, day, include_timeline), status=status.HTTP_200_OK)
@@ -1,7 +1,20 @@
+# backend\config\asgi.py
+"""
+ASGI config for config project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Production serves it with gunicorn + uvicorn workers, e.g.:
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
@@ -36,12 +36,123 @@ environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 
 DATA_PATH = env('DATA_PATH')
 USER_DIR = env('USER_DIR_BASE')
+# Large Jupyter cell outputs are stored once, content-addressed, under this path
+JUPYTER_BLOB_PATH = env('JUPYTER_BLOB_PATH', default=os.path.join(DATA_PATH, '.jupyter-blobs'))
+JUPYTER_BLOB_MIN_BYTES = env.int('JUPYTER_BLOB_MIN_BYTES', default=16384)
+# Limits for jupyter/logs/upload/batch/ (events per request, decompressed body size)
+JUPYTER_BATCH_MAX_EVENTS = env.int('JUPYTER_BATCH_MAX_EVENTS', default=1000)
+JUPYTER_BATCH_MAX_BYTES = env.int('JUPYTER_BATCH_MAX_BYTES', default=50 * 1024 * 1024)
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
+# Task results are only read while a client polls for them; expire them after a day
+CELERY_RESULT_EXPIRES = env.int('CELERY_RESULT_EXPIRES', default=24 * 60 * 60)
 
+# Shared cache for web and Celery processes (throttles, user lookups, narratives).
+# Set CACHE_REDIS_URL to an empty string to fall back to per-process memory.
+CACHE_REDIS_URL = env('CACHE_REDIS_URL', default='redis://redis:6379/3')
+CACHES = {
+  'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': CACHE_REDIS_URL,
+    'KEY_PREFIX': env('CACHE_KEY_PREFIX', default='cast'),
+    'VERSION': env.int('CACHE_VERSION', default=1),  # bump to invalidate every cached value
+    'TIMEOUT': env.int('CACHE_DEFAULT_TIMEOUT', default=300),
+  } if CACHE_REDIS_URL else {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+  },
+  # Separate alias so bumping CACHE_VERSION does not log everyone out
+  'sessions': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': CACHE_REDIS_URL,
+    'KEY_PREFIX': env('CACHE_KEY_PREFIX', default='cast') + ':session',
+  } if CACHE_REDIS_URL else {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+  },
+}
+
+# Telemetry ingestion: 'sync' writes each event in the request, 'stream' queues
+# events in Redis and flush_telemetry_task bulk-inserts them periodically
+TELEMETRY_INGEST_MODE = env('TELEMETRY_INGEST_MODE', default='sync')
+TELEMETRY_REDIS_URL = env('TELEMETRY_REDIS_URL', default='redis://redis:6379/2')
+TELEMETRY_STREAM_KEY = env('TELEMETRY_STREAM_KEY', default='cast:telemetry')
+TELEMETRY_STREAM_MAXLEN = env.int('TELEMETRY_STREAM_MAXLEN', default=1000000)
+# Entries that still fail when written one at a time are moved here for inspection
+TELEMETRY_DEAD_LETTER_KEY = env('TELEMETRY_DEAD_LETTER_KEY', default='cast:telemetry:dead')
+TELEMETRY_FLUSH_BATCH_SIZE = env.int('TELEMETRY_FLUSH_BATCH_SIZE', default=500)
+TELEMETRY_FLUSH_INTERVAL_SECONDS = env.float('TELEMETRY_FLUSH_INTERVAL_SECONDS', default=5.0)
+# Store mouse/scroll batches as packed delta-encoded int arrays instead of JSON
+TELEMETRY_PACKED_BATCHES = env.bool('TELEMETRY_PACKED_BATCHES', default=False)
+
+# Monthly telemetry partitions (see api/partitions.py): months created ahead,
+# months kept (0 keeps everything) and whether expired months are 'detach'ed or 'drop'ped
+TELEMETRY_PARTITIONS_AHEAD = env.int('TELEMETRY_PARTITIONS_AHEAD', default=3)
+TELEMETRY_RETENTION_MONTHS = env.int('TELEMETRY_RETENTION_MONTHS', default=0)
+TELEMETRY_RETENTION_ACTION = env('TELEMETRY_RETENTION_ACTION', default='detach')
+
+# Telemetry rollups (see api/rollups.py): how often they run, window size, how
+# far behind real time they stay, the inactivity gap that splits sessions and
+# the cap on per-element dwell time
+TELEMETRY_ROLLUP_INTERVAL_SECONDS = env.int('TELEMETRY_ROLLUP_INTERVAL_SECONDS', default=900)
+TELEMETRY_ROLLUP_WINDOW_HOURS = env.int('TELEMETRY_ROLLUP_WINDOW_HOURS', default=1)
+TELEMETRY_ROLLUP_LAG_SECONDS = env.int('TELEMETRY_ROLLUP_LAG_SECONDS', default=300)
+TELEMETRY_SESSION_GAP_SECONDS = env.int('TELEMETRY_SESSION_GAP_SECONDS', default=1800)
+TELEMETRY_DWELL_CAP_SECONDS = env.int('TELEMETRY_DWELL_CAP_SECONDS', default=60)
+
+# Housekeeping jobs (seconds between runs); each also serves as the job's lock timeout
+HOUSEKEEPING_STALE_FLAGS_INTERVAL_SECONDS = env.int('HOUSEKEEPING_STALE_FLAGS_INTERVAL_SECONDS', default=5 * 60)
+HOUSEKEEPING_SESSIONS_INTERVAL_SECONDS = env.int('HOUSEKEEPING_SESSIONS_INTERVAL_SECONDS', default=24 * 60 * 60)
+HOUSEKEEPING_RESET_CODES_INTERVAL_SECONDS = env.int('HOUSEKEEPING_RESET_CODES_INTERVAL_SECONDS', default=60 * 60)
+# Figure file/row reconciliation: files younger than the grace period may be mid-upload.
+# Quarantine is off by default, so the scheduled run only reports.
+FIGURE_GC_INTERVAL_SECONDS = env.int('FIGURE_GC_INTERVAL_SECONDS', default=24 * 60 * 60)
+FIGURE_GC_GRACE_SECONDS = env.int('FIGURE_GC_GRACE_SECONDS', default=60 * 60)
+FIGURE_GC_QUARANTINE = env.bool('FIGURE_GC_QUARANTINE', default=False)
+# A description still marked as generating after this long belongs to a dead task
+DESCRIPTION_STALE_AFTER_SECONDS = env.int('DESCRIPTION_STALE_AFTER_SECONDS', default=10 * 60)
+
+CELERY_BEAT_SCHEDULE = {
+  'rollup-telemetry': {
+    'task': 'api.tasks.rollup_telemetry_task',
+    'schedule': TELEMETRY_ROLLUP_INTERVAL_SECONDS,
+    'options': {'expires': TELEMETRY_ROLLUP_INTERVAL_SECONDS},
+  },
+  'maintain-telemetry-partitions': {
+    'task': 'api.tasks.maintain_partitions_task',
+    'schedule': 24 * 60 * 60,
+    'options': {'expires': 24 * 60 * 60},
+  },
+  'clear-expired-sessions': {
+    'task': 'users.tasks.clear_expired_sessions_task',
+    'schedule': HOUSEKEEPING_SESSIONS_INTERVAL_SECONDS,
+    'options': {'expires': HOUSEKEEPING_SESSIONS_INTERVAL_SECONDS},
+  },
+  'clear-expired-reset-codes': {
+    'task': 'users.tasks.clear_expired_reset_codes_task',
+    'schedule': HOUSEKEEPING_RESET_CODES_INTERVAL_SECONDS,
+    'options': {'expires': HOUSEKEEPING_RESET_CODES_INTERVAL_SECONDS},
+  },
+  'reset-stale-description-flags': {
+    'task': 'api.tasks.reset_stale_description_flags_task',
+    'schedule': HOUSEKEEPING_STALE_FLAGS_INTERVAL_SECONDS,
+    'options': {'expires': HOUSEKEEPING_STALE_FLAGS_INTERVAL_SECONDS},
+  },
+  'gc-figures': {
+    'task': 'api.tasks.gc_figures_task',
+    'schedule': FIGURE_GC_INTERVAL_SECONDS,
+    'options': {'expires': FIGURE_GC_INTERVAL_SECONDS},
+  },
+}
+
+# Only stream mode queues telemetry, so sync mode has nothing to flush
+if TELEMETRY_INGEST_MODE == 'stream':
+  CELERY_BEAT_SCHEDULE['flush-telemetry'] = {
+    'task': 'api.tasks.flush_telemetry_task',
+    'schedule': TELEMETRY_FLUSH_INTERVAL_SECONDS,
+    'options': {'expires': TELEMETRY_FLUSH_INTERVAL_SECONDS},
+  }
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = env('DJANGO_SECRET_KEY')
@@ -55,6 +166,33 @@ ALLOWED_HOSTS = env.list('DJANGO_ALLOWED_HOSTS')
 STATIC_URL = env('STATIC_URL', default='/backend_static/')
 STATIC_ROOT = os.path.join(BASE_DIR, env('STATIC_ROOT', default='staticfiles'))
 
+# Uploaded figures: 'local' keeps them in DATA_PATH (served by nginx at /images/),
+# 's3' stores them in an S3-compatible bucket (AWS, MinIO) via django-storages.
+FIGURE_STORAGE = env('FIGURE_STORAGE', default='local')
+# 'sharded' writes new figures to ab/cd/<name>; reads always fall back to the flat layout
+FIGURE_LAYOUT = env('FIGURE_LAYOUT', default='sharded')
+STORAGES = {
+  'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+  'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+  'figures': {
+    'BACKEND': 'storages.backends.s3.S3Storage',
+    'OPTIONS': {
+      'bucket_name': env('FIGURE_S3_BUCKET', default='cast-figures'),
+      'endpoint_url': env('FIGURE_S3_ENDPOINT_URL', default=None),  # e.g. http://minio:9000
+      'access_key': env('FIGURE_S3_ACCESS_KEY', default=None),
+      'secret_key': env('FIGURE_S3_SECRET_KEY', default=None),
+      'region_name': env('FIGURE_S3_REGION', default=None),
+      'location': env('FIGURE_S3_PREFIX', default=''),
+      'file_overwrite': False,
+      'default_acl': None,
+      'querystring_auth': True,
+    },
+  } if FIGURE_STORAGE == 's3' else {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': DATA_PATH, 'base_url': '/images/'},
+  },
+}
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -121,6 +259,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Threads available to async views for blocking work (ORM, PDF builds, file I/O)
+BLOCKING_IO_POOL_SIZE = env.int('BLOCKING_IO_POOL_SIZE', default=8)
 
 # Database Configuration
 DATABASES = {
@@ -134,9 +276,25 @@ DATABASES = {
     'OPTIONS': {
       'connect_timeout': 30,
     },
+    'CONN_HEALTH_CHECKS': True,
   }
 }
 
+# Each process (gunicorn worker, Celery child) keeps its own psycopg 3 pool so
+# requests and tasks reuse open connections instead of reconnecting every time.
+# With the pool disabled, fall back to persistent per-thread connections.
+DB_POOL_ENABLED = env.bool('DB_POOL_ENABLED', default=True)
+if DB_POOL_ENABLED:
+  DATABASES['default']['OPTIONS']['pool'] = {
+    'min_size': env.int('DB_POOL_MIN_SIZE', default=1),
+    'max_size': env.int('DB_POOL_MAX_SIZE', default=BLOCKING_IO_POOL_SIZE + 2),
+    'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+    'max_idle': env.float('DB_POOL_MAX_IDLE', default=600.0),
+    'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=3600.0),
+  }
+else:
+  DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
   {
@@ -156,13 +314,21 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Admin changelists above this many rows show Postgres estimates instead of COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000)
+# Related rows shown in admin inlines (e.g. a user's images)
+ADMIN_INLINE_LIMIT = env.int('ADMIN_INLINE_LIMIT', default=20)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Stores sessions in the database
+# Sessions live in Redis ('cache'); use 'cached_db' to keep a database copy, or 'db' without Redis.
+# After switching, `python manage.py migrate_sessions` copies live sessions out of django_session.
+SESSION_ENGINE = env('SESSION_ENGINE', default='django.contrib.sessions.backends.cache' if CACHE_REDIS_URL else 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 28800  # 8 hours
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
@@ -202,6 +368,12 @@ JWT_REFRESH_COOKIE = env('JWT_REFRESH_COOKIE', default='refresh')
 JWT_COOKIE_SECURE = env.bool('JWT_COOKIE_SECURE', default=not DEBUG)
 JWT_COOKIE_SAMESITE = env('JWT_COOKIE_SAMESITE', default='Lax')
 
+# Authenticated user lookups: shared cache TTL and per-process TTL in seconds (0 disables)
+AUTH_USER_CACHE_TTL = env.int('AUTH_USER_CACHE_TTL', default=300)
+AUTH_USER_LOCAL_CACHE_TTL = env.int('AUTH_USER_LOCAL_CACHE_TTL', default=10)
+# Let telemetry endpoints take the user id from the signed token without loading the user
+AUTH_TRUST_TOKEN_CLAIMS = env.bool('AUTH_TRUST_TOKEN_CLAIMS', default=False)
+
 # Email Configuration for Password Reset
 EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = env('EMAIL_HOST', default='localhost')
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+  name = 'users'
+
+  def ready(self):
+    from . import signals  # noqa: F401
@@ -0,0 +1,80 @@
+# users/auth_cache.py
+"""
+Two-level cache of the users CookieJWTAuthentication resolves from the
+`user_id` token claim: a small per-process dict with a short TTL in front of
+the shared cache (api.cache.USERS). Saving or deleting a user drops both
+entries (see users/signals.py); other processes' local copies expire within
+AUTH_USER_LOCAL_CACHE_TTL seconds.
+
+Only the fields authentication and the views need are cached, never the
+password hash or profile data. Users are rebuilt with the remaining fields
+deferred, so reading one of those loads it from the database and save()
+only writes the fields that were loaded.
+"""
+import time
+from threading import Lock
+
+from django.conf import settings
+
+from api.cache import USERS
+from .models import User
+
+CACHED_FIELDS = ("id", "username", "is_active", "is_staff", "is_superuser")
+
+_LOCAL_MAX_ENTRIES = 4096
+_local = {}
+_local_lock = Lock()
+
+
+def _rebuild(fields):
+  # from_db takes the loaded values in model field order
+  names = [f.attname for f in User._meta.concrete_fields if f.attname in fields]
+  return User.from_db(User.objects.db, names, [fields[name] for name in names])
+
+
+def get_cached_user(user_id):
+  """A fresh User for `user_id` built from the cached fields, or None on a miss."""
+  if not settings.AUTH_USER_CACHE_TTL:
+    return None
+  key = str(user_id)
+  with _local_lock:
+    entry = _local.get(key)
+  if entry is not None:
+    expires, fields = entry
+    if expires > time.monotonic():
+      return _rebuild(fields)
+  fields = USERS.get(key)
+  if isinstance(fields, dict) and set(CACHED_FIELDS) <= fields.keys():
+    _remember(key, fields)
+    return _rebuild(fields)
+  return None
+
+
+def cache_user(user):
+  if not settings.AUTH_USER_CACHE_TTL:
+    return
+  key = str(user.pk)
+  fields = {name: getattr(user, name) for name in CACHED_FIELDS}
+  USERS.set(key, value=fields, timeout=settings.AUTH_USER_CACHE_TTL)
+  _remember(key, fields)
+
+
+def invalidate_user(user_id):
+  key = str(user_id)
+  with _local_lock:
+    _local.pop(key, None)
+  USERS.delete(key)
+
+
+def _remember(key, fields):
+  ttl = min(settings.AUTH_USER_LOCAL_CACHE_TTL, settings.AUTH_USER_CACHE_TTL)
+  if ttl <= 0:
+    return
+  with _local_lock:
+    if len(_local) >= _LOCAL_MAX_ENTRIES:
+      now = time.monotonic()
+      for stale in [k for k, (expires, _) in _local.items() if expires <= now]:
+        del _local[stale]
+      if len(_local) >= _LOCAL_MAX_ENTRIES:
+        _local.clear()
+    _local[key] = (time.monotonic() + ttl, fields)
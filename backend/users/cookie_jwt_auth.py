@@ -1,6 +1,11 @@
 # users/cookie_jwt_auth.py
 from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .auth_cache import cache_user, get_cached_user
 
 class CookieJWTAuthentication(JWTAuthentication):
   def authenticate(self, request):
@@ -13,13 +18,34 @@ class CookieJWTAuthentication(JWTAuthentication):
         return None
     else:
       raw_token = self.get_raw_token(header)
-    
+
     if raw_token is None:
       return None
-    
+
     try:
       validated_token = self.get_validated_token(raw_token)
     except Exception:
       return None
-    
-    return self.get_user(validated_token), validated_token
\ No newline at end of file
+
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and self._view_trusts_claims(request):
+      # Telemetry endpoints only need the user id, which the signed token already carries
+      return TokenUser(validated_token), validated_token
+
+    return self.get_user(validated_token), validated_token
+
+  def get_user(self, validated_token):
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None or getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+      return super().get_user(validated_token)
+
+    user = get_cached_user(user_id)
+    if user is None:
+      user = super().get_user(validated_token)
+      cache_user(user)
+    elif not user.is_active:
+      raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return user
+
+  def _view_trusts_claims(self, request):
+    view = (getattr(request, 'parser_context', None) or {}).get('view')
+    return getattr(view, 'trust_token_claims', False)
@@ -0,0 +1,48 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Copy live sessions from the django_session table into the configured SESSION_ENGINE '
+            '(e.g. the Redis cache) so nobody is logged out by the switch. Expiry dates are kept. '
+            'Run it once right after deploying the new engine; it is safe to run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete each row from django_session once it has been copied')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.db':
+            raise CommandError('SESSION_ENGINE is still the database backend; nothing to migrate to.')
+
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        copied = failed = 0
+        copied_keys = []
+        live = Session.objects.filter(expire_date__gt=timezone.now()).order_by('session_key')
+        for row in live.iterator(chunk_size=options['chunk_size']):
+            try:
+                store = store_class(session_key=row.session_key)
+                # Seed the data directly; loading first would miss in the new store and rotate the key
+                store._session_cache = row.get_decoded()
+                store.set_expiry(row.expire_date)  # keep the remaining lifetime, not a fresh one
+                store.save()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Could not copy session {row.session_key[:8]}…: {e}')
+                continue
+            copied += 1
+            copied_keys.append(row.session_key)
+            if options['delete'] and len(copied_keys) >= options['chunk_size']:
+                Session.objects.filter(session_key__in=copied_keys).delete()
+                copied_keys = []
+
+        if options['delete'] and copied_keys:
+            Session.objects.filter(session_key__in=copied_keys).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Copied {copied} live session(s) to {settings.SESSION_ENGINE}' + (f'; {failed} failed' if failed else '')
+        ))
@@ -85,10 +85,7 @@ class PasswordResetCode(models.Model):
   def cleanup_expired(cls):
     """Delete all expired codes"""
     expiry_threshold = timezone.now() - timezone.timedelta(minutes=15)
-    expired_codes = cls.objects.filter(created_at__lt=expiry_threshold)
-    count = expired_codes.count()
-    expired_codes.delete()
-    return count
+    return cls.objects.filter(created_at__lt=expiry_threshold).delete()[0]
   
   class Meta:
     db_table = 'password_reset_codes'
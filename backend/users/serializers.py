@@ -1,10 +1,8 @@
 # backend\users\serializers.py
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.conf import settings
-import time
 from .models import PasswordResetCode
+from .tasks import send_password_reset_task
 
 
 
@@ -34,56 +32,15 @@ class PasswordResetRequestSerializer(serializers.Serializer):
     return value
 
   def save(self):
-    email = self.validated_data['email']
-    try:
-      user = User.objects.get(email=email)
-    except User.DoesNotExist:
-      time.sleep(3) # simulate work so it's not too obvious that the email doesn't exist
-      return None
-    except Exception as e:
-      time.sleep(3) # simulate work so it's not too obvious that the email doesn't exist
-      print(f"Unexpected error during password reset: {e}")
-      return None
-    
-    # Clean up expired codes before generating new one
-    PasswordResetCode.cleanup_expired()
-    
-    # Generate new reset code
-    reset_code_obj = PasswordResetCode.generate_code(user)
-    
-    # Send email with code
-    subject = "Password Reset Code - CAST Story Studio"
-    message = f"""
-Hello {user.first_name or user.username},
-
-You requested a password reset for your CAST Story Studio account.
-
-Your password reset code is: {reset_code_obj.code}
-
-This code will expire in 15 minutes. If you didn't request this, you can safely ignore this email.
-
-Best regards,
-CAST Story Studio Team
-"""
-    
-    send_mail(
-      subject,
-      message,
-      settings.DEFAULT_FROM_EMAIL,
-      [email],
-      fail_silently=False,
-    )
-    
-    return user
+    # Lookup, code generation and sending all happen in the worker, so the
+    # response takes the same time whether or not the email has an account
+    send_password_reset_task.delay(self.validated_data['email'])
 
 class PasswordResetCodeVerifySerializer(serializers.Serializer):
   email = serializers.EmailField()
   code = serializers.CharField(max_length=6, min_length=6)
 
   def validate(self, data):
-    # Clean up expired codes first
-    PasswordResetCode.cleanup_expired()
-    
     email = data['email']
     code = data['code']
     
@@ -113,9 +70,6 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     if data['new_password'] != data['confirm_password']:
       raise serializers.ValidationError("Passwords do not match.")
     
-    # Clean up expired codes first
-    PasswordResetCode.cleanup_expired()
-    
     email = data['email']
     code = data['code']
     
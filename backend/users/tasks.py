@@ -0,0 +1,103 @@
+# users/tasks.py
+import logging
+import smtplib
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from api.housekeeping import run_job
+
+from .models import PasswordResetCode
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement, so cleanup never holds long locks on django_session
+SESSION_DELETE_BATCH = 5000
+
+
+@shared_task(ignore_result=True)
+def clear_expired_sessions_task():
+  """
+  Delete expired rows from django_session. Sessions live in the cache now, but
+  rows written by the database backend (or the cached_db write-through) stay
+  behind until they are removed here.
+  """
+  return run_job(
+    "clear-expired-sessions",
+    _delete_expired_sessions,
+    lock_timeout=settings.HOUSEKEEPING_SESSIONS_INTERVAL_SECONDS,
+  )
+
+
+def _delete_expired_sessions():
+  from django.contrib.sessions.models import Session  # late import; needs the app registry
+
+  deleted = 0
+  while True:
+    keys = list(
+      Session.objects.filter(expire_date__lt=timezone.now())
+      .values_list('session_key', flat=True)[:SESSION_DELETE_BATCH]
+    )
+    if not keys:
+      break
+    deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+  return deleted
+
+
+RESET_EMAIL_SUBJECT = "Password Reset Code - CAST Story Studio"
+RESET_EMAIL_BODY = """
+Hello {name},
+
+You requested a password reset for your CAST Story Studio account.
+
+Your password reset code is: {code}
+
+This code will expire in 15 minutes. If you didn't request this, you can safely ignore this email.
+
+Best regards,
+CAST Story Studio Team
+"""
+
+
+@shared_task(ignore_result=True)
+def send_password_reset_task(email):
+  """Generate a reset code for the account with `email`, if there is one, and queue the email."""
+  User = get_user_model()
+  user = User.objects.filter(email=email).first()
+  if user is None:
+    return None
+
+  # The code is generated once; only the send below is retried, so a retry never invalidates a mailed code
+  reset_code = PasswordResetCode.generate_code(user)
+  send_reset_email_task.delay(email, user.first_name or user.username, reset_code.code)
+  return str(user.pk)
+
+
+@shared_task(
+  ignore_result=True,
+  autoretry_for=(smtplib.SMTPException, OSError),
+  retry_backoff=True,
+  max_retries=3,
+)
+def send_reset_email_task(email, name, code):
+  """Mail an already generated reset code, retrying transient SMTP errors."""
+  send_mail(
+    RESET_EMAIL_SUBJECT,
+    RESET_EMAIL_BODY.format(name=name, code=code),
+    settings.DEFAULT_FROM_EMAIL,
+    [email],
+    fail_silently=False,
+  )
+
+
+@shared_task(ignore_result=True)
+def clear_expired_reset_codes_task():
+  """Delete password reset codes past their 15 minute lifetime."""
+  return run_job(
+    "clear-expired-reset-codes",
+    PasswordResetCode.cleanup_expired,
+    lock_timeout=settings.HOUSEKEEPING_RESET_CODES_INTERVAL_SECONDS,
+  )
@@ -37,7 +37,9 @@ class LoginView(APIView):
       if user is not None:
         update_last_login(None, user)
         refresh = RefreshToken.for_user(user)
-        request.session['DATA_PATH'] = settings.DATA_PATH
+        # Only write when it changes, so repeat logins don't rewrite the session
+        if request.session.get('DATA_PATH') != settings.DATA_PATH:
+          request.session['DATA_PATH'] = settings.DATA_PATH
         os.makedirs(os.path.join(settings.USER_DIR, user.username, "workspace"), exist_ok=True)
 
         return Response({